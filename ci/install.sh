@@ -3,10 +3,24 @@
 # libevent development files are required for gevent
 sudo apt-get install libevent-dev
 
+# The data blobs are kept in jsonb columns, and filtered on, on PostgreSQL
+# 9.4 and up.  The API still runs on older servers, without jsonb, but the
+# build requires 9.4 (see the check below), so that the jsonb tests are never
+# skipped.
+PG_VERSION=${PG_VERSION:-9.4}
+POSTGIS_VERSION=${POSTGIS_VERSION:-2.3}
+
 # Install GeoDjango dependencies -- see
 # https://docs.djangoproject.com/en/dev/ref/contrib/gis/install/#ubuntu
-sudo apt-get install binutils gdal-bin libproj-dev postgresql-9.1-postgis \
-     postgresql-server-dev-9.1 python-psycopg2
+sudo apt-get install binutils gdal-bin libproj-dev \
+     postgresql-$PG_VERSION-postgis-$POSTGIS_VERSION \
+     postgresql-server-dev-$PG_VERSION python-psycopg2
+
+# Make sure the server really is new enough, rather than skip the jsonb tests.
+if [ "$(psql -tAc 'SHOW server_version_num;' -U postgres)" -lt 90400 ]; then
+    echo "PostgreSQL 9.4 or newer is required" >&2
+    exit 1
+fi
 
 # Install the python requirements
 sudo pip install -r requirements.txt
@@ -17,10 +31,9 @@ sudo pip install coverage
 # Create a PostGIS template database
 psql -c "CREATE DATABASE template_postgis;" -U postgres
 psql -c "UPDATE pg_database SET datistemplate='true' WHERE datname='template_postgis';" -U postgres
-createlang plpgsql template_postgis -U postgres
-# Loading the PostGIS SQL routines
-psql -d template_postgis -f /usr/share/postgresql/9.1/contrib/postgis-1.5/postgis.sql -q
-psql -d template_postgis -f /usr/share/postgresql/9.1/contrib/postgis-1.5/spatial_ref_sys.sql -q
+# Loading the PostGIS routines (PostGIS 2 is an extension, and plpgsql is
+# built in)
+psql -d template_postgis -c "CREATE EXTENSION postgis;" -U postgres
 # Enabling users to alter spatial tables.
 psql -d template_postgis -c "GRANT ALL ON geometry_columns TO PUBLIC;"
 psql -d template_postgis -c "GRANT ALL ON geography_columns TO PUBLIC;"
@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for serving the API with gevent workers, e.g.:
+
+    gunicorn -c src/project/gunicorn_gevent.py wsgi:application
+
+Each worker process serves many requests at once, switching between them
+whenever one is waiting, on the database, the cache, or a slow client.
+That matters most for reads that wait a long time without doing much: long
+polls of the activity feed, and big place lists streamed to slow clients.
+With sync workers, each of those holds a whole worker process.  See the
+"Running with gevent workers" section of doc/DEPLOY.md.
+
+Each setting can be overridden from the environment.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:%s' % os.environ.get('PORT', '8000'))
+
+worker_class = 'gevent'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# The most requests each worker serves at once.  Every request that touches
+# the database holds a connection of its own until it finishes, so
+# workers * worker_connections should stay under the database's
+# max_connections, unless the connections go through a pooler like
+# pgbouncer.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Long polls of the activity feed wait up to SA_API_ACTIVITY_MAX_WAIT
+# seconds, so the timeout has to be longer than that.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# The application is loaded in each worker, after it has been forked and
+# patched for gevent, so that nothing (e.g., a database connection) is made
+# before psycopg2 is patched.
+preload_app = False
+
+
+def post_fork(server, worker):
+    # gunicorn patches the standard library for gevent in each worker, but
+    # psycopg2 is a C extension, and would block the whole worker while it
+    # waits on the database.  psycogreen has it wait through gevent instead.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+    server.log.info('Worker %s: made psycopg2 cooperative with gevent', worker.pid)
@@ -204,6 +204,79 @@ LOGGING = {
     }
 }
 
+##############################################################################
+# The cache
+# ---------
+# Cached API responses, and the versions that invalidate them, have to be
+# shared by all of the server processes; otherwise a change handled by one
+# process leaves the others serving stale data.  The API expects memcached
+# (see doc/DEPLOY.md).  If the cache can't be reached, nothing is cached.
+#
+# A local-memory cache is only good enough for a single server process, like
+# the development server or the tests.  With one, the API caches nothing,
+# unless SA_API_SINGLE_PROCESS is True.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    }
+}
+
+SA_API_SINGLE_PROCESS = False
+
+# API response caching
+# --------------------
+# How long, in seconds, to keep cached API responses.  Cached responses are
+# invalidated whenever the data they came from changes, so this mostly limits
+# how long unused responses take up space.  SA_API_CACHE_TIMEOUTS overrides
+# the timeout for particular views, by their cache_prefix (e.g.,
+# {'activity': 60}).
+#
+# Responses bigger than SA_API_CACHE_MAX_SIZE bytes are not cached (memcached
+# does not store values over 1MB by default).
+
+SA_API_CACHE_TIMEOUT = 60 * 60
+SA_API_CACHE_TIMEOUTS = {}
+SA_API_CACHE_MAX_SIZE = 1000 * 1000
+
+# Activity feed long polling
+# --------------------------
+# The longest, in seconds, that a request for new activity may wait for some
+# to come in.  Waiting requests are woken by PostgreSQL notifications, unless
+# SA_API_ACTIVITY_LISTEN is False, in which case they check the cache every
+# second instead.
+#
+# Keep this well below the server's request timeout (gunicorn's default is 30
+# seconds), or waiting requests are killed.  With sync workers, each waiting
+# request also holds a whole worker; serve long polls with the gevent worker
+# profile (see doc/DEPLOY.md), or set this to 0 to turn waiting off.
+
+SA_API_ACTIVITY_MAX_WAIT = 20
+SA_API_ACTIVITY_LISTEN = True
+
+# API key lookups
+# ---------------
+# How long, in seconds, to keep API keys and their users in the shared cache
+# (if the cache is shared, see above), and in each server process.  Keys are
+# cleared from the shared cache when they change, but each process only
+# notices when its own copy times out.  Key usage (last_used and logged_ip)
+# is written to the database every SA_API_KEY_USAGE_INTERVAL seconds by each
+# process, and when it exits.
+
+SA_API_KEY_CACHE_TIMEOUT = 60 * 5
+SA_API_KEY_LOCAL_TIMEOUT = 10
+SA_API_KEY_USAGE_INTERVAL = 60
+
+# Queued submissions
+# ------------------
+# Submissions of these types (e.g., ['votes']) are queued when they are
+# posted, and answered with 202 Accepted, then saved in batches by
+# `manage.py process_submission_queue`, which must be running.  For bursts of
+# submissions, like live voting at a meeting.
+
+SA_API_QUEUED_SUBMISSION_TYPES = []
+
 ##############################################################################
 # Local settings overrides
 # ------------------------
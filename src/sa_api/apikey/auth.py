@@ -1,6 +1,6 @@
-from django.contrib.auth import login
 from django.core.exceptions import PermissionDenied
 from djangorestframework import authentication
+from . import keycache
 from .models import ApiKey
 
 KEY_HEADER = 'HTTP_X_SHAREABOUTS_KEY'
@@ -25,10 +25,10 @@ class APIKeyBackend(object):
         if not key:
             return None
 
-        user, key_instance = self._get_user_and_key(key)
-        if None in (user, key_instance):
+        user, key_id = keycache.get_user_and_key_id(key)
+        if None in (user, key_id):
             return None
-        key_instance.login(ip_address)
+        keycache.record_usage(key_id, ip_address)
         return user
 
     def get_user(self, user_id):
@@ -68,9 +68,9 @@ def check_api_authorization(request):
         if user is None:
             raise PermissionDenied("invalid key?")
         if user.is_active:
-            # login() expects a dotted name at user.backend.
-            user.backend = APIKeyBackend.backend_name
-            login(request, user)
+            # The key goes with every request, so there is no need to log in
+            # (and start a session).
+            request.user = user
             return True
         else:
             raise PermissionDenied("Your account is disabled.")
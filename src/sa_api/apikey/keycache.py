@@ -0,0 +1,170 @@
+"""
+Looking up API keys without going to the database on every request.
+
+Keys are resolved to their users through two layers of caching: a dict in
+each process, kept for ``SA_API_KEY_LOCAL_TIMEOUT`` seconds, and the shared
+Django cache, kept for ``SA_API_KEY_CACHE_TIMEOUT`` seconds.  Saving or
+deleting a key (one at a time, not in bulk) clears it from the shared cache,
+and from the local cache of the process that did it; other processes may go
+on using their local copy until it times out, so keep the local timeout
+short.  Changes to users, such as being deactivated, are picked up when the
+cached keys time out.  The Django cache is skipped unless it is shared by all
+of the processes (see caching.is_shared); otherwise a key cleared by one
+process could go on being used in the others for the whole cache timeout.
+
+Key use (the ``last_used`` time and ``logged_ip``) is collected in memory and
+written to the database by a background thread in each process, every
+``SA_API_KEY_USAGE_INTERVAL`` seconds, whether or not more requests come in.
+Whatever is left is written when the process exits.
+"""
+from .. import caching
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+import atexit
+import copy
+import datetime
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cached for keys that do not exist, so that they are not looked up over and
+# over either.
+MISSING = 'missing'
+
+_local_keys = {}
+_local_lock = threading.Lock()
+
+_pending_usage = {}
+_usage_lock = threading.Lock()
+
+# Held while usage is being written, so that writing it at exit waits for
+# the background thread to finish, rather than cutting it off.
+_flush_lock = threading.Lock()
+
+_flusher = [None]
+_flusher_lock = threading.Lock()
+
+
+def _get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache_key(key):
+    return 'sa_api:apikey:%s' % key
+
+
+def _load_key(key):
+    from .models import ApiKey
+    try:
+        key_instance = ApiKey.objects.select_related('user').get(key=key)
+    except ApiKey.DoesNotExist:
+        return MISSING
+    return (key_instance.id, key_instance.user)
+
+
+def get_user_and_key_id(key):
+    """
+    Get the user that owns the given API key and the id of the key, as a
+    tuple, or (None, None) if there is no such key.  The user is a copy that
+    the caller is free to change.
+    """
+    now = time.time()
+    with _local_lock:
+        expires, value = _local_keys.get(key, (0, None))
+
+    if expires <= now:
+        use_cache = caching.is_shared()
+        value = cache.get(_cache_key(key)) if use_cache else None
+        if value is None:
+            value = _load_key(key)
+            if use_cache:
+                cache.set(_cache_key(key), value,
+                          _get_setting('SA_API_KEY_CACHE_TIMEOUT', 60 * 5))
+
+        local_timeout = _get_setting('SA_API_KEY_LOCAL_TIMEOUT', 10)
+        with _local_lock:
+            _local_keys[key] = (now + local_timeout, value)
+
+    if value == MISSING:
+        return (None, None)
+
+    key_id, user = value
+    return (copy.copy(user), key_id)
+
+
+def invalidate(key):
+    """
+    Forget what is cached about the given API key.
+    """
+    cache.delete(_cache_key(key))
+    with _local_lock:
+        _local_keys.pop(key, None)
+
+
+def clear_local_cache():
+    with _local_lock:
+        _local_keys.clear()
+
+
+def record_usage(key_id, ip_address):
+    """
+    Note that the key with the given id was just used from the given address.
+    The note is written to the database later, by flush_usage().
+    """
+    with _usage_lock:
+        _pending_usage[key_id] = (ip_address, datetime.datetime.utcnow())
+    _start_flusher()
+
+
+def flush_usage():
+    """
+    Write the key usage noted so far to the database.
+    """
+    from .models import ApiKey
+
+    with _flush_lock:
+        with _usage_lock:
+            usage = _pending_usage.copy()
+            _pending_usage.clear()
+
+        for key_id, (ip_address, last_used) in usage.items():
+            ApiKey.objects.filter(id=key_id)\
+                .update(logged_ip=ip_address, last_used=last_used)
+
+
+def _start_flusher():
+    """
+    Start this process's background thread for writing key usage, if it
+    isn't running (e.g., it was started before the process was forked).
+    """
+    with _flusher_lock:
+        if _flusher[0] is not None and _flusher[0].is_alive():
+            return
+        thread = threading.Thread(target=_flush_periodically,
+                                  name='sa_api key usage')
+        thread.daemon = True
+        thread.start()
+        _flusher[0] = thread
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(_get_setting('SA_API_KEY_USAGE_INTERVAL', 60))
+        try:
+            flush_usage()
+        except Exception:
+            logger.exception('Error recording API key usage')
+        finally:
+            # The thread has a database connection of its own.
+            connection.close()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_usage()
+    except Exception:
+        logger.exception('Error recording API key usage at exit')
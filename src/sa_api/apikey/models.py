@@ -12,6 +12,7 @@ license unknown.
 from django.db import models
 from django.contrib.auth.models import User
 from datetime import datetime
+from . import keycache
 
 # Changing this would require a migration, ugh.
 KEY_SIZE = 32
@@ -28,6 +29,23 @@ class ApiKey(models.Model):
     datasets = models.ManyToManyField('sa_api.DataSet', blank=True,
                                       related_name='api_keys')
 
+    def save(self, *args, **kwargs):
+        # Forget the old key too, if it is being changed.
+        if self.pk is not None:
+            for old_key in ApiKey.objects.filter(pk=self.pk)\
+                    .values_list('key', flat=True):
+                keycache.invalidate(old_key)
+
+        ret = super(ApiKey, self).save(*args, **kwargs)
+        keycache.invalidate(self.key)
+        return ret
+
+    def delete(self, *args, **kwargs):
+        key = self.key
+        ret = super(ApiKey, self).delete(*args, **kwargs)
+        keycache.invalidate(key)
+        return ret
+
     def login(self, ip_address):
         self.logged_ip = ip_address
         self.save()
@@ -135,3 +135,133 @@ class TestApiKeyAuth(unittest2.TestCase):
                          ApiKeyAuthentication(None).authenticate(get_request))
         # Still logged out.
         self.assertEqual(get_request.user.is_authenticated(), False)
+
+
+class TestKeyCache(unittest2.TestCase):
+
+    def _cleanup(self):
+        from .models import ApiKey
+        from . import keycache
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        User.objects.all().delete()
+        ApiKey.objects.all().delete()
+        keycache.clear_local_cache()
+        cache.clear()
+
+    def setUp(self):
+        from .models import ApiKey, generate_unique_api_key
+        from django.contrib.auth.models import User
+        self._cleanup()
+        self.user = User.objects.create(username='bob@bob.com')
+        self.key = ApiKey.objects.create(key=generate_unique_api_key(),
+                                         user=self.user)
+
+    def tearDown(self):
+        self._cleanup()
+
+    def test_lookup_is_cached(self):
+        from . import keycache
+        user, key_id = keycache.get_user_and_key_id(self.key.key)
+        self.assertEqual((user.id, key_id), (self.user.id, self.key.id))
+
+        with mock.patch.object(keycache, '_load_key') as load_key:
+            user, key_id = keycache.get_user_and_key_id(self.key.key)
+            self.assertEqual(load_key.call_count, 0)
+        self.assertEqual((user.id, key_id), (self.user.id, self.key.id))
+
+    def test_lookup_survives_losing_the_local_cache(self):
+        from . import keycache
+        keycache.get_user_and_key_id(self.key.key)
+        keycache.clear_local_cache()
+
+        with mock.patch.object(keycache, '_load_key') as load_key:
+            user, key_id = keycache.get_user_and_key_id(self.key.key)
+            self.assertEqual(load_key.call_count, 0)
+        self.assertEqual(key_id, self.key.id)
+
+    def test_lookup_skips_a_cache_that_is_not_shared(self):
+        from . import keycache
+        from django.core.cache import cache
+        with mock.patch('sa_api.caching.is_shared', return_value=False):
+            keycache.get_user_and_key_id(self.key.key)
+            keycache.clear_local_cache()
+            self.assertEqual(cache.get(keycache._cache_key(self.key.key)), None)
+
+            with mock.patch.object(keycache, '_load_key',
+                                   wraps=keycache._load_key) as load_key:
+                keycache.get_user_and_key_id(self.key.key)
+                self.assertEqual(load_key.call_count, 1)
+
+    def test_missing_keys_are_cached_until_created(self):
+        from . import keycache
+        from .models import ApiKey
+        self.assertEqual(keycache.get_user_and_key_id('nokey'), (None, None))
+
+        key = ApiKey.objects.create(key='nokey', user=self.user)
+        self.assertEqual(keycache.get_user_and_key_id('nokey')[1], key.id)
+
+    def test_deleted_and_changed_keys_are_forgotten(self):
+        from . import keycache
+        old_key = self.key.key
+        keycache.get_user_and_key_id(old_key)
+
+        self.key.key = 'newkey'
+        self.key.save()
+        self.assertEqual(keycache.get_user_and_key_id(old_key), (None, None))
+        self.assertEqual(keycache.get_user_and_key_id('newkey')[1], self.key.id)
+
+        self.key.delete()
+        self.assertEqual(keycache.get_user_and_key_id('newkey'), (None, None))
+
+    def test_usage_is_written_later(self):
+        from . import keycache
+        from .models import ApiKey
+        with mock.patch.object(keycache, '_flusher', [None]):
+            with mock.patch('threading.Thread') as thread:
+                thread.return_value.is_alive.return_value = True
+                keycache.record_usage(self.key.id, '1.2.3.4')
+                keycache.record_usage(self.key.id, '5.6.7.8')
+                self.assertEqual(thread.call_count, 1)
+
+        self.assertEqual(ApiKey.objects.get(id=self.key.id).logged_ip, None)
+        keycache.flush_usage()
+        self.assertEqual(ApiKey.objects.get(id=self.key.id).logged_ip, '5.6.7.8')
+
+    def test_usage_is_written_without_another_request(self):
+        from . import keycache
+        from .models import ApiKey
+        from django.test.utils import override_settings
+        import time
+
+        with override_settings(SA_API_KEY_USAGE_INTERVAL=0.1):
+            with mock.patch.object(keycache, '_flusher', [None]):
+                keycache.record_usage(self.key.id, '1.2.3.4')
+
+                deadline = time.time() + 5
+                while (ApiKey.objects.get(id=self.key.id).logged_ip is None and
+                       time.time() < deadline):
+                    time.sleep(0.1)
+
+        self.assertEqual(ApiKey.objects.get(id=self.key.id).logged_ip, '1.2.3.4')
+
+    def test_usage_is_written_at_exit(self):
+        from . import keycache
+        from .models import ApiKey
+        with mock.patch('threading.Thread'):
+            with mock.patch.object(keycache, '_flusher', [None]):
+                keycache.record_usage(self.key.id, '1.2.3.4')
+
+        keycache._flush_at_exit()
+        self.assertEqual(ApiKey.objects.get(id=self.key.id).logged_ip, '1.2.3.4')
+
+    def test_authentication_does_not_start_a_session(self):
+        from .auth import check_api_authorization, KEY_HEADER
+        request = mock.Mock(**{'user.is_authenticated.return_value': False,
+                               'META': {'REMOTE_ADDR': '1.2.3.4',
+                                        KEY_HEADER: self.key.key},
+                               'session': mock.MagicMock(),
+                               'GET': {}, 'POST': {}})
+        self.assertEqual(True, check_api_authorization(request))
+        self.assertEqual(request.user.id, self.user.id)
+        self.assertEqual(request.session.mock_calls, [])
@@ -0,0 +1,512 @@
+"""
+Creating many places or submissions at once, for the bulk import views and
+the import_places management command.
+
+Places can be read from GeoJSON (a FeatureCollection, or a list of features
+or of places), newline-delimited JSON (one feature or place per line), or CSV
+(one place per row, with columns like the CSV export's).  Each is turned into
+place records like the ones the place collection takes: a dict with a
+``location``, optionally ``visible`` and ``submitter_name``, and any other
+attributes for the data blob.
+
+Submissions are read the same way, except that GeoJSON features don't
+apply; each record has the ``place_id`` of the place it is on.
+
+Records are checked a batch at a time by clean_place or clean_submission,
+without going through the forms, and each batch is written with one
+multi-row INSERT per table, with the activity for it created in bulk.
+Nothing here invalidates the dataset's caches; that's up to the caller,
+once per batch or once at the end, in the same write_transaction (see the
+transactions module) so that it is done after the things are committed.
+"""
+from django.db import connection
+from django.utils import timezone
+from . import models
+from . import notifications
+import csv
+import json
+import re
+
+BATCH_SIZE = 1000
+
+# Attributes of a place that are never read from an import, as they come
+# from the export (or the API's representation) and are set by the API.
+RESERVED_FIELDS = set(['id', 'url', 'dataset', 'created_datetime',
+                       'updated_datetime', 'submissions'])
+
+WKT_POINT_REGEX = re.compile(r'^\s*POINT\s*\(\s*(\S+)\s+(\S+)\s*\)\s*$', re.I)
+
+
+class InvalidRecords (ValueError):
+    """
+    Raised when records in a batch can't be imported.  ``errors`` is a list
+    of {'record': <1-based record number>, 'detail': <message>}.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super(InvalidRecords, self).__init__(
+            '%s record(s) could not be imported' % len(errors))
+
+
+def record_from_json(value):
+    """
+    Get a place record from a decoded GeoJSON feature, or a place as given
+    to the API.
+    """
+    if isinstance(value, dict) and value.get('type') == 'Feature':
+        record = dict(value.get('properties') or {})
+        record['location'] = value.get('geometry')
+        return record
+    return value
+
+
+def read_geojson(stream):
+    """
+    Read place records from a GeoJSON FeatureCollection, or a JSON list of
+    features or places.
+    """
+    try:
+        document = json.load(stream)
+    except ValueError:
+        raise ValueError('The content is not valid JSON')
+
+    if isinstance(document, dict) and document.get('type') == 'FeatureCollection':
+        items = document.get('features') or []
+    elif isinstance(document, dict):
+        items = [document]
+    elif isinstance(document, list):
+        items = document
+    else:
+        raise ValueError('Expected a GeoJSON FeatureCollection or a list')
+
+    for item in items:
+        yield record_from_json(item)
+
+
+def read_ndjson(stream):
+    """
+    Read place records from newline-delimited JSON, one feature or place per
+    line.  Blank lines are skipped.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError('Line %s is not valid JSON' % line_number)
+        yield record_from_json(item)
+
+
+def read_csv(stream):
+    """
+    Read place records from UTF-8 CSV with a header row.  The location is
+    read from ``lat`` and ``lng`` columns (or ``location.lat`` and
+    ``location.lng``, as exported), or from a ``location`` column of WKT.
+    Empty cells are left out.
+
+    Columns with dots in their names are nested the way the CSV export
+    flattened them (see unflatten), so that exported data imports as it was.
+    The values are all strings, though.
+    """
+    for row in csv.DictReader(stream):
+        record = {}
+        for key, value in row.iteritems():
+            if key is None or value in (None, ''):
+                continue
+            key = key.decode('utf-8')
+            value = value.decode('utf-8')
+            if key in ('lat', 'lng'):
+                key = 'location.' + key
+            record[key] = value
+        yield unflatten(record)
+
+
+def unflatten(flat):
+    """
+    Nest the values of a record's dotted keys, undoing the CSV renderer's
+    flattening: ``{'a.b': 1, 'c.0': 2, 'c.1': 3}`` becomes
+    ``{'a': {'b': 1}, 'c': [2, 3]}``.  Mappings keyed by 0 to n - 1 become
+    lists.  A key that would have to be nested under a value that isn't a
+    mapping (e.g., both ``a`` and ``a.b``) is left as it is.
+    """
+    nested = {}
+    # Plain keys go first, so that they win over dotted keys under them.
+    for key in sorted(flat, key=lambda key: key.count('.')):
+        path = key.split('.')
+        parent = nested if '' not in path else None
+        for part in path[:-1]:
+            if not isinstance(parent, dict):
+                break
+            parent = parent.setdefault(part, {})
+
+        if not isinstance(parent, dict) or path[-1] in parent:
+            nested[key] = flat[key]
+        else:
+            parent[path[-1]] = flat[key]
+
+    return dict((key, _listify(value)) for key, value in nested.iteritems())
+
+
+def _listify(value):
+    if not isinstance(value, dict):
+        return value
+
+    value = dict((key, _listify(item)) for key, item in value.iteritems())
+    indexes = [str(index) for index in range(len(value))]
+    if value and set(value) == set(indexes):
+        return [value[index] for index in indexes]
+    return value
+
+
+READERS = {
+    'geojson': read_geojson,
+    'json': read_geojson,
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def clean_location(location):
+    """
+    Get (lng, lat) from a {'lat': ..., 'lng': ...} mapping, a GeoJSON Point,
+    or a WKT POINT.  Raises ValueError if it isn't a valid point.
+    """
+    if isinstance(location, dict) and 'lat' in location and 'lng' in location:
+        coords = (location['lng'], location['lat'])
+    elif isinstance(location, dict) and location.get('type') == 'Point':
+        coords = location.get('coordinates') or ()
+    elif isinstance(location, basestring) and WKT_POINT_REGEX.match(location):
+        coords = WKT_POINT_REGEX.match(location).groups()
+    elif location is None:
+        raise ValueError('location is required')
+    else:
+        raise ValueError('location must be a point')
+
+    try:
+        lng, lat = [float(coord) for coord in coords]
+    except (TypeError, ValueError):
+        raise ValueError('location must be a point')
+
+    if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+        raise ValueError('location must be a valid longitude and latitude')
+    return lng, lat
+
+
+def clean_visible(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, basestring) and value.lower() in ('true', '1'):
+        return True
+    if isinstance(value, basestring) and value.lower() in ('false', '0'):
+        return False
+    raise ValueError('visible must be true or false')
+
+
+def clean_submitter_name(value):
+    if value is not None:
+        if not isinstance(value, basestring):
+            raise ValueError('submitter_name must be a string')
+        if len(value) > 256:
+            raise ValueError('submitter_name must be at most 256 characters')
+    return value
+
+
+def clean_place(record):
+    """
+    Check a place record, and get the values to insert for it.  Raises
+    ValueError if the record is not a valid place.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Each place must be an object')
+
+    lng, lat = clean_location(record.get('location'))
+    place = {
+        'location': 'POINT (%r %r)' % (lng, lat),
+        'visible': clean_visible(record.get('visible', True)),
+        'submitter_name': clean_submitter_name(record.get('submitter_name')),
+    }
+
+    place['data'] = get_blob_data(record, place)
+    return place
+
+
+def clean_submission(record, submission_type):
+    """
+    Check a submission record, and get the values to insert for it.  The
+    submission_type is the one the submissions are posted to; if it is
+    'submissions', each record gives its own ``type``.  Raises ValueError if
+    the record is not a valid submission.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Each submission must be an object')
+
+    try:
+        place_id = int(record['place_id'])
+    except KeyError:
+        raise ValueError('place_id is required')
+    except (TypeError, ValueError):
+        raise ValueError('place_id must be a whole number')
+
+    if submission_type == 'submissions':
+        submission_type = record.get('type')
+        if not isinstance(submission_type, basestring) or not submission_type:
+            raise ValueError('type is required')
+    if len(submission_type) > 128:
+        raise ValueError('type must be at most 128 characters')
+
+    submission = {
+        'place_id': place_id,
+        'submission_type': submission_type,
+        'submitter_name': clean_submitter_name(record.get('submitter_name')),
+    }
+
+    submission['data'] = get_blob_data(record, ['place_id', 'place', 'type',
+                                                'submitter_name'])
+    return submission
+
+
+def get_blob_data(record, fields):
+    """
+    Get the data blob for a record: everything but the given fields and the
+    reserved ones, or keys under them (like ``place.url`` or
+    ``submissions.0.length``), as a JSON string.  Records read from CSV have
+    already been nested (see read_csv), so this doesn't nest anything itself.
+    """
+    blob_data = {}
+    for key, value in record.iteritems():
+        field = key.split('.', 1)[0]
+        if field not in fields and field not in RESERVED_FIELDS:
+            blob_data[key] = value
+    return json.dumps(blob_data, indent=2)
+
+
+def iter_batches(records, clean, batch_size=BATCH_SIZE):
+    """
+    Clean the records, and yield them in lists of at most batch_size, each
+    noting its ``record`` number.  If any record in a batch is invalid,
+    raises InvalidRecords for all of the batch's errors instead.
+    """
+    batch = []
+    errors = []
+    for number, record in enumerate(records, 1):
+        try:
+            cleaned = clean(record)
+            cleaned['record'] = number
+            batch.append(cleaned)
+        except ValueError, e:
+            errors.append({'record': number, 'detail': str(e)})
+
+        if number % batch_size == 0:
+            if errors:
+                raise InvalidRecords(errors)
+            yield batch
+            batch = []
+
+    if errors:
+        raise InvalidRecords(errors)
+    if batch:
+        yield batch
+
+
+def reserve_ids(model, count):
+    """
+    Take the next count ids from the sequence of a model's table.
+    """
+    cursor = connection.cursor()
+    cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                   'FROM generate_series(1, %s)',
+                   [model._meta.db_table, model._meta.pk.column, count])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def insert_things(dataset, things):
+    """
+    Insert the SubmittedThing rows for a batch of cleaned records, and
+    return their ids, in order.  Things are created now, unless they give
+    their own ``created_datetime``.
+    """
+    ids = reserve_ids(models.SubmittedThing, len(things))
+    now = timezone.now()
+
+    params = []
+    for thing_id, thing in zip(ids, things):
+        params.extend([thing_id, thing.get('created_datetime', now), now,
+                       thing['submitter_name'], thing['data'], dataset.id])
+
+    cursor = connection.cursor()
+    cursor.execute(
+        'INSERT INTO %s (id, created_datetime, updated_datetime, '
+        'submitter_name, data, dataset_id) VALUES %s' % (
+            connection.ops.quote_name(models.SubmittedThing._meta.db_table),
+            ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(things))),
+        params)
+    return ids
+
+
+def insert_places(dataset, places):
+    """
+    Insert a batch of cleaned places (see clean_place) into the dataset, and
+    the activity for creating them.  Returns the new places' ids.
+    """
+    if not places:
+        return []
+
+    ids = insert_things(dataset, places)
+
+    params = []
+    for place_id, place in zip(ids, places):
+        params.extend([place_id, place['location'], place['visible']])
+
+    cursor = connection.cursor()
+    cursor.execute(
+        'INSERT INTO %s (submittedthing_ptr_id, location, visible) VALUES %s' % (
+            connection.ops.quote_name(models.Place._meta.db_table),
+            ', '.join(['(%s, ST_GeomFromText(%s, 4326), %s)'] * len(places))),
+        params)
+
+    models.Activity.objects.bulk_create([
+        models.Activity(action='create', data_id=place_id,
+                        dataset_id=dataset.id, place_id=place_id,
+                        visible=place['visible'])
+        for place_id, place in zip(ids, places)])
+
+    # Wake up anyone waiting for new activity in the dataset, once for the
+    # batch.
+    if notifications.is_listen_supported():
+        notifications.notify_activity(dataset.owner.username, dataset.slug)
+
+    return ids
+
+
+def get_submission_sets(submissions):
+    """
+    Get a dict of submission set ids by (place id, submission type) for a
+    batch of cleaned submissions, creating any sets that don't exist yet.
+
+    Sets may be created by other requests at the same time, so the places
+    that need new sets are locked first, and only the sets that still don't
+    exist are inserted; then all of them are read again.
+    """
+    keys = set((submission['place_id'], submission['submission_type'])
+               for submission in submissions)
+
+    sets = find_submission_sets(keys)
+    missing = keys - set(sets)
+    if missing:
+        lock_places(set(place_id for place_id, _ in missing))
+
+        params = []
+        for place_id, submission_type in missing:
+            params.extend([place_id, submission_type])
+
+        cursor = connection.cursor()
+        cursor.execute(
+            'INSERT INTO {sets} (place_id, submission_type, length) '
+            'SELECT added.place_id, added.submission_type, 0 '
+            'FROM (VALUES {values}) AS added (place_id, submission_type) '
+            'WHERE NOT EXISTS (SELECT 1 FROM {sets} AS existing '
+            'WHERE existing.place_id = added.place_id '
+            'AND existing.submission_type = added.submission_type)'.format(
+                sets=connection.ops.quote_name(models.SubmissionSet._meta.db_table),
+                values=', '.join(['(%s, %s)'] * len(missing))),
+            params)
+        sets = find_submission_sets(keys)
+    return sets
+
+
+def lock_places(place_ids):
+    """
+    Lock the rows of the given places until the end of the transaction.
+    Anything that creates submission sets takes this lock first, so that
+    sets are created for a place by one request at a time (and each sees the
+    sets the others made).  The places are locked in order of id, so that
+    requests locking more than one can't deadlock.
+    """
+    list(models.Place.objects.select_for_update()
+         .filter(id__in=sorted(place_ids)).order_by('id')
+         .values_list('id', flat=True))
+
+
+def find_submission_sets(keys):
+    """
+    Get a dict of the ids of the submission sets that exist for the given
+    (place id, submission type) keys.
+    """
+    place_ids = set(place_id for place_id, _ in keys)
+    types = set(submission_type for _, submission_type in keys)
+    rows = (models.SubmissionSet.objects
+            .filter(place__in=place_ids, submission_type__in=types)
+            .values_list('place_id', 'submission_type', 'id'))
+    return dict(((place_id, submission_type), set_id)
+                for place_id, submission_type, set_id in rows
+                if (place_id, submission_type) in keys)
+
+
+def insert_submissions(dataset, submissions):
+    """
+    Insert a batch of cleaned submissions (see clean_submission) into the
+    dataset, and the activity for creating them.  The places are all looked
+    up in one query, and the submission sets in another (and any missing
+    ones are created in a few more).  Raises InvalidRecords if any of the
+    places aren't in the dataset.  Returns the new submissions' ids.
+    """
+    if not submissions:
+        return []
+
+    place_ids = set(submission['place_id'] for submission in submissions)
+    place_visibility = dict(models.Place.objects
+                            .filter(dataset=dataset, id__in=place_ids)
+                            .values_list('id', 'visible'))
+    errors = [{'record': submission['record'],
+               'detail': 'There is no place %s in the dataset' % submission['place_id']}
+              for submission in submissions
+              if submission['place_id'] not in place_visibility]
+    if errors:
+        raise InvalidRecords(errors)
+
+    sets = get_submission_sets(submissions)
+    parent_ids = [sets[(submission['place_id'], submission['submission_type'])]
+                  for submission in submissions]
+
+    ids = insert_things(dataset, submissions)
+
+    params = []
+    for submission_id, parent_id in zip(ids, parent_ids):
+        params.extend([submission_id, parent_id])
+
+    cursor = connection.cursor()
+    cursor.execute(
+        'INSERT INTO %s (submittedthing_ptr_id, parent_id) VALUES %s' % (
+            connection.ops.quote_name(models.Submission._meta.db_table),
+            ', '.join(['(%s, %s)'] * len(submissions))),
+        params)
+
+    # Keep the submission counts on the sets up to date, all in one go.
+    counts = {}
+    for parent_id in parent_ids:
+        counts[parent_id] = counts.get(parent_id, 0) + 1
+    params = []
+    for parent_id, count in counts.items():
+        params.extend([parent_id, count])
+    set_table = connection.ops.quote_name(models.SubmissionSet._meta.db_table)
+    cursor.execute(
+        'UPDATE {sets} SET length = {sets}.length + counts.added '
+        'FROM (VALUES {values}) AS counts (id, added) '
+        'WHERE {sets}.id = counts.id'.format(
+            sets=set_table,
+            values=', '.join(['(%s, %s)'] * len(counts))),
+        params)
+
+    models.Activity.objects.bulk_create([
+        models.Activity(action='create', data_id=submission_id,
+                        dataset_id=dataset.id,
+                        place_id=submission['place_id'],
+                        submission_type=submission['submission_type'],
+                        visible=place_visibility[submission['place_id']])
+        for submission_id, submission in zip(ids, submissions)])
+
+    if notifications.is_listen_supported():
+        notifications.notify_activity(dataset.owner.username, dataset.slug)
+
+    return ids
@@ -0,0 +1,280 @@
+"""
+Versioned caching for data that depends on the contents of a dataset.
+
+Cached data belongs to a scope: a single dataset, all of one owner's
+datasets, or everything.  Each scope has a version number in the cache, and
+cache keys for data in the scope include the version, so bumping the version
+effectively invalidates everything cached in that scope at once, without
+having to know what it is.  Bumping is a single atomic cache.incr, so it is
+safe for any number of processes to do it at the same time.
+
+Datasets are identified by their owner's username and their slug, rather
+than by id, so that views can work out the scope for a request from its URL
+without touching the database.
+
+Writes to a dataset only bump the dataset's own scope.  An owner's scope is
+only bumped when one of their datasets is made, changed or deleted, so data
+that also summarizes what is in the datasets (like the list of them) has to
+check their versions as well.  The global scope, used by the deprecated URLs
+that name no dataset, is never bumped; it would have to be on every write to
+every dataset.  Nothing is cached under it (see is_versioned).
+
+All of this only works if the cache is shared by every server process: a
+version bumped in one process's own memory goes unnoticed by the others,
+which would go on serving what they cached under the old version.  Callers
+that cache responses, or anything else that is invalidated by version or
+by forgetting it, check is_shared() first, and do without the cache when
+it is not.
+
+Changes made in a database transaction should only invalidate the cache
+once the transaction is committed; until then, the old data is all that
+anyone else can read, and anything cached from it under the new version
+would stay stale.  Within deferred_invalidation, versions are bumped and
+fragments forgotten when the (outermost) block exits instead, once each.
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+import threading
+import time
+
+# How long to keep a version number around.  When one expires, the next
+# version starts from the current time, which is always higher than any
+# version used before; expiry costs a cache miss, not stale data.
+VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+GLOBAL_SCOPE = 'global'
+
+
+def is_shared():
+    """
+    Whether the cache is shared by all of the server processes, so that
+    versions bumped (and fragments forgotten) in one process are seen by the
+    others.  A local-memory cache (Django's default) is only good enough when
+    there is a single server process, like the development server or the
+    tests, as the ``SA_API_SINGLE_PROCESS`` setting says.
+    """
+    return (not isinstance(cache, LocMemCache) or
+            getattr(settings, 'SA_API_SINGLE_PROCESS', False))
+
+
+def is_versioned(scope):
+    """
+    Whether the given scope's version is bumped when its data changes, so
+    that data in it can be cached.  Only the global scope's isn't.
+    """
+    return scope != GLOBAL_SCOPE
+
+
+def owner_scope(owner_username):
+    """
+    The scope for data about all of a user's datasets, such as the list of
+    them.
+    """
+    return 'owner:%s' % owner_username
+
+
+def dataset_scope(owner_username, dataset_slug):
+    """
+    The scope for data from a single dataset.
+    """
+    return 'dataset:%s/%s' % (owner_username, dataset_slug)
+
+
+def _version_key(scope):
+    return 'sa_api:version:%s' % scope
+
+
+def _modified_key(scope):
+    return 'sa_api:modified:%s' % scope
+
+
+def _new_version():
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    """
+    Get the current version number of the given scope.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            # Someone else got there first.
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(scope):
+    """
+    Change the version number of the given scope, invalidating anything
+    cached under the old one.  Returns the new version, or None if the bump
+    is deferred.
+    """
+    if _is_deferring():
+        _deferred.scopes.add(scope)
+        return None
+
+    cache.set(_modified_key(scope), time.time(), VERSION_TIMEOUT)
+
+    key = _version_key(scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The version is not in the cache (yet, or any more).
+        version = _new_version()
+        cache.set(key, version, VERSION_TIMEOUT)
+        return version
+
+
+def get_last_modified(scope):
+    """
+    Get the time (in seconds since the epoch) that the data in the given
+    scope last changed.  If that is not known, it is taken to be now.
+    """
+    key = _modified_key(scope)
+    modified = cache.get(key)
+    if modified is None:
+        modified = time.time()
+        if not cache.add(key, modified, VERSION_TIMEOUT):
+            modified = cache.get(key, modified)
+    return modified
+
+
+def bump_dataset(owner_username, dataset_slug):
+    """
+    Invalidate everything cached from a dataset's data.
+    """
+    bump_version(dataset_scope(owner_username, dataset_slug))
+
+
+def bump_owner(owner_username):
+    """
+    Invalidate everything cached about which datasets a user has.  Call this
+    when one of them is made, changed or deleted.
+    """
+    bump_version(owner_scope(owner_username))
+
+
+# The rendered JSON of single places and submissions (see
+# resources.PlannedSerializationMixin.filter_fragments).  Each thing's entry
+# is a tuple of its updated_datetime and a dict of the JSON rendered in each
+# context (e.g., for each host name that the URLs in it could point to).
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def _fragment_key(thing_id):
+    return 'sa_api:fragment:%s' % thing_id
+
+
+def get_fragments(thing_ids):
+    """
+    Get a dict of the cached fragment entries for the given things, by id.
+    Things that have nothing cached are left out, as is everything if the
+    cache is not shared.
+    """
+    if not is_shared():
+        return {}
+    keys = dict((_fragment_key(thing_id), thing_id) for thing_id in thing_ids)
+    entries = cache.get_many(keys.keys())
+    return dict((keys[key], entry) for key, entry in entries.iteritems())
+
+
+def set_fragments(entries):
+    """
+    Cache the given dict of fragment entries, by thing id, if the cache is
+    shared.
+    """
+    if not is_shared():
+        return
+    cache.set_many(dict((_fragment_key(thing_id), entry)
+                        for thing_id, entry in entries.iteritems()),
+                   FRAGMENT_TIMEOUT)
+
+
+def forget_fragments(thing_id):
+    if _is_deferring():
+        _deferred.thing_ids.add(thing_id)
+        return
+    cache.delete(_fragment_key(thing_id))
+
+
+# The invalidations held back by deferred_invalidation, for the current
+# thread.
+_deferred = threading.local()
+
+
+def _is_deferring():
+    return getattr(_deferred, 'depth', 0) > 0
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Hold back the scope versions bumped and fragments forgotten in the
+    block, and do each of them once, when the outermost such block exits.
+    They are done even if the block raises an exception; invalidating too
+    much only costs cache misses.
+    """
+    depth = getattr(_deferred, 'depth', 0)
+    if depth == 0:
+        _deferred.scopes = set()
+        _deferred.thing_ids = set()
+    _deferred.depth = depth + 1
+
+    try:
+        yield
+    finally:
+        _deferred.depth = depth
+        if depth == 0:
+            scopes, thing_ids = _deferred.scopes, _deferred.thing_ids
+            del _deferred.scopes, _deferred.thing_ids
+
+            if thing_ids:
+                cache.delete_many([_fragment_key(thing_id)
+                                   for thing_id in thing_ids])
+            for scope in scopes:
+                bump_version(scope)
+
+
+# Hit and miss counts for cached responses, kept in the cache itself so that
+# (with a shared cache) they add up the requests to all of the server
+# processes.
+STATS_TIMEOUT = VERSION_TIMEOUT
+STATS_OUTCOMES = ('hits', 'misses')
+
+
+def _stats_key(cache_prefix, outcome):
+    return 'sa_api:stats:%s:%s' % (cache_prefix, outcome)
+
+
+def count_request(cache_prefix, outcome):
+    """
+    Count a cache hit or miss (outcome should be 'hits' or 'misses') for the
+    responses cached under the given prefix.
+    """
+    key = _stats_key(cache_prefix, outcome)
+    cache.add(key, 0, STATS_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The count was evicted in between; losing one is not a big deal.
+        pass
+
+
+def get_stats(cache_prefix):
+    """
+    Get a dict of the hit and miss counts for the given prefix.
+    """
+    counts = cache.get_many([_stats_key(cache_prefix, outcome)
+                             for outcome in STATS_OUTCOMES])
+    return dict((outcome, counts.get(_stats_key(cache_prefix, outcome), 0))
+                for outcome in STATS_OUTCOMES)
+
+
+def reset_stats(cache_prefix):
+    cache.delete_many([_stats_key(cache_prefix, outcome)
+                       for outcome in STATS_OUTCOMES])
@@ -0,0 +1,137 @@
+"""
+Filtering places and submissions on the attributes in their data blobs.
+
+On PostgreSQL 9.4 and later, the data blobs are stored in a ``jsonb`` column
+(see models.JSONTextField), and filters are given in the query string as
+``data.<attribute>=<value>``:
+
+    /places/?data.category=bike_lane
+    /places/?data.status__in=proposed,approved
+    /places/?data.address.city=Philadelphia
+
+Each filter becomes a containment test (``data @> '{"category": ...}'``),
+which can use the GIN index on the column.  Values are matched as strings,
+and also as numbers, booleans or null when they parse as such, so that
+``data.votes=5`` matches both ``"5"`` and ``5``.
+"""
+from django.db import connection
+import json
+
+PREFIX = 'data.'
+OPERATORS = ('exact', 'in')
+
+
+def supports_jsonb(connection):
+    """
+    Check whether the database has a jsonb type to keep the data blobs in.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.connection is None:
+        # pg_version is read off of the open connection.
+        connection.cursor()
+    return connection.pg_version >= 90400
+
+
+def register_jsonb_as_text():
+    """
+    Have psycopg2 hand back jsonb values as the JSON strings they are sent
+    as, rather than decoding them, so that the data blobs can be treated as
+    text whichever way they are stored.
+    """
+    try:
+        from psycopg2.extras import register_default_jsonb
+    except ImportError:
+        # Either there's no psycopg2, or it's old enough that it returns
+        # jsonb as strings anyway.
+        return
+    register_default_jsonb(globally=True, loads=lambda value: value)
+
+
+def parse_data_filters(params):
+    """
+    Get a list of (attribute path, operator, list of values) for the data
+    filters in the given query string parameters.  Raises ValueError if a
+    filter is malformed.
+    """
+    filters = []
+    for name, values in sorted(params.lists()):
+        if not name.startswith(PREFIX):
+            continue
+
+        path, _, operator = name[len(PREFIX):].partition('__')
+        operator = operator or 'exact'
+        path = path.split('.')
+
+        if not all(path):
+            raise ValueError('%s is not a valid data attribute' % name)
+        if operator not in OPERATORS:
+            raise ValueError('%s is not a valid data filter; use one of %s'
+                             % (name, ', '.join(OPERATORS)))
+
+        if operator == 'in':
+            values = [value for value_list in values
+                      for value in value_list.split(',')]
+        filters.append((path, operator, values))
+    return filters
+
+
+def get_candidates(value):
+    """
+    Get the JSON values that a query string value should match.
+    """
+    def reject_constant(constant):
+        # NaN and Infinity aren't valid JSON as far as PostgreSQL is concerned.
+        raise ValueError(constant)
+
+    candidates = [value]
+    try:
+        parsed = json.loads(value, parse_constant=reject_constant)
+    except ValueError:
+        pass
+    else:
+        if not isinstance(parsed, (basestring, list, dict)):
+            candidates.append(parsed)
+    return candidates
+
+
+def make_document(path, value):
+    """
+    Make the JSON document that a data blob with the given value at the given
+    attribute path contains.
+    """
+    document = value
+    for key in reversed(path):
+        document = {key: document}
+    return json.dumps(document)
+
+
+def filter_by_data(queryset, params):
+    """
+    Apply the data filters in the given query string parameters to a queryset
+    of SubmittedThings (or things that inherit from SubmittedThing).
+    """
+    from . import models
+
+    filters = parse_data_filters(params)
+    if not filters:
+        return queryset
+
+    if not supports_jsonb(connection):
+        raise ValueError('data filters are not supported by this server')
+
+    column = '%s.%s' % (
+        connection.ops.quote_name(models.SubmittedThing._meta.db_table),
+        connection.ops.quote_name(
+            models.SubmittedThing._meta.get_field('data').column))
+
+    # The data column may not be joined into the queryset (e.g., when only the
+    # place ids are selected), so match the things in a subquery of their own.
+    things = models.SubmittedThing.objects.all()
+    for path, operator, values in filters:
+        documents = [make_document(path, candidate)
+                     for value in values
+                     for candidate in get_candidates(value)]
+        where = ' OR '.join(['%s @> %%s::jsonb' % column] * len(documents))
+        things = things.extra(where=['(%s)' % where], params=documents)
+    return queryset.filter(pk__in=things.values('pk'))
@@ -43,5 +43,6 @@ class ActivityForm (forms.Form):
     after = forms.IntegerField(required=False)
     limit = forms.IntegerField(required=False)
     visible = forms.CharField(required=False)
+    wait = forms.IntegerField(required=False, min_value=0)
 
     format = forms.CharField(required=False)
@@ -0,0 +1,103 @@
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.client import RequestFactory
+from sa_api import models
+from sa_api import views
+import json
+import time
+
+
+class Command (BaseCommand):
+    help = ('Time creating and updating places and submissions through the '
+            'API views, and count the queries each write takes.  The writes '
+            'are committed as they would be for real requests, to a made up '
+            'dataset that is deleted afterwards.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--writes',
+            type='int',
+            dest='writes',
+            default=200,
+            help='The number of writes of each kind to make (default 200).'),
+    )
+
+    def call(self, view_class, method, url_name, data, **kwargs):
+        request = getattr(RequestFactory(), method)(
+            reverse(url_name, kwargs=kwargs), data=json.dumps(data),
+            content_type='application/json')
+        request.user = self.owner
+        # As the test client does; the request has no CSRF cookie.
+        request._dont_enforce_csrf_checks = True
+
+        response = view_class.as_view()(request, **kwargs)
+        if response.status_code >= 400:
+            raise Exception('%s %s failed (%s): %s' % (
+                method.upper(), request.path, response.status_code,
+                response.content))
+        return json.loads(response.content)
+
+    def measure(self, label, write, count):
+        """
+        Make count writes, and report the time they took, and the number of
+        queries they made, on average.
+        """
+        times = []
+        queries = 0
+        for i in range(count):
+            start_queries = len(connection.queries)
+            start = time.time()
+            write(i)
+            times.append(time.time() - start)
+            queries += len(connection.queries) - start_queries
+
+        times.sort()
+        self.stdout.write('%-18s %8.2fms %8.2fms %8.1f\n' % (
+            label, 1000 * sum(times) / count, 1000 * times[count // 2],
+            float(queries) / count))
+
+    def handle(self, *args, **options):
+        count = options['writes']
+        self.owner = User.objects.create(username='benchmark-writes')
+        dataset = models.DataSet.objects.create(owner=self.owner,
+                                                slug='benchmark')
+        dataset_kwargs = {'dataset__owner__username': self.owner.username,
+                          'dataset__slug': dataset.slug}
+        place_ids = []
+
+        def create_place(i):
+            place = self.call(
+                views.PlaceCollectionView, 'post', 'place_collection_by_dataset',
+                {'location': {'lat': i % 90, 'lng': i % 180},
+                 'name': 'Place %s' % i, 'submitter_name': 'Benchmark'},
+                **dataset_kwargs)
+            place_ids.append(place['id'])
+
+        def update_place(i):
+            self.call(
+                views.PlaceInstanceView, 'put', 'place_instance_by_dataset',
+                {'location': {'lat': i % 90, 'lng': i % 180},
+                 'name': 'Place %s, updated' % i, 'visible': True},
+                pk=place_ids[i], **dataset_kwargs)
+
+        def create_submission(i):
+            self.call(
+                views.SubmissionCollectionView, 'post',
+                'submission_collection_by_dataset',
+                {'comment': 'Comment %s' % i, 'submitter_name': 'Benchmark'},
+                place_id=place_ids[i], submission_type='comments',
+                **dataset_kwargs)
+
+        connection.use_debug_cursor = True
+        try:
+            self.stdout.write('%-18s %10s %10s %8s\n' % (
+                'Write', 'Mean', 'Median', 'Queries'))
+            self.measure('Create place', create_place, count)
+            self.measure('Update place', update_place, count)
+            self.measure('Create submission', create_submission, count)
+        finally:
+            connection.use_debug_cursor = None
+            dataset.delete()
+            self.owner.delete()
@@ -0,0 +1,37 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from sa_api import caching
+from sa_api import views
+
+
+class Command (BaseCommand):
+    help = 'Show the cache hits and misses for each cached API view.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--reset',
+            action='store_true',
+            dest='reset',
+            default=False,
+            help='Start counting again from zero after showing the counts.'),
+    )
+
+    def get_cache_prefixes(self):
+        prefixes = set()
+        for obj in vars(views).itervalues():
+            if (isinstance(obj, type) and issubclass(obj, views.CachedMixin)
+                and obj is not views.CachedMixin):
+                prefix = obj.cache_prefix
+                if isinstance(prefix, basestring):
+                    prefixes.add(prefix)
+        return sorted(prefixes)
+
+    def handle(self, *args, **options):
+        for prefix in self.get_cache_prefixes():
+            stats = caching.get_stats(prefix)
+            total = stats['hits'] + stats['misses']
+            hit_rate = (100.0 * stats['hits'] / total) if total else 0
+            self.stdout.write('%s: %s hits, %s misses (%.1f%% hit rate)\n' % (
+                prefix, stats['hits'], stats['misses'], hit_rate))
+
+            if options['reset']:
+                caching.reset_stats(prefix)
@@ -0,0 +1,83 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from sa_api import bulk
+from sa_api import models
+from sa_api import transactions
+import os.path
+import sys
+
+
+class Command (BaseCommand):
+    args = '<owner> <dataset slug> <file>'
+    help = ('Import places into a dataset from a GeoJSON, newline-delimited '
+            'JSON, or CSV file (use - to read from standard input).  Places '
+            'are committed a batch at a time; if a batch has an invalid '
+            'place, the import stops before it, and the errors are '
+            'reported.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+            dest='format',
+            choices=sorted(bulk.READERS),
+            default=None,
+            help='The format of the file: geojson, json, ndjson or csv.  By '
+                 'default, it is guessed from the file name.'),
+        make_option('--batch-size',
+            type='int',
+            dest='batch_size',
+            default=bulk.BATCH_SIZE,
+            help='The number of places to insert at a time (default %s).'
+                 % bulk.BATCH_SIZE),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 3:
+            raise CommandError('Usage: import_places %s' % self.args)
+        owner, slug, filename = args
+        verbosity = int(options.get('verbosity', 1))
+
+        try:
+            dataset = models.DataSet.objects.get(owner__username=owner, slug=slug)
+        except models.DataSet.DoesNotExist:
+            raise CommandError('There is no dataset %s/%s' % (owner, slug))
+
+        format = options['format']
+        if format is None:
+            format = os.path.splitext(filename)[1].lstrip('.').lower()
+        if format not in bulk.READERS:
+            raise CommandError('Give the --format of %s' % filename)
+
+        stream = sys.stdin if filename == '-' else open(filename, 'rb')
+        records = bulk.READERS[format](stream)
+        batches = bulk.iter_batches(records, bulk.clean_place,
+                                    options['batch_size'])
+
+        created = 0
+        try:
+            while True:
+                # Each batch can be seen as soon as it is committed.
+                with transactions.write_transaction():
+                    try:
+                        batch = next(batches)
+                    except StopIteration:
+                        break
+                    created += len(bulk.insert_places(dataset, batch))
+                    dataset.invalidate_caches()
+
+                if verbosity > 1:
+                    self.stdout.write('Imported %s places\n' % created)
+
+        except bulk.InvalidRecords, e:
+            for error in e.errors:
+                self.stderr.write('Place %(record)s: %(detail)s\n' % error)
+            raise CommandError('%s; %s places were imported before them'
+                               % (e, created))
+        except ValueError, e:
+            raise CommandError('%s; %s places were imported' % (e, created))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if verbosity > 0:
+            self.stdout.write('Imported %s places into %s/%s\n'
+                              % (created, owner, slug))
@@ -0,0 +1,52 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sa_api import bulk
+from sa_api import submission_queue
+import time
+
+
+class Command (BaseCommand):
+    help = ('Save queued submissions (see SA_API_QUEUED_SUBMISSION_TYPES) a '
+            'batch at a time, and keep waiting for more, unless --once is '
+            'given.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            type='int',
+            dest='batch_size',
+            default=bulk.BATCH_SIZE,
+            help='The most submissions to save at a time (default %s).'
+                 % bulk.BATCH_SIZE),
+        make_option('--interval',
+            type='float',
+            dest='interval',
+            default=1,
+            help='How long, in seconds, to wait before checking the queue '
+                 'again when it is empty (default 1).'),
+        make_option('--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Exit once the queue is empty, instead of waiting for more.'),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        total = 0
+
+        while True:
+            saved = submission_queue.process_batch(options['batch_size'])
+            total += saved
+            if saved and verbosity > 1:
+                self.stdout.write('Saved %s queued submissions\n' % saved)
+
+            if not saved:
+                if options['once']:
+                    break
+                # Don't sit idle in the transaction that looked at the queue.
+                transaction.commit_unless_managed()
+                time.sleep(options['interval'])
+
+        if verbosity > 0:
+            self.stdout.write('Saved %s queued submissions in all\n' % total)
@@ -0,0 +1,57 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from sa_api import models
+
+
+class Command (BaseCommand):
+    help = ('Check the stored number of submissions in each submission set '
+            'against the actual count, and fix any that are wrong.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--verify',
+            action='store_true',
+            dest='verify',
+            default=False,
+            help='Only report the submission sets with wrong counts; do not '
+                 'fix them.  Exits with an error if any are found.'),
+    )
+
+    @transaction.commit_on_success
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+
+        qs = models.SubmissionSet.objects.values('id', 'length').order_by()
+        qs = qs.annotate(actual=Count('children'))
+        wrong = [(row['id'], row['length'], row['actual'])
+                 for row in qs if row['length'] != row['actual']]
+
+        if verbosity > 1:
+            for set_id, length, actual in wrong:
+                self.stdout.write('Submission set %s has length %s, but %s '
+                                  'submissions\n' % (set_id, length, actual))
+
+        if options['verify']:
+            if wrong:
+                raise CommandError('%s submission set(s) have the wrong '
+                                   'length' % len(wrong))
+            if verbosity > 0:
+                self.stdout.write('All submission set lengths are correct\n')
+            return
+
+        # Recount in the UPDATE itself, so that a submission made since the
+        # check above is not lost.
+        set_table = models.SubmissionSet._meta.db_table
+        submission_table = models.Submission._meta.db_table
+        cursor = connection.cursor()
+        for set_id, _, _ in wrong:
+            cursor.execute(
+                'UPDATE {0} SET length = ('
+                '  SELECT COUNT(*) FROM {1} WHERE {1}.parent_id = {0}.id'
+                ') WHERE id = %s'.format(set_table, submission_table),
+                [set_id])
+
+        if verbosity > 0:
+            self.stdout.write('Fixed the length of %s submission set(s)\n'
+                              % len(wrong))
@@ -1,6 +1,40 @@
 from django.contrib.auth import models as auth_models
 from django.contrib.gis.db import models
-from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from . import caching
+from . import datafilters
+from . import notifications
+from . import transactions
+import json
+
+datafilters.register_jsonb_as_text()
+
+
+class JSONTextField (models.TextField):
+    """
+    A JSON document, kept as a string.  On servers that have it, the column
+    is jsonb, so that the attributes in the document can be filtered on and
+    indexed; the value is still read and written as a JSON string.
+    """
+    def db_type(self, connection):
+        if datafilters.supports_jsonb(connection):
+            return 'jsonb'
+        return super(JSONTextField, self).db_type(connection)
+
+    def validate(self, value, model_instance):
+        super(JSONTextField, self).validate(value, model_instance)
+        try:
+            json.loads(value)
+        except (TypeError, ValueError):
+            raise ValidationError('Enter valid JSON.')
+
+
+try:
+    from south.modelsinspector import add_introspection_rules
+except ImportError:
+    pass
+else:
+    add_introspection_rules([], [r'^sa_api\.models\.JSONTextField'])
 
 
 class TimeStampedModel (models.Model):
@@ -18,21 +52,52 @@ class SubmittedThing (TimeStampedModel):
 
     """
     submitter_name = models.CharField(max_length=256, null=True, blank=True)
-    data = models.TextField(default='{}')
+    data = JSONTextField(default='{}')
     dataset = models.ForeignKey('DataSet', related_name='submitted_thing_set',
                                 blank=True)
 
     def save(self, *args, **kwargs):
         is_new = (self.id == None)
 
-        ret = super(SubmittedThing, self).save(*args, **kwargs)
+        # A new thing's rows are inserted without first checking whether
+        # they exist, as they can't.
+        if is_new and not args and not kwargs.get('force_update'):
+            kwargs['force_insert'] = True
+
+        # The thing and its activity are saved in one transaction (though
+        # with an INSERT each, as the activity needs the thing's id), and the
+        # caches are invalidated once it is all committed.
+        with transactions.write_transaction():
+            ret = super(SubmittedThing, self).save(*args, **kwargs)
 
-        # All submitted things generate an action.
-        activity = Activity()
-        activity.action = 'create' if is_new else 'update'
-        activity.data = self
-        activity.save()
+            # All submitted things generate an action.  Its details are
+            # copied from the thing as it is, without looking anything up
+            # again, if the thing's relations are already loaded.
+            activity = Activity()
+            activity.action = 'create' if is_new else 'update'
+            activity.data = self
+            activity.dataset = self.dataset
+            activity.save()
 
+            caching.forget_fragments(self.id)
+            self.dataset.invalidate_caches()
+        return ret
+
+    def get_activity_details(self):
+        """
+        Get the attributes of this thing that are copied onto its activity,
+        so that the activity feed can be listed and filtered without looking
+        at the things themselves.
+        """
+        return {}
+
+    def delete(self, *args, **kwargs):
+        dataset = self.dataset
+        thing_id = self.id
+        with transactions.write_transaction():
+            ret = super(SubmittedThing, self).delete(*args, **kwargs)
+            caching.forget_fragments(thing_id)
+            dataset.invalidate_caches()
         return ret
 
 
@@ -48,6 +113,38 @@ class DataSet (models.Model):
     def __unicode__(self):
         return self.slug
 
+    def save(self, *args, **kwargs):
+        # If the dataset is being renamed (or given to someone else), anything
+        # cached under the old name is out of date as well.
+        old_names = []
+        if self.pk is not None:
+            old_names = list(DataSet.objects.filter(pk=self.pk)
+                             .exclude(slug=self.slug, owner=self.owner_id)
+                             .values_list('owner__username', 'slug'))
+
+        ret = super(DataSet, self).save(*args, **kwargs)
+
+        for owner_username, old_slug in old_names:
+            caching.bump_dataset(owner_username, old_slug)
+            caching.bump_owner(owner_username)
+        self.invalidate_caches()
+        caching.bump_owner(self.owner.username)
+        return ret
+
+    def delete(self, *args, **kwargs):
+        owner_username, slug = self.owner.username, self.slug
+        ret = super(DataSet, self).delete(*args, **kwargs)
+        caching.bump_dataset(owner_username, slug)
+        caching.bump_owner(owner_username)
+        return ret
+
+    def invalidate_caches(self):
+        """
+        Invalidate any cached data from this dataset.  Call this after any
+        change to the data in it.
+        """
+        caching.bump_dataset(self.owner.username, self.slug)
+
     class Meta:
         unique_together = (('owner', 'slug'),
                            )
@@ -65,11 +162,23 @@ class Place (SubmittedThing):
     objects = models.GeoManager()
 
     def save(self, *args, **kwargs):
-        keys = cache.get('place_collection_keys') or set()
-        keys.add('place_collection_keys')
-        cache.delete_many(keys)
+        is_new = (self.id == None)
 
-        return super(Place, self).save(*args, **kwargs)
+        with transactions.write_transaction():
+            ret = super(Place, self).save(*args, **kwargs)
+
+            # Activity on the place and its submissions is only as visible as
+            # the place is.  A new place's only activity was just created
+            # with its visibility.
+            if not is_new:
+                Activity.objects.filter(place_id=self.id)\
+                    .exclude(visible=self.visible)\
+                    .update(visible=self.visible)
+        return ret
+
+    def get_activity_details(self):
+        return {'place_id': self.id,
+                'visible': self.visible}
 
 
 class SubmissionSet (models.Model):
@@ -82,10 +191,48 @@ class SubmissionSet (models.Model):
     place = models.ForeignKey(Place, related_name='submission_sets')
     submission_type = models.CharField(max_length=128)
 
+    # The number of Submissions in the set.  This is kept up to date when
+    # submissions are saved and deleted (see update_submission_counts), so
+    # that place listings do not have to count submissions; the
+    # rebuild_submission_counts management command will verify and repair
+    # it.
+    length = models.PositiveIntegerField(default=0)
+
     class Meta(object):
         unique_together = (('place', 'submission_type'),
                            )
 
+    def save(self, *args, **kwargs):
+        is_new = (self.id == None)
+
+        # A new set has no submissions yet, so there is nothing to keep in
+        # step with it, and nothing shows it.
+        if is_new:
+            return super(SubmissionSet, self).save(*args, **kwargs)
+
+        with transactions.write_transaction():
+            # The place a set was on shows its submissions as well.
+            thing_ids = set([self.place_id])
+            thing_ids.update(SubmissionSet.objects.filter(id=self.id)
+                             .values_list('place_id', flat=True))
+
+            ret = super(SubmissionSet, self).save(*args, **kwargs)
+
+            # Keep the activity on the set's submissions in step, if it is
+            # moved.
+            Activity.objects.filter(data__submission__parent=self)\
+                .exclude(place_id=self.place_id, submission_type=self.submission_type)\
+                .update(place_id=self.place_id, submission_type=self.submission_type)
+
+            # The set's submissions are rendered with its place and type, and
+            # its place with its submissions, so none of their cached data is
+            # good any more.
+            thing_ids.update(self.children.values_list('id', flat=True))
+            for thing_id in thing_ids:
+                caching.forget_fragments(thing_id)
+            self.place.dataset.invalidate_caches()
+        return ret
+
 
 class Submission (SubmittedThing):
     """
@@ -95,6 +242,71 @@ class Submission (SubmittedThing):
     """
     parent = models.ForeignKey(SubmissionSet, related_name='children')
 
+    def __init__(self, *args, **kwargs):
+        super(Submission, self).__init__(*args, **kwargs)
+        # The set that the submission is counted in, if it has been saved;
+        # see update_submission_counts.
+        self.counted_parent_id = self.parent_id if self.id is not None else None
+
+    def get_activity_details(self):
+        return {'place_id': self.parent.place_id,
+                'submission_type': self.parent.submission_type,
+                'visible': self.parent.place.visible}
+
+
+def update_submission_counts(sender, instance, **kwargs):
+    """
+    Keep the lengths of submission sets in step with their submissions, as
+    submissions are saved (whether new or moved to another set) and deleted.
+
+    This is done on the model's signals, rather than in Submission.save and
+    .delete, so that it also happens for submissions deleted through a
+    queryset (e.g., the admin's "delete selected" action), or along with
+    their places.  The counts are changed in the database rather than on the
+    parent instances, so that concurrent submissions to the same set don't
+    clobber each other.  Submissions saved while loading fixtures are left
+    alone, like the rest of their data.
+    """
+    if kwargs.get('raw'):
+        return
+
+    deleted = 'created' not in kwargs
+    old_parent_id = None if kwargs.get('created') else instance.counted_parent_id
+    new_parent_id = None if deleted else instance.parent_id
+    if old_parent_id == new_parent_id:
+        return
+
+    with transactions.write_transaction():
+        if old_parent_id is not None:
+            SubmissionSet.objects.filter(id=old_parent_id, length__gt=0)\
+                .update(length=models.F('length') - 1)
+        if new_parent_id is not None:
+            SubmissionSet.objects.filter(id=new_parent_id)\
+                .update(length=models.F('length') + 1)
+        instance.counted_parent_id = new_parent_id
+
+        # The places show their submission counts.  (Submissions that are
+        # saved or deleted one at a time have done this already.)
+        if deleted:
+            caching.forget_fragments(instance.id)
+            instance.dataset.invalidate_caches()
+
+models.signals.post_save.connect(update_submission_counts, sender=Submission)
+models.signals.post_delete.connect(update_submission_counts, sender=Submission)
+
+
+class QueuedSubmission (models.Model):
+    """
+    A submission that has been accepted, but not saved yet, as its type is
+    queued (see the submission_queue module).  Its id is the provisional id
+    that the client was given for it.
+    """
+    place = models.ForeignKey(Place, related_name='queued_submissions')
+    submission_type = models.CharField(max_length=128)
+    submitter_name = models.CharField(max_length=256, null=True, blank=True)
+    data = models.TextField(default='{}')
+    created_datetime = models.DateTimeField(auto_now_add=True)
+
 
 class Activity (TimeStampedModel):
     """
@@ -104,12 +316,33 @@ class Activity (TimeStampedModel):
     action = models.CharField(max_length=16, default='create')
     data = models.ForeignKey(SubmittedThing)
 
+    # Copied from the thing when the activity is first saved (see
+    # SubmittedThing.get_activity_details), so that a dataset's activity can
+    # be listed without joining to the things.  Places have no
+    # submission_type.  There is also an index on (dataset, id), which Django
+    # cannot declare; see migration 0027.
+    dataset = models.ForeignKey('DataSet', null=True, blank=True)
+    place_id = models.IntegerField(null=True, blank=True, db_index=True)
+    submission_type = models.CharField(max_length=128, null=True, blank=True)
+    visible = models.BooleanField(default=True)
+
     def save(self, *args, **kwargs):
-        keys = cache.get('activity_keys') or set()
-        keys.add('activity_keys')
-        cache.delete_many(keys)
+        if self.dataset_id is None:
+            self.dataset = self.data.dataset
+        if self.pk is None:
+            for attr, value in self.data.get_activity_details().items():
+                setattr(self, attr, value)
+
+        ret = super(Activity, self).save(*args, **kwargs)
 
-        return super(Activity, self).save(*args, **kwargs)
+        # Wake up anyone waiting for new activity in the dataset.  The
+        # dataset is the one the thing was saved with, so its owner is
+        # normally loaded already (the views select it along with the
+        # dataset).
+        if notifications.is_listen_supported():
+            dataset = self.dataset
+            notifications.notify_activity(dataset.owner.username, dataset.slug)
+        return ret
 
     @property
     def submitter_name(self):
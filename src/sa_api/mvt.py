@@ -0,0 +1,161 @@
+"""
+A small encoder for Mapbox Vector Tiles (version 2 of the specification)
+that contain only points.
+
+See https://github.com/mapbox/vector-tile-spec for the format.  Only the
+parts of the protocol buffer encoding that a tile of points needs are
+implemented here.
+"""
+import math
+import struct
+
+DEFAULT_EXTENT = 4096
+
+# Geometry types and commands
+POINT = 1
+MOVE_TO = 1
+
+# Protocol buffer wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+
+def tile_bounds(z, x, y):
+    """
+    Return the (west, south, east, north) bounds, in degrees of longitude and
+    latitude, of a web mercator tile.
+    """
+    n = 2.0 ** z
+
+    def lng(tile_x):
+        return tile_x / n * 360.0 - 180.0
+
+    def lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return (lng(x), lat(y + 1), lng(x + 1), lat(y))
+
+
+def project(lng, lat, z, x, y, extent=DEFAULT_EXTENT):
+    """
+    Return the integer position of a longitude/latitude point within a web
+    mercator tile, with the origin at the tile's top left corner.
+    """
+    n = 2.0 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    lat_rad = math.radians(lat)
+
+    world_x = (lng + 180.0) / 360.0 * n
+    world_y = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n
+
+    return (int(round((world_x - x) * extent)),
+            int(round((world_y - y) * extent)))
+
+
+def encode_points(layer_name, features, z, x, y, extent=DEFAULT_EXTENT):
+    """
+    Encode a tile with a single layer of points.  Each feature should be a
+    tuple of (id, lng, lat, properties), where properties is a dict.  Only
+    string, number and boolean property values can be encoded; any others
+    are left out.
+    """
+    keys = {}
+    values = {}
+    encoded_features = []
+
+    for feature_id, lng, lat, properties in features:
+        tags = []
+        for key, value in properties.iteritems():
+            value_key = _value_key(value)
+            if value_key is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value_key, len(values)))
+
+        px, py = project(lng, lat, z, x, y, extent)
+        geometry = [_command(MOVE_TO, 1), _zigzag(px), _zigzag(py)]
+
+        feature = []
+        if feature_id is not None:
+            feature.append(_field(1, VARINT, _varint(feature_id)))
+        if tags:
+            feature.append(_packed(2, tags))
+        feature.append(_field(3, VARINT, _varint(POINT)))
+        feature.append(_packed(4, geometry))
+        encoded_features.append(''.join(feature))
+
+    layer = [_field(15, VARINT, _varint(2)),
+             _bytes_field(1, _utf8(layer_name))]
+    layer.extend(_bytes_field(2, feature) for feature in encoded_features)
+    layer.extend(_bytes_field(3, _utf8(key))
+                 for key in sorted(keys, key=keys.get))
+    layer.extend(_bytes_field(4, _encode_value(value_key))
+                 for value_key in sorted(values, key=values.get))
+    layer.append(_field(5, VARINT, _varint(extent)))
+
+    return _bytes_field(3, ''.join(layer))
+
+
+def _value_key(value):
+    # Values are told apart by type as well, so that True, 1 and 1.0 each get
+    # their own entry in the layer's value table.
+    if isinstance(value, bool):
+        return ('bool', value)
+    elif isinstance(value, (int, long)):
+        return ('int', value)
+    elif isinstance(value, float):
+        return ('float', value)
+    elif isinstance(value, basestring):
+        return ('string', value)
+    else:
+        return None
+
+
+def _encode_value(value_key):
+    value_type, value = value_key
+    if value_type == 'string':
+        return _bytes_field(1, _utf8(value))
+    elif value_type == 'float':
+        return _field(3, FIXED64, struct.pack('<d', value))
+    elif value_type == 'bool':
+        return _field(7, VARINT, _varint(int(value)))
+    elif value >= 0:
+        return _field(5, VARINT, _varint(value))
+    else:
+        return _field(6, VARINT, _varint(_zigzag(value)))
+
+
+def _utf8(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+
+def _varint(n):
+    parts = []
+    while n > 0x7f:
+        parts.append(chr((n & 0x7f) | 0x80))
+        n >>= 7
+    parts.append(chr(n))
+    return ''.join(parts)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _field(number, wire_type, payload):
+    return _varint((number << 3) | wire_type) + payload
+
+
+def _bytes_field(number, payload):
+    return _field(number, LENGTH_DELIMITED, _varint(len(payload)) + payload)
+
+
+def _packed(number, ints):
+    return _bytes_field(number, ''.join(_varint(n) for n in ints))
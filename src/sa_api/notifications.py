@@ -0,0 +1,260 @@
+"""
+Waiting for new activity, so that clients can long-poll the activity feed
+instead of asking for it over and over.
+
+When the database is PostgreSQL, every saved activity is announced with a
+NOTIFY on the ``sa_api_activity`` channel (it is only delivered once the
+transaction commits).  Each server process keeps one extra connection that
+LISTENs on the channel in a background thread, and wakes up the requests in
+that process that are waiting on the activity's dataset.
+
+With other databases, or if listening fails, waiting requests fall back to
+checking the version of their cache scope (see the caching module) every
+``POLL_INTERVAL`` seconds, which costs a cache read rather than a query.
+The version is checked even while listening, less often, in case the
+listener misses something (e.g., while it is reconnecting).
+
+Versions bumped by other processes can only be seen in a shared cache (see
+caching.is_shared).  Without a listener or a shared cache, waiting requests
+just check the database for new activity every ``POLL_INTERVAL`` seconds.
+So do requests waiting on the global scope, which has no version to check
+(see caching.is_versioned), when there is no listener.
+"""
+from . import caching
+from django.conf import settings
+from django.db import connection
+import logging
+import select
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'sa_api_activity'
+
+# How often, in seconds, to check the cache scope version when there is no
+# listener, and when there is.
+POLL_INTERVAL = 1
+LISTENING_POLL_INTERVAL = 10
+
+# How long, in seconds, the listener waits on its connection at a time, waits
+# for its connection to be made, and waits before reconnecting after an error.
+LISTEN_TIMEOUT = 5
+CONNECT_TIMEOUT = 10
+RECONNECT_DELAY = 5
+
+
+def is_listen_supported():
+    return (connection.vendor == 'postgresql' and
+            getattr(settings, 'SA_API_ACTIVITY_LISTEN', True))
+
+
+def notify_activity(owner_username, dataset_slug):
+    """
+    Announce new activity in the given dataset to the processes waiting on
+    it.  Does nothing unless the database is PostgreSQL.
+    """
+    if not is_listen_supported():
+        return
+
+    cursor = connection.cursor()
+    cursor.execute('SELECT pg_notify(%s, %s)',
+                   [CHANNEL, '%s/%s' % (owner_username, dataset_slug)])
+
+
+def scopes_for_payload(payload):
+    """
+    Get the cache scopes that activity announced with the given payload
+    belongs to.
+    """
+    owner_username, dataset_slug = payload.split('/', 1)
+    return [caching.dataset_scope(owner_username, dataset_slug),
+            caching.owner_scope(owner_username),
+            caching.GLOBAL_SCOPE]
+
+
+class ActivityListener (object):
+    """
+    Listens for activity notifications on a connection of its own, in a
+    background thread, and wakes up the threads waiting on them.
+    """
+    def __init__(self, channel=CHANNEL):
+        self.channel = channel
+        self.lock = threading.Lock()
+        self.waiters = {}
+        self.thread = None
+
+    def wait(self, scope, timeout):
+        """
+        Wait until there is new activity in the given cache scope, or the
+        timeout (in seconds) runs out.  Return whether there was activity.
+        """
+        event = threading.Event()
+        with self.lock:
+            self.waiters.setdefault(scope, set()).add(event)
+            self.start()
+
+        try:
+            event.wait(timeout)
+            return event.is_set()
+        finally:
+            with self.lock:
+                events = self.waiters.get(scope, set())
+                events.discard(event)
+                if not events:
+                    self.waiters.pop(scope, None)
+
+    def wake(self, payload):
+        with self.lock:
+            for scope in scopes_for_payload(payload):
+                for event in self.waiters.get(scope, ()):
+                    event.set()
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run,
+                                           name='sa_api activity listener')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def connect(self):
+        """
+        Connect to the database and LISTEN on the channel, giving up after
+        ``CONNECT_TIMEOUT`` seconds.
+
+        The connection is asynchronous (and so in autocommit mode), and is
+        waited on with select(), as in listen().  libpq's own connect_timeout
+        doesn't apply once psycogreen has made psycopg2 cooperative (see
+        src/project/gunicorn_gevent.py), so a database that stopped answering
+        could otherwise keep the listener from ever reconnecting.
+        """
+        import psycopg2
+
+        db = settings.DATABASES['default']
+        params = {'database': db['NAME']}
+        for key, param in [('USER', 'user'), ('PASSWORD', 'password'),
+                           ('HOST', 'host'), ('PORT', 'port')]:
+            if db.get(key):
+                params[param] = db[key]
+
+        deadline = time.time() + CONNECT_TIMEOUT
+        listen_connection = psycopg2.connect(async=True, **params)
+        try:
+            self.wait_until_ready(listen_connection, deadline)
+            listen_connection.cursor().execute('LISTEN %s' % self.channel)
+            self.wait_until_ready(listen_connection, deadline)
+        except:
+            listen_connection.close()
+            raise
+        return listen_connection
+
+    def wait_until_ready(self, listen_connection, deadline):
+        """
+        Wait for the asynchronous connection to finish what it is doing, or
+        raise an OperationalError if it hasn't by the deadline.
+        """
+        import psycopg2
+        import psycopg2.extensions
+
+        while True:
+            state = listen_connection.poll()
+            if state == psycopg2.extensions.POLL_OK:
+                return
+
+            timeout = max(deadline - time.time(), 0)
+            if state == psycopg2.extensions.POLL_READ:
+                ready = select.select([listen_connection], [], [], timeout)[0]
+            elif state == psycopg2.extensions.POLL_WRITE:
+                ready = select.select([], [listen_connection], [], timeout)[1]
+            else:
+                raise psycopg2.OperationalError(
+                    'Unexpected state from the listening connection: %s' % state)
+
+            if not ready:
+                raise psycopg2.OperationalError(
+                    'Timed out after %s seconds connecting to listen for '
+                    'activity' % CONNECT_TIMEOUT)
+
+    def run(self):
+        while True:
+            try:
+                listen_connection = self.connect()
+                try:
+                    self.listen(listen_connection)
+                finally:
+                    listen_connection.close()
+            except Exception:
+                logger.exception('Error listening for activity; reconnecting '
+                                 'in %s seconds' % RECONNECT_DELAY)
+                time.sleep(RECONNECT_DELAY)
+
+    def listen(self, listen_connection):
+        while True:
+            readable, _, _ = select.select([listen_connection], [], [],
+                                           LISTEN_TIMEOUT)
+            if not readable:
+                continue
+
+            listen_connection.poll()
+            while listen_connection.notifies:
+                notify = listen_connection.notifies.pop(0)
+                self.wake(notify.payload)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_listener():
+    """
+    Get this process's activity listener, or None if listening is not
+    supported.
+    """
+    global _listener
+    if not is_listen_supported():
+        return None
+
+    with _listener_lock:
+        if _listener is None:
+            _listener = ActivityListener()
+        return _listener
+
+
+def wait_for_activity(scope, version, timeout):
+    """
+    Wait until there is new activity in the given cache scope, or the timeout
+    (in seconds) runs out.  The version is that of the scope as of the last
+    time the caller looked at the data.  Return whether there was activity.
+
+    If the scope has no version, or there is no listener and the cache is
+    not shared, activity can't be told apart from none here.  Instead,
+    return True after waiting for ``POLL_INTERVAL`` seconds (or the timeout,
+    if that is sooner), so that the caller checks the database itself.  With
+    a listener, wait until it is woken, or for ``LISTENING_POLL_INTERVAL``
+    seconds at most.
+    """
+    deadline = time.time() + timeout
+    listener = get_listener()
+
+    if not caching.is_versioned(scope) or (listener is None and
+                                           not caching.is_shared()):
+        if timeout <= 0:
+            return False
+        if listener is not None:
+            listener.wait(scope, min(timeout, LISTENING_POLL_INTERVAL))
+        else:
+            time.sleep(min(timeout, POLL_INTERVAL))
+        return True
+
+    while caching.get_version(scope) == version:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+
+        if listener is not None:
+            if listener.wait(scope, min(remaining, LISTENING_POLL_INTERVAL)):
+                return True
+        else:
+            time.sleep(min(remaining, POLL_INTERVAL))
+
+    return True
@@ -1,3 +1,4 @@
+from . import bulk
 from .utils import unpack_data_blob
 from djangorestframework import parsers
 
@@ -41,3 +42,47 @@ class MultiPartParser (FormDataWithDataBlobMixin, parsers.MultiPartParser):
 DEFAULT_DATA_BLOB_PARSERS = list(parsers.DEFAULT_PARSERS)
 DEFAULT_DATA_BLOB_PARSERS[1:3] = [FormParser, MultiPartParser]
 DEFAULT_DATA_BLOB_PARSERS = tuple(DEFAULT_DATA_BLOB_PARSERS)
+
+
+class GeoJSONBulkParser (parsers.BaseParser):
+    """
+    Handle a GeoJSON FeatureCollection, or a JSON list of features or plain
+    objects, for bulk imports.  The data is an iterator over the records in
+    it (see the bulk module).
+    """
+    media_type = 'application/geo+json'
+
+    def parse(self, stream):
+        return (bulk.read_geojson(stream), None)
+
+
+class VndGeoJSONBulkParser (GeoJSONBulkParser):
+    media_type = 'application/vnd.geo+json'
+
+
+class JSONBulkParser (GeoJSONBulkParser):
+    media_type = 'application/json'
+
+
+class NDJSONBulkParser (parsers.BaseParser):
+    """
+    Handle newline-delimited JSON, one record per line, for bulk imports.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream):
+        return (bulk.read_ndjson(stream), None)
+
+
+class CSVBulkParser (parsers.BaseParser):
+    """
+    Handle CSV, one record per row, for bulk imports.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream):
+        return (bulk.read_csv(stream), None)
+
+
+BULK_PARSERS = (JSONBulkParser, GeoJSONBulkParser, VndGeoJSONBulkParser,
+                NDJSONBulkParser, CSVBulkParser)
@@ -1,16 +1,108 @@
 import csv
+import json
 from collections import defaultdict
+from django.core.serializers.json import DateTimeAwareJSONEncoder
 from djangorestframework import renderers
+from djangorestframework.utils.mediatypes import get_media_type_params
 from StringIO import StringIO
+from . import utils
+
+
+class JSONEncoder(DateTimeAwareJSONEncoder):
+    """
+    JSON encoder that also understands pre-serialized JSON fragments (by
+    decoding them).
+    """
+    def default(self, o):
+        if isinstance(o, utils.JSONFragment):
+            return o.data
+        return super(JSONEncoder, self).default(o)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Renderer which serializes to JSON, and which can also serialize a
+    collection one item at a time as it is being sent (see render_stream).
+    """
+
+    # Roughly how many bytes to gather before handing a piece of the stream
+    # to the server.
+    stream_buffer_size = 64 * 1024
+
+    # Items in a stream may be utils.JSONFragments.
+    renders_fragments = True
+
+    def render(self, obj=None, media_type=None):
+        if obj is None:
+            return ''
+
+        indent, sort_keys = self.get_format(media_type)
+        return json.dumps(obj, cls=JSONEncoder, indent=indent, sort_keys=sort_keys)
+
+    def get_format(self, media_type):
+        """
+        Get the indent and whether to sort keys.  If the media type looks like
+        'application/json; indent=4', then pretty print the result.
+        """
+        indent = get_media_type_params(media_type).get('indent', None)
+        sort_keys = False
+        try:
+            indent = max(min(int(indent), 8), 0)
+            sort_keys = True
+        except (ValueError, TypeError):
+            indent = None
+        return indent, sort_keys
+
+    def render_stream(self, items, media_type=None):
+        """
+        Returns an iterator over the pieces of a serialized JSON array
+        containing each of *items*.  Nothing is serialized until the iterator
+        is consumed.
+        """
+        indent, sort_keys = self.get_format(media_type)
+        separator = ',\n' if indent is not None else ','
+        encoder = JSONEncoder(indent=indent, sort_keys=sort_keys)
+
+        buf = ['[']
+        buf_size = 1
+        for index, item in enumerate(items):
+            if index:
+                buf.append(separator)
+
+            # Fragments can be used as they are, unless they need to be
+            # pretty printed.
+            if isinstance(item, utils.JSONFragment) and indent is None:
+                piece = item.json
+            else:
+                piece = encoder.encode(item)
+            buf.append(piece)
+            buf_size += len(piece)
+
+            if buf_size >= self.stream_buffer_size:
+                yield ''.join(buf)
+                buf = []
+                buf_size = 0
+
+        buf.append(']')
+        yield ''.join(buf)
+
 
 class CSVRenderer(renderers.BaseRenderer):
     """
-    Renderer which serializes to JSON
+    Renderer which serializes to CSV, and which can also serialize a
+    collection one row at a time as it is being sent (see render_stream).
     """
 
     media_type = 'text/csv'
     format = 'csv'
 
+    # Roughly how many bytes to gather before handing a piece of the stream
+    # to the server.
+    stream_buffer_size = 64 * 1024
+
+    # Items in a stream may be utils.JSONFragments.
+    renders_fragments = True
+
     def render(self, obj=None, media_type=None):
         """
         Renders *obj* into serialized CSV.
@@ -22,10 +114,64 @@ class CSVRenderer(renderers.BaseRenderer):
         csv_buffer = StringIO()
         csv_writer = csv.writer(csv_buffer)
         for row in table:
-            csv_writer.writerow(row)
+            csv_writer.writerow(self.encode_row(row))
 
         return csv_buffer.getvalue()
 
+    def render_stream(self, items, media_type=None):
+        """
+        Returns an iterator over the pieces of a CSV table of *items*, with
+        the same rows and columns as render() would give.  The items are
+        gone through twice -- once to find the headers, and again to write
+        the rows -- so they should be a collection that can be iterated over
+        more than once, like a utils.StreamingCollection.  Only one item is
+        kept in memory at a time.
+
+        If the collection can make stand-ins for its items that have the same
+        keys (see utils.StreamingCollection.iter_skeletons), the headers come
+        from those instead, and each item is only serialized once.
+        """
+        iter_skeletons = getattr(items, 'iter_skeletons', None)
+        header_items = iter_skeletons() if iter_skeletons else items
+
+        headers = set()
+        has_items = False
+        for item in header_items:
+            headers.update(self.flatten_item(self.get_item_data(item)))
+            has_items = True
+
+        if not has_items:
+            return
+
+        headers = sorted(headers)
+        csv_buffer = StringIO()
+        csv_writer = csv.writer(csv_buffer)
+        csv_writer.writerow(self.encode_row(headers))
+
+        for item in items:
+            flat_item = self.flatten_item(self.get_item_data(item))
+            csv_writer.writerow(self.encode_row(
+                [flat_item.get(key, None) for key in headers]))
+
+            if csv_buffer.tell() >= self.stream_buffer_size:
+                yield csv_buffer.getvalue()
+                csv_buffer.seek(0)
+                csv_buffer.truncate()
+
+        yield csv_buffer.getvalue()
+
+    def get_item_data(self, item):
+        if isinstance(item, utils.JSONFragment):
+            return item.data
+        return item
+
+    def encode_row(self, row):
+        """
+        The csv module can only write byte strings; write text as UTF-8.
+        """
+        return [value.encode('utf-8') if isinstance(value, unicode) else value
+                for value in row]
+
     def tablize(self, data):
         """
         Convert a list of data into a table.
@@ -119,4 +265,7 @@ class CSVRenderer(renderers.BaseRenderer):
         return flat_dict
 
 
+renderers.DEFAULT_RENDERERS = tuple(
+    JSONRenderer if renderer is renderers.JSONRenderer else renderer
+    for renderer in renderers.DEFAULT_RENDERERS)
 renderers.DEFAULT_RENDERERS += (CSVRenderer,)
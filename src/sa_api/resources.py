@@ -1,13 +1,18 @@
 """
 DjangoRestFramework resources for the Shareabouts REST API.
 """
+import inspect
 import json
 import apikey.models
 from collections import defaultdict
-from django.core.urlresolvers import reverse
 from django.db.models import Count
+from django.db.models.query import QuerySet
+from django.utils.encoding import smart_str, smart_unicode, is_protected_type
 from djangorestframework import resources
+from . import caching
 from . import models
+from . import renderers
+from . import urlbuilder
 from . import utils
 from . import forms
 
@@ -65,7 +70,240 @@ class ModelResourceWithDataBlob (resources.ModelResource):
         return super(ModelResourceWithDataBlob, self).validate_request(data, files)
 
 
-class PlaceResource (ModelResourceWithDataBlob):
+def to_plain(value):
+    """
+    Convert a value into plain data that can be rendered, the way
+    djangorestframework's serializer does: strings become unicode, numbers,
+    dates and the like are left alone, and anything else is converted to
+    unicode.
+    """
+    if isinstance(value, basestring):
+        return smart_unicode(value)
+    elif isinstance(value, dict):
+        return dict((smart_str(key), to_plain(val))
+                    for key, val in value.iteritems())
+    elif isinstance(value, (list, tuple, set)):
+        return [to_plain(val) for val in value]
+    elif is_protected_type(value):
+        return value
+    else:
+        return smart_unicode(value, strings_only=True)
+
+
+class PlannedSerializationMixin (object):
+    """
+    Serialize model instances in one pass, following a plan of the fields to
+    output that is worked out once per resource class, instead of
+    introspecting every object (and creating a serializer for every value)
+    the way djangorestframework's serializer does.
+
+    The output is the same, except that when the resource has a request, URLs
+    come out absolute, just as AbsUrlMixin would have made them (so it
+    doesn't have to go over them again).  Only plain field names are
+    supported in ``fields`` and ``include``, not nested resources.
+
+    Instances can also be rendered straight to JSON fragments (see
+    filter_fragments), which are cached per instance.
+    """
+    absolute_urls = True
+
+    # Fields whose values can change without the instance itself being saved.
+    # They are left out of cached fragments, and added back in to each
+    # fragment as it is used.
+    volatile_fields = ()
+
+    @classmethod
+    def get_field_plan(cls):
+        """
+        Get a list of (key, name, is_method) for the fields to serialize,
+        where the value comes from the resource method of the given name if
+        is_method, or else the model attribute of that name.
+        """
+        if '_field_plan' not in cls.__dict__:
+            fields = cls.fields
+            if not fields:
+                opts = cls.model._meta
+                default = [field.name for field in opts.fields + opts.many_to_many]
+                fields = set(default + list(cls.include or ())) - set(cls.exclude or ())
+
+            plan = []
+            for name in fields:
+                method = getattr(cls, name, None)
+                is_method = (inspect.ismethod(method) and
+                             len(inspect.getargspec(method)[0]) == 2)
+                plan.append((smart_str(name), name, is_method))
+            cls._field_plan = plan
+
+        return cls._field_plan
+
+    def serialize(self, obj, request=None):
+        if request is not None:
+            self.request = request
+
+        if isinstance(obj, self.model):
+            return self.serialize_instance(obj)
+        elif isinstance(obj, (list, tuple, QuerySet)):
+            return [self.serialize(item) for item in obj]
+        else:
+            return super(PlannedSerializationMixin, self).serialize(obj, request)
+
+    def serialize_instance(self, obj, with_volatile_fields=True):
+        serialization = self.serialize_fields(obj, with_volatile_fields)
+
+        # Merge in the data blob.  Like AbsUrlMixin, make any URLs in it
+        # absolute too.
+        data = json.loads(obj.data)
+        if self.request is not None and '"url"' in obj.data:
+            data = self.make_urls_absolute(data)
+        serialization.update(data)
+
+        return serialization
+
+    def serialize_fields(self, obj, with_volatile_fields=True):
+        """
+        Serialize the instance's fields, without its data blob.
+        """
+        serialization = {}
+        for key, name, is_method in self.get_field_plan():
+            if not with_volatile_fields and name in self.volatile_fields:
+                continue
+
+            if is_method:
+                value = getattr(self, name)(obj)
+                if self.request is not None:
+                    value = self.make_urls_absolute(value, key)
+            else:
+                try:
+                    value = getattr(obj, name)
+                except AttributeError:
+                    continue
+            serialization[key] = to_plain(value)
+        return serialization
+
+    def iter_skeletons(self, queryset, chunk_size=500):
+        """
+        Iterate over stand-ins for the serializations of the instances in the
+        queryset, for when only their keys are wanted (e.g., for the columns
+        of a CSV table).  Each has the keys that the instance's serialization
+        would have, nested the same way, but not the same values.
+
+        Only the data blobs are read from the database, a chunk at a time.
+        The other fields are taken to have the same keys in every instance, so
+        only the first instance is serialized, without its volatile fields;
+        see get_volatile_skeleton for those.
+        """
+        first = list(queryset[:1])
+        if not first:
+            return
+
+        fields = self.serialize_fields(first[0], with_volatile_fields=False)
+        fields.update(self.get_volatile_skeleton(queryset))
+
+        for chunk in utils.iter_values_chunks(queryset, ['data'], chunk_size):
+            for _, data in chunk:
+                skeleton = dict(fields)
+                skeleton.update(json.loads(data))
+                yield skeleton
+
+    def get_volatile_skeleton(self, queryset):
+        """
+        Get a dict of stand-ins for the volatile fields of the instances in
+        the queryset, with all of the keys that any of their values have.
+        """
+        return {}
+
+    def filter_fragments(self, objs):
+        """
+        Like filter_response for a list of instances, but render each one to
+        a utils.JSONFragment.  The JSON for each instance is cached until the
+        instance is saved again (it is keyed on updated_datetime), with its
+        volatile fields left out.
+        """
+        objs = list(objs)
+        entries = caching.get_fragments([obj.id for obj in objs])
+        new_entries = {}
+
+        fragments = []
+        for obj in objs:
+            updated = obj.updated_datetime
+            context = self.get_fragment_context(obj)
+
+            entry = entries.get(obj.id)
+            if entry is None or entry[0] != updated:
+                entry = (updated, {})
+
+            fragment = entry[1].get(context)
+            if fragment is None:
+                serialization = self.serialize_instance(obj, with_volatile_fields=False)
+                fragment = entry[1][context] = json.dumps(serialization, cls=renderers.JSONEncoder)
+                new_entries[obj.id] = entry
+
+            fragments.append(utils.JSONFragment(self.add_volatile_fields(obj, fragment)))
+
+        if new_entries:
+            caching.set_fragments(new_entries)
+        return fragments
+
+    def get_fragment_context(self, obj):
+        """
+        Get a string that identifies everything other than the instance
+        itself that its JSON depends on: the host that URLs point to, and the
+        names of its dataset and owner.
+        """
+        url_root = self.build_absolute_uri('/') if self.request is not None else ''
+        return '%s %s/%s' % ((url_root,) + self._get_dataset_url_args(obj))
+
+    def add_volatile_fields(self, obj, fragment):
+        pieces = [fragment[:-1]]
+        for name in self.volatile_fields:
+            value = getattr(self, name)(obj)
+            if self.request is not None:
+                value = self.make_urls_absolute(value, name)
+
+            if len(pieces) > 1 or fragment != '{}':
+                pieces.append(', ')
+            pieces.append('%s: %s' % (json.dumps(name),
+                                      json.dumps(to_plain(value), cls=renderers.JSONEncoder)))
+        pieces.append('}')
+        return ''.join(pieces)
+
+    def _get_dataset_url_args(self, obj):
+        # Looking up the same parent dataset for 1000 places would be
+        # pointless and expensive.  The dataset and its owner are normally
+        # already resolved along with the thing (see the queryset's
+        # select_related), so this does not cost a query per thing either.
+        self._reverse_args_cache = getattr(self, '_reverse_args_cache', {})
+        if obj.dataset_id in self._reverse_args_cache:
+            args = self._reverse_args_cache[obj.dataset_id]
+        else:
+            dataset = obj.dataset
+            args = self._reverse_args_cache[obj.dataset_id] = (
+                dataset.owner.username,
+                dataset.slug,
+            )
+        return args
+
+    def make_urls_absolute(self, value, key=None):
+        """
+        Replace the values of all the 'url' keys in the given value with
+        absolute URIs, in place.  The value itself is taken to be a 'url' if
+        the key is.
+        """
+        if isinstance(value, dict):
+            for val_key, val in value.iteritems():
+                value[val_key] = self.make_urls_absolute(val, val_key)
+        elif isinstance(value, list):
+            for index, val in enumerate(value):
+                value[index] = self.make_urls_absolute(val)
+        elif key == 'url' and value is not None:
+            value = self.build_absolute_uri(value)
+        return value
+
+    def build_absolute_uri(self, url):
+        return urlbuilder.build_absolute_uri(self.request, url)
+
+
+class PlaceResource (PlannedSerializationMixin, ModelResourceWithDataBlob):
     model = models.Place
     form = forms.PlaceForm
     queryset = model.objects.all().select_related()
@@ -75,34 +313,77 @@ class PlaceResource (ModelResourceWithDataBlob):
     exclude = ['data', 'submittedthing_ptr']
     include = ['url', 'submissions']
 
-    @utils.cached_property
+    # The submission counts change without the place being saved.
+    volatile_fields = ['submissions']
+
+    @property
     def submission_sets(self):
         """
-        A mapping from Place ids to attributes.  Helps to cut down
-        significantly on the number of queries.
-
-        There should be at most one SubmissionSet of a given type for one place.
+        A mapping from Place ids to summaries of their non-empty
+        SubmissionSets.  Only places passed to load_submission_sets() are
+        included.
         """
-        submission_sets = defaultdict(list)
+        if not hasattr(self, '_submission_sets'):
+            self._submission_sets = {}
+        return self._submission_sets
 
-        qs = models.SubmissionSet.objects.all().select_related()
-        for submission_set in qs.annotate(length=Count('children')):
-            # Ignore empty sets
-            if submission_set.length <= 0:
-                continue
+    def load_submission_sets(self, places):
+        """
+        Summarize the SubmissionSets attached to the given places with one
+        grouped query, limited to those places' ids, and add the summaries to
+        ``self.submission_sets``.  Places that have already been loaded are
+        skipped.
 
-            submission_sets[submission_set.place_id].append({
-                'type': submission_set.submission_type,
-                'length': submission_set.length,
-                'url': reverse('submission_collection_by_dataset', kwargs={
-                    'dataset__owner__username': submission_set.place.dataset.owner.username,
-                    'dataset__slug': submission_set.place.dataset.slug,
-                    'place_id': submission_set.place_id,
-                    'submission_type': submission_set.submission_type
-                })
+        There should be at most one SubmissionSet of a given type for one place.
+        """
+        places = dict((place.id, place) for place in places
+                      if place.id not in self.submission_sets)
+        if not places:
+            return
+
+        for place_id in places:
+            self.submission_sets[place_id] = []
+
+        qs = models.SubmissionSet.objects.filter(place__in=places.keys(),
+                                                 length__gt=0)
+        qs = qs.values('place', 'submission_type', 'length')
+        for submission_set in qs:
+            place = places[submission_set['place']]
+            args = self._get_dataset_url_args(place)
+            args = args + (place.id, submission_set['submission_type'])
+
+            self.submission_sets[place.id].append({
+                'type': submission_set['submission_type'],
+                'length': submission_set['length'],
+                'url': urlbuilder.build_url('submission_collection_by_dataset', args=args)
             })
 
-        return submission_sets
+    def filter_response(self, obj):
+        # Summarize the submission sets for only the places that are about to
+        # be serialized, all at once.
+        if isinstance(obj, models.Place):
+            self.load_submission_sets([obj])
+        elif isinstance(obj, (QuerySet, list, tuple)):
+            self.load_submission_sets(obj)
+
+        return super(PlaceResource, self).filter_response(obj)
+
+    def filter_fragments(self, objs):
+        objs = list(objs)
+        self.load_submission_sets(objs)
+        return super(PlaceResource, self).filter_fragments(objs)
+
+    def get_volatile_skeleton(self, queryset):
+        # Enough submission set summaries (like load_submission_sets makes)
+        # for the place with the most non-empty sets.
+        most = list(models.SubmissionSet.objects
+                    .filter(place__in=queryset.order_by().values('pk'),
+                            length__gt=0)
+                    .values('place')
+                    .annotate(count=Count('id'))
+                    .order_by('-count')[:1])
+        summary = {'type': None, 'length': None, 'url': None}
+        return {'submissions': [summary] * (most[0]['count'] if most else 0)}
 
     # TODO: Included vote counts, without an additional query if possible.
     def location(self, place):
@@ -112,32 +393,18 @@ class PlaceResource (ModelResourceWithDataBlob):
         }
 
     def dataset(self, place):
-        url = reverse('dataset_instance_by_user',
-                      kwargs={
-                         'owner__username': place.dataset.owner.username,
-                         'slug': place.dataset.slug})
+        args = self._get_dataset_url_args(place)
+        url = urlbuilder.build_url('dataset_instance_by_user', args=args)
         return {'url': url}
 
-    def _get_dataset_url_args(self, dataset_id):
-        # Looking up the same parent dataset for 1000 places would be
-        # pointless and expensive.
-        self._reverse_args_cache = getattr(self, '_reverse_args_cache', {})
-        if dataset_id in self._reverse_args_cache:
-            args = self._reverse_args_cache[dataset_id]
-        else:
-            dataset = models.DataSet.objects.get(id=dataset_id)
-            args = self._reverse_args_cache[dataset_id] = (
-                dataset.owner.username,
-                dataset.slug,
-            )
-        return args
-
     def url(self, place):
-        args = self._get_dataset_url_args(place.dataset_id)
+        args = self._get_dataset_url_args(place)
         args = args + (place.id,)
-        return reverse('place_instance_by_dataset', args=args)
+        return urlbuilder.build_url('place_instance_by_dataset', args=args)
 
     def submissions(self, place):
+        if place.id not in self.submission_sets:
+            self.load_submission_sets([place])
         return self.submission_sets[place.id]
 
     def validate_request(self, origdata, files=None):
@@ -178,15 +445,12 @@ class DataSetResource (resources.ModelResource):
         """
         submission_sets = defaultdict(set)
 
-        qs = models.SubmissionSet.objects.all().select_related()
-        for submission_set in qs.annotate(length=Count('children')):
-            # Ignore empty sets
-            if submission_set.length <= 0:
-                continue
-
+        # Ignore empty sets
+        qs = models.SubmissionSet.objects.filter(length__gt=0).select_related()
+        for submission_set in qs:
             submission_sets[submission_set.place.dataset_id].add((
                 ('type', submission_set.submission_type),
-                ('url', reverse('all_submissions_by_dataset', kwargs={
+                ('url', urlbuilder.build_url('all_submissions_by_dataset', kwargs={
                     'dataset__owner__username': submission_set.place.dataset.owner.username,
                     'dataset__slug': submission_set.place.dataset.slug,
                     'submission_type': submission_set.submission_type
@@ -202,29 +466,29 @@ class DataSetResource (resources.ModelResource):
         return simple_user(dataset.owner)
 
     def places(self, dataset):
-        url = reverse('place_collection_by_dataset',
-                      kwargs={
-                         'dataset__owner__username': dataset.owner.username,
-                         'dataset__slug': dataset.slug})
+        url = urlbuilder.build_url('place_collection_by_dataset',
+                                   kwargs={
+                                      'dataset__owner__username': dataset.owner.username,
+                                      'dataset__slug': dataset.slug})
         return {'url': url, 'length': self.places_counts.get(dataset.id, 0)}
 
     def submissions(self, dataset):
         return self.submission_sets[dataset.id]
 
     def url(self, instance):
-        return reverse('dataset_instance_by_user',
-                       kwargs={'owner__username': instance.owner.username,
-                               'slug': instance.slug})
+        return urlbuilder.build_url('dataset_instance_by_user',
+                                    kwargs={'owner__username': instance.owner.username,
+                                            'slug': instance.slug})
 
     def keys(self, instance):
-        url = reverse('api_key_collection_by_dataset',
-                      kwargs={'datasets__owner__username': instance.owner.username,
-                              'datasets__slug': instance.slug,
-                              })
+        url = urlbuilder.build_url('api_key_collection_by_dataset',
+                                   kwargs={'datasets__owner__username': instance.owner.username,
+                                           'datasets__slug': instance.slug,
+                                           })
         return {'url': url}
 
 
-class SubmissionResource (ModelResourceWithDataBlob):
+class SubmissionResource (PlannedSerializationMixin, ModelResourceWithDataBlob):
     model = models.Submission
     form = forms.SubmissionForm
     # TODO: show dataset, but not detailed owner info
@@ -236,18 +500,18 @@ class SubmissionResource (ModelResourceWithDataBlob):
         return submission.parent.submission_type
 
     def place(self, submission):
-        url = reverse('place_instance_by_dataset',
-                      kwargs={
-                         'dataset__owner__username': submission.dataset.owner.username,
-                         'dataset__slug': submission.dataset.slug,
-                         'pk': submission.parent.place_id})
+        url = urlbuilder.build_url('place_instance_by_dataset',
+                                   kwargs={
+                                      'dataset__owner__username': submission.dataset.owner.username,
+                                      'dataset__slug': submission.dataset.slug,
+                                      'pk': submission.parent.place_id})
         return {'url': url}
 
     def dataset(self, submission):
-        url = reverse('dataset_instance_by_user',
-                      kwargs={
-                         'owner__username': submission.dataset.owner.username,
-                         'slug': submission.dataset.slug})
+        url = urlbuilder.build_url('dataset_instance_by_user',
+                                   kwargs={
+                                      'owner__username': submission.dataset.owner.username,
+                                      'slug': submission.dataset.slug})
         return {'url': url}
 
 
@@ -259,43 +523,15 @@ class GeneralSubmittedThingResource (ModelResourceWithDataBlob):
 class ActivityResource (resources.ModelResource):
     model = models.Activity
     fields = ['action', 'type', 'id', 'place_id', ('data', GeneralSubmittedThingResource)]
-
-    @property
-    def queryset(self):
-        return models.Activity.objects.filter(data_id__in=self.things)
-
-    @utils.cached_property
-    def things(self):
-        """
-        A mapping from SubmittedThing ids to attributes.  Helps to cut down
-        significantly on the number of queries.
-
-        """
-        things = {}
-
-        for place in self.view.get_places():
-            things[place.submittedthing_ptr_id] = {
-                'type': 'places',
-                'place_id': place.id,
-                'data': place
-            }
-        for submission in self.view.get_submissions():
-            things[submission.submittedthing_ptr_id] = {
-                'type': submission.parent.submission_type,
-                'place_id': submission.parent.place_id,
-                'data': submission
-            }
-
-        return things
+    queryset = model.objects.all().select_related('data')
 
     def type(self, obj):
-        return self.things[obj.data_id]['type']
-
-    def place_id(self, obj):
-        return self.things[obj.data_id]['place_id']
+        return obj.submission_type or 'places'
 
     def data(self, obj):
-        return self.things[obj.data_id]['data']
+        # The thing's common fields and data blob are all that get shown, and
+        # they come along with the activity.
+        return obj.data
 
 
 class ApiKeyResource(resources.ModelResource):
@@ -0,0 +1,83 @@
+"""
+Spatial summaries of places, computed in the database.
+"""
+from django.db import connection
+from . import models
+
+
+def grid_cell_size(zoom):
+    """
+    The width, in degrees, of the grid cells used to cluster places on a
+    web map at the given zoom level.  A 256 pixel map tile spans 360 / 2^zoom
+    degrees of longitude; cells are a quarter of that, or 64 pixels across.
+    """
+    return 360.0 / 2 ** zoom / 4
+
+
+def cluster_places(queryset, cell_size, with_submissions=False):
+    """
+    Group the places in the queryset into a grid of square cells, cell_size
+    degrees wide.  Returns a list of clusters, largest first, each like:
+
+        {'count': <number of places>,
+         'location': {'lat': <mean latitude>, 'lng': <mean longitude>}}
+
+    If with_submissions is True, each cluster also gets a 'submissions' list
+    of {'type': <submission type>, 'length': <total submissions>} summaries,
+    like the one on each place.
+    """
+    qn = connection.ops.quote_name
+    place_table = qn(models.Place._meta.db_table)
+    set_table = qn(models.SubmissionSet._meta.db_table)
+    place_pk = qn(models.Place._meta.pk.column)
+    location = qn(models.Place._meta.get_field('location').column)
+
+    # Only the ids of the matching places are needed from the queryset; the
+    # grouping happens around them.
+    ids_sql, ids_params = (queryset.order_by().values('pk')
+                           .query.get_compiler(using=queryset.db).as_sql())
+
+    sql_parts = {
+        'place': place_table, 'sets': set_table, 'pk': place_pk,
+        'ids': ids_sql,
+        'cell': ('FLOOR(ST_X(p.{location}) / %s), '
+                 'FLOOR(ST_Y(p.{location}) / %s)').format(location=location),
+        'x': 'ST_X(p.{location})'.format(location=location),
+        'y': 'ST_Y(p.{location})'.format(location=location),
+    }
+    params = [cell_size, cell_size] + list(ids_params)
+
+    cursor = connection.cursor()
+    cursor.execute(
+        'SELECT {cell}, COUNT(*), AVG({x}), AVG({y}) '
+        'FROM {place} AS p '
+        'WHERE p.{pk} IN ({ids}) '
+        'GROUP BY 1, 2'.format(**sql_parts),
+        params)
+
+    clusters = {}
+    for cell_x, cell_y, count, lng, lat in cursor.fetchall():
+        clusters[(cell_x, cell_y)] = {
+            'count': count,
+            'location': {'lat': lat, 'lng': lng},
+        }
+
+    if with_submissions:
+        for cluster in clusters.itervalues():
+            cluster['submissions'] = []
+
+        cursor.execute(
+            'SELECT {cell}, ss.submission_type, SUM(ss.length) '
+            'FROM {place} AS p JOIN {sets} AS ss ON ss.place_id = p.{pk} '
+            'WHERE p.{pk} IN ({ids}) AND ss.length > 0 '
+            'GROUP BY 1, 2, 3 '
+            'ORDER BY 3'.format(**sql_parts),
+            params)
+
+        for cell_x, cell_y, submission_type, length in cursor.fetchall():
+            clusters[(cell_x, cell_y)]['submissions'].append({
+                'type': submission_type,
+                'length': int(length),
+            })
+
+    return sorted(clusters.values(), key=lambda cluster: -cluster['count'])
@@ -0,0 +1,84 @@
+"""
+Queueing submissions to be saved later, a batch at a time, for bursts of
+them (e.g., live voting at a meeting) that would otherwise each be saved,
+along with their activity and cache invalidation, in a request of their own.
+
+Submission types are queued when they are listed in the
+SA_API_QUEUED_SUBMISSION_TYPES setting (e.g., ``['votes']``); by default,
+none are.  A submission of a queued type that is posted to a place is
+checked as usual, then added to the QueuedSubmission table, and the client
+gets a 202 Accepted with the queued submission's id.  The queue is kept in
+the database, so nothing is lost if the server restarts, and no message
+broker is needed.
+
+The process_submission_queue management command takes the oldest queued
+submissions, saves them with bulk.insert_submissions, and removes them from
+the queue, all in one transaction, and invalidates each dataset's caches
+once per batch.  Until then, the submissions don't show up anywhere.
+"""
+from collections import defaultdict
+from django.conf import settings
+from . import bulk
+from . import models
+from . import transactions
+
+
+def is_queued(submission_type):
+    """
+    Whether submissions of the given type are queued.
+    """
+    return submission_type in getattr(settings, 'SA_API_QUEUED_SUBMISSION_TYPES', ())
+
+
+def enqueue(place, submission_type, submitter_name, data):
+    """
+    Queue a submission (with its data blob as a JSON string) to be saved on
+    a place.  Returns the QueuedSubmission.
+    """
+    return models.QueuedSubmission.objects.create(
+        place=place, submission_type=submission_type,
+        submitter_name=submitter_name, data=data)
+
+
+def process_batch(batch_size=bulk.BATCH_SIZE):
+    """
+    Save up to batch_size of the oldest queued submissions, and remove them
+    from the queue.  Returns the number saved.
+
+    The queued submissions are locked while they are saved, so if another
+    process is working on the queue at the same time, it waits its turn,
+    rather than saving them twice.
+    """
+    with transactions.write_transaction():
+        queued = list(models.QueuedSubmission.objects
+                      .select_for_update()
+                      .order_by('id')[:batch_size])
+        if not queued:
+            return 0
+
+        place_datasets = dict(models.Place.objects
+                              .filter(id__in=set(q.place_id for q in queued))
+                              .values_list('id', 'dataset_id'))
+        datasets = (models.DataSet.objects.select_related('owner')
+                    .in_bulk(set(place_datasets.values())))
+
+        # Submissions to places in different datasets are saved separately,
+        # as each dataset gets its own activity and invalidation.
+        submissions = defaultdict(list)
+        for q in queued:
+            submissions[place_datasets[q.place_id]].append({
+                'record': q.id,
+                'place_id': q.place_id,
+                'submission_type': q.submission_type,
+                'submitter_name': q.submitter_name,
+                'data': q.data,
+                'created_datetime': q.created_datetime,
+            })
+
+        for dataset_id, dataset_submissions in submissions.iteritems():
+            dataset = datasets[dataset_id]
+            bulk.insert_submissions(dataset, dataset_submissions)
+            dataset.invalidate_caches()
+
+        models.QueuedSubmission.objects.filter(id__in=[q.id for q in queued]).delete()
+        return len(queued)
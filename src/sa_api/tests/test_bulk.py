@@ -0,0 +1,244 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from nose.tools import istest
+from nose.tools import assert_equal, assert_raises
+from StringIO import StringIO
+from .. import bulk
+from ..models import DataSet, Place, SubmissionSet, Activity
+import json
+
+
+class TestReaders (object):
+
+    @istest
+    def reads_a_feature_collection(self):
+        stream = StringIO(json.dumps({
+            'type': 'FeatureCollection',
+            'features': [{'type': 'Feature',
+                          'geometry': {'type': 'Point', 'coordinates': [1, 2]},
+                          'properties': {'name': 'One'}}]}))
+        assert_equal(list(bulk.read_geojson(stream)),
+                     [{'name': 'One',
+                       'location': {'type': 'Point', 'coordinates': [1, 2]}}])
+
+    @istest
+    def reads_a_list_of_places(self):
+        places = [{'location': {'lat': 2, 'lng': 1}, 'name': 'One'}]
+        stream = StringIO(json.dumps(places))
+        assert_equal(list(bulk.read_geojson(stream)), places)
+
+    @istest
+    def reads_newline_delimited_json(self):
+        stream = StringIO('{"location": "POINT (1 2)"}\n'
+                          '\n'
+                          '{"type": "Feature", "geometry": null, "properties": {"a": 1}}\n')
+        assert_equal(list(bulk.read_ndjson(stream)),
+                     [{'location': 'POINT (1 2)'},
+                      {'a': 1, 'location': None}])
+
+        assert_raises(ValueError, list, bulk.read_ndjson(StringIO('{"a": \n')))
+
+    @istest
+    def reads_csv_like_the_export(self):
+        stream = StringIO('id,location.lat,location.lng,name,note\r\n'
+                          '5,2,1,Caf\xc3\xa9,\r\n')
+        assert_equal(list(bulk.read_csv(stream)),
+                     [{'id': '5', 'location': {'lat': '2', 'lng': '1'},
+                       'name': u'Caf\xe9'}])
+
+    @istest
+    def nests_dotted_csv_columns(self):
+        stream = StringIO('lat,lng,tags.0,tags.1,address.city,a,a.b\r\n'
+                          '2,1,red,blue,Philadelphia,x,y\r\n')
+        assert_equal(list(bulk.read_csv(stream)),
+                     [{'location': {'lat': '2', 'lng': '1'},
+                       'tags': ['red', 'blue'],
+                       'address': {'city': 'Philadelphia'},
+                       'a': 'x', 'a.b': 'y'}])
+
+
+class TestCleanPlace (object):
+
+    @istest
+    def reads_each_kind_of_location(self):
+        for location in [{'lat': 39.95, 'lng': -75.16},
+                         {'lat': '39.95', 'lng': '-75.16'},
+                         {'type': 'Point', 'coordinates': [-75.16, 39.95]},
+                         'POINT (-75.16 39.95)']:
+            place = bulk.clean_place({'location': location})
+            assert_equal(place['location'], 'POINT (-75.16 39.95)')
+
+    @istest
+    def puts_other_attributes_in_the_data_blob(self):
+        place = bulk.clean_place({'location': 'POINT (1 2)', 'visible': 'false',
+                                  'submitter_name': 'Alice', 'name': 'One',
+                                  'id': 5, 'url': 'http://example.com/',
+                                  'submissions.0.length': '2'})
+        assert_equal(place['visible'], False)
+        assert_equal(place['submitter_name'], 'Alice')
+        assert_equal(json.loads(place['data']), {'name': 'One'})
+
+    @istest
+    def imports_nested_data_as_it_was_exported(self):
+        from ..renderers import CSVRenderer
+        data = {'name': 'One', 'tags': ['red', 'blue'],
+                'address': {'street': '1 Main St', 'city': 'Philadelphia'}}
+        exported = dict(data, id=5, url='http://example.com/places/5/',
+                        location={'lat': 39.95, 'lng': -75.16},
+                        submissions=[{'type': 'comments', 'length': 2,
+                                      'url': 'http://example.com/places/5/comments/'}])
+        csv = ''.join(CSVRenderer(None).render_stream([exported]))
+
+        [record] = bulk.read_csv(StringIO(csv))
+        place = bulk.clean_place(record)
+        assert_equal(place['location'], 'POINT (-75.16 39.95)')
+        assert_equal(json.loads(place['data']), data)
+
+    @istest
+    def rejects_invalid_places(self):
+        for record in [[], {}, {'location': 'LINESTRING (0 0, 1 1)'},
+                       {'location': {'lat': 100, 'lng': 0}},
+                       {'location': {'lat': 'north', 'lng': 0}},
+                       {'location': 'POINT (1 2)', 'visible': 'maybe'},
+                       {'location': 'POINT (1 2)', 'submitter_name': 'x' * 257}]:
+            assert_raises(ValueError, bulk.clean_place, record)
+
+    @istest
+    def reports_every_error_in_a_batch(self):
+        records = [{'location': 'POINT (1 2)'}, {}, {'location': 'POINT (1 2)'},
+                   {'location': None}]
+        batches = bulk.iter_batches(records, bulk.clean_place, batch_size=10)
+        try:
+            list(batches)
+        except bulk.InvalidRecords, e:
+            assert_equal([error['record'] for error in e.errors], [2, 4])
+        else:
+            assert False, 'InvalidRecords was not raised'
+
+
+class TestCleanSubmission (object):
+
+    @istest
+    def puts_other_attributes_in_the_data_blob(self):
+        submission = bulk.clean_submission(
+            {'place_id': '12', 'submitter_name': 'Alice', 'comment': 'Hi',
+             'place.url': 'http://example.com/', 'id': 5}, 'comments')
+        assert_equal(submission['place_id'], 12)
+        assert_equal(submission['submission_type'], 'comments')
+        assert_equal(submission['submitter_name'], 'Alice')
+        assert_equal(json.loads(submission['data']), {'comment': 'Hi'})
+
+    @istest
+    def reads_the_type_when_posted_to_submissions(self):
+        submission = bulk.clean_submission({'place_id': 12, 'type': 'votes'},
+                                           'submissions')
+        assert_equal(submission['submission_type'], 'votes')
+
+    @istest
+    def rejects_invalid_submissions(self):
+        for record, submission_type in [([], 'comments'),
+                                        ({}, 'comments'),
+                                        ({'place_id': 'twelve'}, 'comments'),
+                                        ({'place_id': 12}, 'submissions'),
+                                        ({'place_id': 12}, 'x' * 129)]:
+            assert_raises(ValueError, bulk.clean_submission, record, submission_type)
+
+
+class TestInsertPlaces (TestCase):
+
+    @istest
+    def creates_places_and_their_activity(self):
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(owner=owner, slug='data')
+        places = [bulk.clean_place({'location': 'POINT (1 2)', 'name': 'One'}),
+                  bulk.clean_place({'location': 'POINT (3 4)', 'visible': False})]
+
+        ids = bulk.insert_places(dataset, places)
+
+        assert_equal(len(ids), 2)
+        one, two = [Place.objects.get(id=place_id) for place_id in ids]
+        assert_equal((one.location.x, one.location.y), (1, 2))
+        assert_equal(json.loads(one.data), {'name': 'One'})
+        assert_equal(one.dataset, dataset)
+        assert_equal(two.visible, False)
+
+        activity = Activity.objects.filter(data__in=ids).order_by('data')
+        assert_equal([(a.data_id, a.place_id, a.dataset_id, a.visible, a.action)
+                      for a in activity],
+                     [(ids[0], ids[0], dataset.id, True, 'create'),
+                      (ids[1], ids[1], dataset.id, False, 'create')])
+
+
+class TestInsertSubmissions (TestCase):
+
+    def setUp(self):
+        owner = User.objects.create(username='user')
+        self.dataset = DataSet.objects.create(owner=owner, slug='data')
+        self.place = Place.objects.create(dataset=self.dataset,
+                                          location='POINT (1 2)', visible=False)
+        self.votes = SubmissionSet.objects.create(place=self.place,
+                                                  submission_type='votes')
+
+    def clean(self, records):
+        clean = lambda record: bulk.clean_submission(record, 'submissions')
+        return list(bulk.iter_batches(records, clean))[0]
+
+    @istest
+    def creates_submissions_sets_and_activity(self):
+        submissions = self.clean([{'place_id': self.place.id, 'type': 'votes'},
+                                  {'place_id': self.place.id, 'type': 'votes'},
+                                  {'place_id': self.place.id, 'type': 'comments'}])
+
+        ids = bulk.insert_submissions(self.dataset, submissions)
+
+        assert_equal(len(ids), 3)
+        assert_equal(sorted(self.place.submission_sets.values_list(
+                         'submission_type', 'length')),
+                     [('comments', 1), ('votes', 2)])
+        assert_equal(SubmissionSet.objects.get(id=self.votes.id).children.count(), 2)
+
+        activity = Activity.objects.filter(data__in=ids).order_by('data')
+        assert_equal([(a.place_id, a.submission_type, a.visible) for a in activity],
+                     [(self.place.id, 'votes', False),
+                      (self.place.id, 'votes', False),
+                      (self.place.id, 'comments', False)])
+
+    @istest
+    def uses_sets_created_since_they_were_looked_up(self):
+        from mock import patch
+        # As if another request created the comments set just after this one
+        # found that it didn't exist.
+        comments = SubmissionSet.objects.create(place=self.place,
+                                                submission_type='comments')
+        find_submission_sets = bulk.find_submission_sets
+        lookups = []
+
+        def find_late(keys):
+            lookups.append(keys)
+            sets = find_submission_sets(keys)
+            if len(lookups) == 1:
+                del sets[(self.place.id, 'comments')]
+            return sets
+
+        submissions = self.clean([{'place_id': self.place.id, 'type': 'votes'},
+                                  {'place_id': self.place.id, 'type': 'comments'}])
+        with patch.object(bulk, 'find_submission_sets', find_late):
+            sets = bulk.get_submission_sets(submissions)
+
+        assert_equal(sets, {(self.place.id, 'votes'): self.votes.id,
+                            (self.place.id, 'comments'): comments.id})
+        assert_equal(self.place.submission_sets.count(), 2)
+
+    @istest
+    def rejects_places_outside_the_dataset(self):
+        other = DataSet.objects.create(owner=self.dataset.owner, slug='other')
+        place = Place.objects.create(dataset=other, location='POINT (1 2)')
+        submissions = self.clean([{'place_id': self.place.id, 'type': 'votes'},
+                                  {'place_id': place.id, 'type': 'votes'}])
+
+        try:
+            bulk.insert_submissions(self.dataset, submissions)
+        except bulk.InvalidRecords, e:
+            assert_equal([error['record'] for error in e.errors], [2])
+        else:
+            assert False, 'InvalidRecords was not raised'
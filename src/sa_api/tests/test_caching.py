@@ -0,0 +1,233 @@
+from django.test import TestCase
+from django.core.cache import cache
+from mock import patch
+from nose.tools import istest
+from nose.tools import assert_equal, assert_not_equal
+from .. import caching
+
+
+class TestVersions (TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    @istest
+    def version_is_stable_until_bumped(self):
+        scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(scope)
+        assert_equal(caching.get_version(scope), version)
+
+        caching.bump_version(scope)
+        assert_not_equal(caching.get_version(scope), version)
+
+    @istest
+    def version_keeps_increasing_after_it_is_lost(self):
+        scope = caching.dataset_scope('user', 'dataset')
+        version = caching.bump_version(scope)
+        cache.clear()
+        assert (caching.bump_version(scope) > version)
+
+    @istest
+    def bump_dataset_leaves_other_scopes_alone(self):
+        dataset_scope = caching.dataset_scope('user', 'dataset')
+        other_scopes = [caching.dataset_scope('user', 'other'),
+                        caching.dataset_scope('someone', 'dataset'),
+                        caching.owner_scope('user'),
+                        caching.GLOBAL_SCOPE]
+
+        dataset_version = caching.get_version(dataset_scope)
+        other_versions = [caching.get_version(scope) for scope in other_scopes]
+
+        caching.bump_dataset('user', 'dataset')
+
+        assert_not_equal(caching.get_version(dataset_scope), dataset_version)
+        for scope, version in zip(other_scopes, other_versions):
+            assert_equal(caching.get_version(scope), version)
+
+    @istest
+    def bump_owner_leaves_the_datasets_alone(self):
+        scope = caching.owner_scope('user')
+        dataset_scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(scope)
+        dataset_version = caching.get_version(dataset_scope)
+
+        caching.bump_owner('user')
+
+        assert_not_equal(caching.get_version(scope), version)
+        assert_equal(caching.get_version(dataset_scope), dataset_version)
+
+    @istest
+    def only_the_global_scope_is_not_versioned(self):
+        assert not caching.is_versioned(caching.GLOBAL_SCOPE)
+        assert caching.is_versioned(caching.owner_scope('user'))
+        assert caching.is_versioned(caching.dataset_scope('user', 'dataset'))
+
+
+class TestIsShared (TestCase):
+
+    @istest
+    def local_memory_cache_is_shared_only_with_a_single_process(self):
+        from django.conf import settings
+        from django.core.cache.backends.locmem import LocMemCache
+        local_cache = LocMemCache('test', {})
+
+        with patch.object(caching, 'cache', local_cache):
+            with patch.object(settings, 'SA_API_SINGLE_PROCESS', False, create=True):
+                assert_equal(caching.is_shared(), False)
+            with patch.object(settings, 'SA_API_SINGLE_PROCESS', True, create=True):
+                assert_equal(caching.is_shared(), True)
+
+    @istest
+    def other_caches_are_shared(self):
+        from django.conf import settings
+        from django.core.cache.backends.dummy import DummyCache
+
+        with patch.object(caching, 'cache', DummyCache('test', {})):
+            with patch.object(settings, 'SA_API_SINGLE_PROCESS', False, create=True):
+                assert_equal(caching.is_shared(), True)
+
+
+class TestFragments (TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    @istest
+    def fragments_are_not_cached_unless_the_cache_is_shared(self):
+        with patch.object(caching, 'is_shared', return_value=False):
+            caching.set_fragments({1: 'fragment'})
+            assert_equal(caching.get_fragments([1]), {})
+
+        caching.set_fragments({1: 'fragment'})
+        with patch.object(caching, 'is_shared', return_value=False):
+            assert_equal(caching.get_fragments([1]), {})
+        assert_equal(caching.get_fragments([1]), {1: 'fragment'})
+
+
+class TestInvalidation (TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from ..models import DataSet
+        cache.clear()
+        owner = User.objects.create(username='user')
+        self.dataset = DataSet.objects.create(owner=owner, slug='dataset')
+
+    def tearDown(self):
+        from django.contrib.auth.models import User
+        from ..models import DataSet, Place
+        Place.objects.all().delete()
+        DataSet.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    @istest
+    def saving_and_deleting_a_place_bumps_its_dataset(self):
+        from ..models import Place
+        scope = caching.dataset_scope('user', 'dataset')
+
+        version = caching.get_version(scope)
+        place = Place.objects.create(location='POINT (0.0 0.0)',
+                                     dataset=self.dataset)
+        assert_not_equal(caching.get_version(scope), version)
+
+        version = caching.get_version(scope)
+        place.delete()
+        assert_not_equal(caching.get_version(scope), version)
+
+    @istest
+    def renaming_a_dataset_bumps_the_old_name(self):
+        old_scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(old_scope)
+
+        self.dataset.slug = 'renamed'
+        self.dataset.save()
+        assert_not_equal(caching.get_version(old_scope), version)
+
+
+class TestDeferredInvalidation (TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    @istest
+    def invalidates_when_the_outermost_block_exits(self):
+        scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(scope)
+        caching.set_fragments({1: 'fragment'})
+
+        with caching.deferred_invalidation():
+            with caching.deferred_invalidation():
+                caching.bump_dataset('user', 'dataset')
+                caching.forget_fragments(1)
+            assert_equal(caching.get_version(scope), version)
+            assert_equal(caching.get_fragments([1]), {1: 'fragment'})
+
+        assert_not_equal(caching.get_version(scope), version)
+        assert_equal(caching.get_fragments([1]), {})
+
+    @istest
+    def bumps_each_scope_once(self):
+        scopes = [caching.dataset_scope('user', 'dataset'),
+                  caching.dataset_scope('user', 'other'),
+                  caching.owner_scope('user')]
+        for scope in scopes:
+            caching.get_version(scope)
+
+        with patch.object(caching.cache, 'incr', wraps=caching.cache.incr) as incr:
+            with caching.deferred_invalidation():
+                caching.bump_dataset('user', 'dataset')
+                caching.bump_dataset('user', 'dataset')
+                caching.bump_dataset('user', 'other')
+                caching.bump_owner('user')
+                caching.bump_owner('user')
+            assert_equal(incr.call_count, len(scopes))
+
+    @istest
+    def can_hold_back_invalidation_until_a_managed_transaction_commits(self):
+        from .. import transactions
+        scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(scope)
+
+        with caching.deferred_invalidation():
+            with patch.object(transactions.transaction, 'is_managed', return_value=True):
+                with transactions.write_transaction():
+                    caching.bump_dataset('user', 'dataset')
+            # This is where the transaction's manager would commit it.
+            assert_equal(caching.get_version(scope), version)
+
+        assert_not_equal(caching.get_version(scope), version)
+
+
+class TestCacheScopeMixin (object):
+
+    def get_scope(self, allowed_user_kwarg, **kwargs):
+        from ..views import CacheScopeMixin
+        view = CacheScopeMixin()
+        view.allowed_user_kwarg = allowed_user_kwarg
+        return view.get_cache_scope(**kwargs)
+
+    @istest
+    def scope_comes_from_url_kwargs(self):
+        assert_equal(self.get_scope('dataset__owner__username',
+                                    dataset__owner__username='user',
+                                    dataset__slug='dataset'),
+                     caching.dataset_scope('user', 'dataset'))
+        assert_equal(self.get_scope('data__dataset__owner__username',
+                                    data__dataset__owner__username='user',
+                                    data__dataset__slug='dataset'),
+                     caching.dataset_scope('user', 'dataset'))
+        assert_equal(self.get_scope('owner__username',
+                                    owner__username='user'),
+                     caching.owner_scope('user'))
+        assert_equal(self.get_scope('data__dataset__owner__username'),
+                     caching.GLOBAL_SCOPE)
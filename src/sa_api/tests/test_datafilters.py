@@ -0,0 +1,47 @@
+from django.http import QueryDict
+from nose.tools import istest
+from nose.tools import assert_equal, assert_raises
+from .. import datafilters
+import json
+
+
+class TestParseDataFilters (object):
+
+    @istest
+    def ignores_other_parameters(self):
+        params = QueryDict('bbox=1,2,3,4&format=json&datasets=1')
+        assert_equal(datafilters.parse_data_filters(params), [])
+
+    @istest
+    def reads_attribute_paths_operators_and_values(self):
+        params = QueryDict('data.category=bike_lane'
+                           '&data.status__in=proposed,approved&data.status__in=built'
+                           '&data.address.city=Philadelphia')
+        assert_equal(datafilters.parse_data_filters(params), [
+            (['address', 'city'], 'exact', ['Philadelphia']),
+            (['category'], 'exact', ['bike_lane']),
+            (['status'], 'in', ['proposed', 'approved', 'built']),
+        ])
+
+    @istest
+    def rejects_malformed_filters(self):
+        for query in ['data.=1', 'data.a..b=1', 'data.name__contains=x']:
+            assert_raises(ValueError, datafilters.parse_data_filters,
+                          QueryDict(query))
+
+
+class TestDataFilterDocuments (object):
+
+    @istest
+    def matches_strings_and_the_values_they_parse_as(self):
+        assert_equal(datafilters.get_candidates('bike_lane'), ['bike_lane'])
+        assert_equal(datafilters.get_candidates('5'), ['5', 5])
+        assert_equal(datafilters.get_candidates('true'), ['true', True])
+        assert_equal(datafilters.get_candidates('null'), ['null', None])
+        assert_equal(datafilters.get_candidates('[1]'), ['[1]'])
+        assert_equal(datafilters.get_candidates('NaN'), ['NaN'])
+
+    @istest
+    def nests_the_value_under_the_attribute_path(self):
+        document = datafilters.make_document(['address', 'city'], 'Philadelphia')
+        assert_equal(json.loads(document), {'address': {'city': 'Philadelphia'}})
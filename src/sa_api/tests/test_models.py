@@ -0,0 +1,208 @@
+from django.test import TestCase
+from django.core.management import call_command
+from nose.tools import istest
+from nose.tools import assert_equal, assert_raises
+from StringIO import StringIO
+
+
+class SubmissionSetTestMixin (object):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        models.Submission.objects.all().delete()
+        models.SubmissionSet.objects.all().delete()
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+
+    def setUp(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        self._cleanup()
+
+        owner = User.objects.create(username='user')
+        self.dataset = models.DataSet.objects.create(owner=owner,
+                                                     slug='dataset')
+        place = models.Place.objects.create(location='POINT (1.0 2.0)',
+                                            dataset=self.dataset)
+        self.submission_set = models.SubmissionSet.objects.create(
+            place=place, submission_type='comments')
+
+    def tearDown(self):
+        self._cleanup()
+
+    def add_submissions(self, count):
+        from sa_api import models
+        return [models.Submission.objects.create(parent=self.submission_set,
+                                                 dataset=self.dataset)
+                for _ in range(count)]
+
+    def get_length(self):
+        from sa_api import models
+        return models.SubmissionSet.objects.get(id=self.submission_set.id).length
+
+
+class TestSubmissionSetLength (SubmissionSetTestMixin, TestCase):
+
+    @istest
+    def counts_new_submissions(self):
+        submissions = self.add_submissions(3)
+        assert_equal(self.get_length(), 3)
+
+        # Updating an existing submission should not change the count
+        submissions[0].submitter_name = 'Mjumbe'
+        submissions[0].save()
+        assert_equal(self.get_length(), 3)
+
+    @istest
+    def counts_deleted_submissions(self):
+        submissions = self.add_submissions(3)
+        submissions[0].delete()
+        assert_equal(self.get_length(), 2)
+
+    @istest
+    def does_not_go_below_zero(self):
+        from sa_api import models
+        submissions = self.add_submissions(1)
+        models.SubmissionSet.objects.update(length=0)
+
+        submissions[0].delete()
+        assert_equal(self.get_length(), 0)
+
+    @istest
+    def counts_submissions_deleted_through_a_queryset(self):
+        from sa_api import models
+        submissions = self.add_submissions(3)
+        models.Submission.objects.filter(id__in=[s.id for s in submissions[:2]]).delete()
+        assert_equal(self.get_length(), 1)
+
+        # E.g., deleting a submission through the thing it extends.
+        models.SubmittedThing.objects.filter(id=submissions[2].id).delete()
+        assert_equal(self.get_length(), 0)
+
+    @istest
+    def counts_submissions_moved_to_another_set(self):
+        from sa_api import models
+        submissions = self.add_submissions(2)
+        votes = models.SubmissionSet.objects.create(
+            place=self.submission_set.place, submission_type='votes')
+
+        submissions[0].parent = votes
+        submissions[0].save()
+        assert_equal(self.get_length(), 1)
+        assert_equal(models.SubmissionSet.objects.get(id=votes.id).length, 1)
+
+        # A submission loaded again is counted in the set it was saved in.
+        moved = models.Submission.objects.get(id=submissions[1].id)
+        moved.parent = votes
+        moved.save()
+        assert_equal(self.get_length(), 0)
+        assert_equal(models.SubmissionSet.objects.get(id=votes.id).length, 2)
+
+
+class TestRebuildSubmissionCountsCommand (SubmissionSetTestMixin, TestCase):
+
+    @istest
+    def fixes_wrong_lengths(self):
+        from sa_api import models
+        self.add_submissions(3)
+        models.SubmissionSet.objects.update(length=7)
+
+        call_command('rebuild_submission_counts', stdout=StringIO())
+        assert_equal(self.get_length(), 3)
+
+    @istest
+    def verify_reports_wrong_lengths_without_fixing_them(self):
+        from sa_api import models
+        self.add_submissions(3)
+        models.SubmissionSet.objects.update(length=7)
+
+        # call_command exits when the command raises a CommandError
+        assert_raises(SystemExit, call_command, 'rebuild_submission_counts',
+                      verify=True, stdout=StringIO(), stderr=StringIO())
+        assert_equal(self.get_length(), 7)
+
+    @istest
+    def verify_passes_when_lengths_are_right(self):
+        self.add_submissions(3)
+        call_command('rebuild_submission_counts', verify=True,
+                     stdout=StringIO())
+        assert_equal(self.get_length(), 3)
+
+
+class TestSubmissionSetSave (SubmissionSetTestMixin, TestCase):
+
+    @istest
+    def invalidates_cached_data_of_its_submissions(self):
+        from sa_api import caching
+        submission, = self.add_submissions(1)
+        place = self.submission_set.place
+        caching.set_fragments({submission.id: 'submission', place.id: 'place'})
+        scope = caching.dataset_scope('user', 'dataset')
+        version = caching.get_version(scope)
+
+        self.submission_set.submission_type = 'reviews'
+        self.submission_set.save()
+
+        assert_equal(caching.get_fragments([submission.id, place.id]), {})
+        assert caching.get_version(scope) != version
+
+
+class TestDataSetSave (SubmissionSetTestMixin, TestCase):
+
+    @istest
+    def invalidates_its_owners_list_of_datasets(self):
+        from sa_api import caching
+        scope = caching.owner_scope('user')
+        version = caching.get_version(scope)
+
+        self.dataset.display_name = 'Dataset'
+        self.dataset.save()
+        assert caching.get_version(scope) != version
+
+    @istest
+    def changes_to_its_data_leave_its_owners_scope_alone(self):
+        from sa_api import caching
+        scope = caching.owner_scope('user')
+        version = caching.get_version(scope)
+
+        self.add_submissions(1)
+        self.submission_set.place.save()
+        assert_equal(caching.get_version(scope), version)
+
+
+class TestActivityDetails (SubmissionSetTestMixin, TestCase):
+
+    def get_activity(self, thing):
+        from sa_api import models
+        return models.Activity.objects.filter(data_id=thing.id).latest('id')
+
+    @istest
+    def copies_place_details(self):
+        place = self.submission_set.place
+        activity = self.get_activity(place)
+        assert_equal(activity.dataset_id, self.dataset.id)
+        assert_equal(activity.place_id, place.id)
+        assert_equal(activity.submission_type, None)
+        assert_equal(activity.visible, True)
+
+    @istest
+    def copies_submission_details(self):
+        submission, = self.add_submissions(1)
+        activity = self.get_activity(submission)
+        assert_equal(activity.dataset_id, self.dataset.id)
+        assert_equal(activity.place_id, self.submission_set.place_id)
+        assert_equal(activity.submission_type, 'comments')
+        assert_equal(activity.visible, True)
+
+    @istest
+    def hides_activity_when_place_is_hidden(self):
+        from sa_api import models
+        submission, = self.add_submissions(1)
+        place = self.submission_set.place
+        place.visible = False
+        place.save()
+
+        assert_equal(models.Activity.objects.filter(visible=True).count(), 0)
+        assert_equal(self.get_activity(submission).visible, False)
@@ -0,0 +1,100 @@
+from django.test import TestCase
+from nose.tools import istest
+from nose.tools import assert_equal, assert_almost_equal
+from .. import mvt
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = ord(data[pos])
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def read_message(data):
+    """
+    Decode a protocol buffer message into a list of (field number, value)
+    pairs.  Length-delimited values are left as strings.
+    """
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.append((number, value))
+    return fields
+
+
+def read_packed(data):
+    values = []
+    pos = 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+class TestTileMath (object):
+
+    @istest
+    def tile_bounds_of_the_world(self):
+        west, south, east, north = mvt.tile_bounds(0, 0, 0)
+        assert_almost_equal(west, -180)
+        assert_almost_equal(east, 180)
+        assert_almost_equal(north, 85.0511, places=4)
+        assert_almost_equal(south, -85.0511, places=4)
+
+    @istest
+    def project_puts_the_origin_in_the_middle(self):
+        assert_equal(mvt.project(0, 0, 0, 0, 0), (2048, 2048))
+        assert_equal(mvt.project(0, 0, 1, 1, 1), (0, 0))
+        assert_equal(mvt.project(-180, 0, 1, 0, 0), (0, 4096))
+
+
+class TestEncodePoints (object):
+
+    @istest
+    def encodes_a_layer_of_points(self):
+        tile = mvt.encode_points('places', [
+            (1, 0, 0, {'name': u'Middle', 'rank': 1}),
+            (2, 0, 0, {'name': u'Also middle', 'open': True, 'other': None}),
+        ], 0, 0, 0)
+
+        # One layer
+        fields = read_message(tile)
+        assert_equal([number for number, _ in fields], [3])
+        layer = read_message(fields[0][1])
+        layer_fields = dict((number, []) for number, _ in layer)
+        for number, value in layer:
+            layer_fields[number].append(value)
+
+        assert_equal(layer_fields[15], [2])
+        assert_equal(layer_fields[1], ['places'])
+        assert_equal(layer_fields[5], [4096])
+        assert_equal(len(layer_fields[2]), 2)
+
+        keys = layer_fields[3]
+        values = [dict(read_message(value)) for value in layer_fields[4]]
+
+        feature = dict(read_message(layer_fields[2][1]))
+        assert_equal(feature[1], 2)
+        assert_equal(feature[3], mvt.POINT)
+        # MoveTo(1), then zigzag-encoded 2048, 2048
+        assert_equal(read_packed(feature[4]), [9, 4096, 4096])
+
+        tags = read_packed(feature[2])
+        properties = {}
+        for key_index, value_index in zip(tags[::2], tags[1::2]):
+            properties[keys[key_index]] = values[value_index]
+        assert_equal(properties, {'name': {1: 'Also middle'}, 'open': {7: 1}})
@@ -0,0 +1,133 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.conf import settings
+from django.core.cache import cache
+from mock import patch
+from nose.tools import istest
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from .. import caching
+from .. import notifications
+import psycopg2
+import socket
+import threading
+import time
+
+
+class TestWaitForActivity (TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.scope = caching.dataset_scope('user', 'dataset')
+
+    def tearDown(self):
+        cache.clear()
+
+    @istest
+    def returns_right_away_if_the_version_has_changed(self):
+        version = caching.get_version(self.scope)
+        caching.bump_version(self.scope)
+
+        with patch.object(notifications, 'get_listener', return_value=None):
+            with patch('time.sleep') as sleep:
+                assert notifications.wait_for_activity(self.scope, version, 10)
+                assert_equal(sleep.call_count, 0)
+
+    @istest
+    def polls_the_version_without_a_listener(self):
+        version = caching.get_version(self.scope)
+
+        def bump_on_second_sleep(seconds):
+            if sleep.call_count == 2:
+                caching.bump_version(self.scope)
+
+        with patch.object(notifications, 'get_listener', return_value=None):
+            with patch('time.sleep', side_effect=bump_on_second_sleep) as sleep:
+                assert notifications.wait_for_activity(self.scope, version, 10)
+                assert_equal(sleep.call_count, 2)
+
+    @istest
+    def leaves_checking_to_the_caller_without_a_listener_or_shared_cache(self):
+        version = caching.get_version(self.scope)
+
+        with patch.object(notifications, 'get_listener', return_value=None):
+            with patch.object(caching, 'is_shared', return_value=False):
+                with patch('time.sleep') as sleep:
+                    assert notifications.wait_for_activity(self.scope, version, 10)
+                    sleep.assert_called_once_with(notifications.POLL_INTERVAL)
+
+                assert not notifications.wait_for_activity(self.scope, version, 0)
+
+    @istest
+    def leaves_checking_to_the_caller_for_the_global_scope(self):
+        scope = caching.GLOBAL_SCOPE
+        version = caching.get_version(scope)
+
+        with patch.object(notifications, 'get_listener', return_value=None):
+            with patch('time.sleep') as sleep:
+                assert notifications.wait_for_activity(scope, version, 10)
+                sleep.assert_called_once_with(notifications.POLL_INTERVAL)
+
+    @istest
+    def returns_false_when_the_time_runs_out(self):
+        version = caching.get_version(self.scope)
+
+        with patch.object(notifications, 'get_listener', return_value=None):
+            assert not notifications.wait_for_activity(self.scope, version, 0)
+
+
+class TestActivityListener (object):
+
+    @istest
+    def payloads_wake_the_dataset_owner_and_global_scopes(self):
+        assert_equal(notifications.scopes_for_payload('user/dataset'),
+                     [caching.dataset_scope('user', 'dataset'),
+                      caching.owner_scope('user'),
+                      caching.GLOBAL_SCOPE])
+
+    @istest
+    def wakes_waiters_on_the_notified_scope(self):
+        listener = notifications.ActivityListener()
+        scope = caching.dataset_scope('user', 'dataset')
+        results = []
+
+        with patch.object(listener, 'start'):
+            waiter = threading.Thread(
+                target=lambda: results.append(listener.wait(scope, 10)))
+            waiter.start()
+            while not listener.waiters:
+                time.sleep(0.01)
+
+            listener.wake('user/other')
+            listener.wake('user/dataset')
+            waiter.join()
+
+        assert_equal(results, [True])
+        assert_equal(listener.waiters, {})
+
+    @istest
+    def times_out_without_notifications(self):
+        listener = notifications.ActivityListener()
+        scope = caching.dataset_scope('user', 'dataset')
+
+        with patch.object(listener, 'start'):
+            assert not listener.wait(scope, 0.01)
+
+    @istest
+    def gives_up_connecting_to_a_database_that_does_not_answer(self):
+        # A server that accepts connections, but never says anything.
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        db = dict(settings.DATABASES['default'],
+                  HOST='127.0.0.1', PORT=server.getsockname()[1])
+
+        listener = notifications.ActivityListener()
+        try:
+            with override_settings(DATABASES={'default': db}):
+                with patch.object(notifications, 'CONNECT_TIMEOUT', 0.1):
+                    start = time.time()
+                    assert_raises(psycopg2.OperationalError, listener.connect)
+                    assert time.time() - start < 5
+        finally:
+            server.close()
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from mock import patch
 from nose.tools import istest
 from sa_api.renderers import CSVRenderer
 
@@ -50,3 +51,99 @@ class TestCSVRenderer (TestCase):
                                 [None, 1   , 2   , None  , None ],
                                 [None, None, 3   , 4     , 5    ],
                                 [6   , None, None, None  , None ]])
+
+    @istest
+    def render_stream_matches_render(self):
+        renderer = CSVRenderer(None)
+        items = [{'a': 1, 'b': u'caf\xe9'},
+                 {'b': 3, 'c': [4, 5]},
+                 6]
+
+        streamed = ''.join(renderer.render_stream(items))
+        self.assertEqual(streamed, renderer.render(items))
+        self.assertEqual(''.join(renderer.render_stream([])), '')
+
+    @istest
+    def render_stream_yields_in_pieces(self):
+        renderer = CSVRenderer(None)
+        renderer.stream_buffer_size = 10
+        items = [{'name': 'place %s' % i} for i in range(5)]
+
+        pieces = list(renderer.render_stream(items))
+        self.assert_(len(pieces) > 1)
+        self.assertEqual(''.join(pieces), renderer.render(items))
+
+    @istest
+    def render_stream_takes_headers_from_skeletons(self):
+        renderer = CSVRenderer(None)
+        items = [{'a': 1}, {'b': {'c': 2}}]
+
+        class Collection (list):
+            def iter_skeletons(self):
+                return iter([{'a': None}, {'b': {'c': None}}, {'d': None}])
+
+        with patch.object(renderer, 'get_item_data', wraps=renderer.get_item_data) as get_item_data:
+            streamed = ''.join(renderer.render_stream(Collection(items)))
+        self.assertEqual(streamed, 'a,b.c,d\r\n1,,\r\n,2,\r\n')
+        self.assertEqual(get_item_data.call_count, 5)
+
+    @istest
+    def render_stream_reads_fragments(self):
+        from sa_api.utils import JSONFragment
+        renderer = CSVRenderer(None)
+        items = [JSONFragment('{"id": 1, "location": {"lat": 2, "lng": 3}}')]
+
+        streamed = ''.join(renderer.render_stream(items))
+        self.assertEqual(streamed, 'id,location.lat,location.lng\r\n1,2,3\r\n')
+
+
+class TestJSONRenderer (TestCase):
+
+    @istest
+    def render_stream_matches_render(self):
+        import json
+        from sa_api.renderers import JSONRenderer
+        renderer = JSONRenderer(None)
+        items = [{'id': 1, 'name': 'one'}, {'id': 2, 'name': 'two'}, 3]
+
+        streamed = ''.join(renderer.render_stream(iter(items)))
+        self.assertEqual(json.loads(streamed), items)
+
+        streamed = ''.join(renderer.render_stream(iter([])))
+        self.assertEqual(json.loads(streamed), [])
+
+    @istest
+    def render_stream_yields_in_pieces(self):
+        import json
+        from sa_api.renderers import JSONRenderer
+        renderer = JSONRenderer(None)
+        renderer.stream_buffer_size = 10
+        items = [{'name': 'place %s' % i} for i in range(5)]
+
+        pieces = list(renderer.render_stream(iter(items)))
+        self.assert_(len(pieces) > 1)
+        self.assertEqual(json.loads(''.join(pieces)), items)
+
+    @istest
+    def render_stream_writes_fragments_as_they_are(self):
+        import json
+        from sa_api.renderers import JSONRenderer
+        from sa_api.utils import JSONFragment
+        renderer = JSONRenderer(None)
+        items = [JSONFragment('{"id": 1}'), {'id': 2}]
+
+        streamed = ''.join(renderer.render_stream(iter(items)))
+        self.assertEqual(streamed, '[{"id": 1},{"id": 2}]')
+
+        streamed = ''.join(renderer.render_stream(iter(items), 'application/json; indent=2'))
+        self.assertEqual(json.loads(streamed), [{'id': 1}, {'id': 2}])
+
+    @istest
+    def render_decodes_fragments(self):
+        import json
+        from sa_api.renderers import JSONRenderer
+        from sa_api.utils import JSONFragment
+        renderer = JSONRenderer(None)
+
+        rendered = renderer.render([JSONFragment('{"id": 1}')])
+        self.assertEqual(json.loads(rendered), [{'id': 1}])
@@ -3,6 +3,7 @@ from mock_django.models import ModelMock
 from nose.tools import istest
 from nose.tools import assert_equal, assert_raises, assert_in
 from djangorestframework.response import ErrorResponse
+import json
 import mock
 
 
@@ -131,10 +132,27 @@ class TestPlaceResource(TestCase):
             123: [{'length': 3, 'url': '/api/v1/datasets/user/dataset/places/123/foo/', 'type': 'foo'}],
             456: [{'length': 2, 'url': '/api/v1/datasets/user/dataset/places/456/bar/', 'type': 'bar'}],
         }
-        assert_equal(dict(PlaceResource().submission_sets), expected_result)
+        resource = PlaceResource()
+        resource.load_submission_sets(models.Place.objects.all())
+        assert_equal(resource.submission_sets, expected_result)
         for place in models.Place.objects.all():
             assert_in(place.id, expected_result)
 
+    @istest
+    def submission_sets_only_for_loaded_places(self):
+        from ..resources import models, PlaceResource
+        self.populate()
+        resource = PlaceResource()
+        resource.load_submission_sets(models.Place.objects.filter(id=123))
+        assert_equal(resource.submission_sets, {
+            123: [{'length': 3, 'url': '/api/v1/datasets/user/dataset/places/123/foo/', 'type': 'foo'}],
+        })
+
+        # Places that weren't loaded up front are loaded on demand.
+        place = models.Place.objects.get(id=456)
+        assert_equal(resource.submissions(place),
+                     [{'length': 2, 'url': '/api/v1/datasets/user/dataset/places/456/bar/', 'type': 'bar'}])
+
     @istest
     def test_location(self):
         from ..resources import PlaceResource
@@ -180,6 +198,211 @@ class TestPlaceResource(TestCase):
                      '/api/v1/datasets/test-user/test-set/places/123/')
 
 
+class TestPlannedSerialization(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        models.Submission.objects.all().delete()
+        models.SubmissionSet.objects.all().delete()
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+
+    def setUp(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        self._cleanup()
+
+        owner = User.objects.create(username='user')
+        dataset = models.DataSet.objects.create(owner=owner, slug='dataset')
+        place = models.Place.objects.create(
+            location='POINT (1.0 2.0)', dataset=dataset,
+            submitter_name=u'Mich\xe8le', visible=False,
+            data=json.dumps({'name': 'Cafe', 'tags': ['a', 'b'],
+                             'links': [{'url': '/somewhere/else/'}]}))
+        models.Place.objects.create(
+            location='POINT (3.0 4.0)', dataset=dataset,
+            data=json.dumps({'url': 'http://example.com/'}))
+
+        submission_set = models.SubmissionSet.objects.create(
+            place=place, submission_type='comments')
+        for i in range(2):
+            models.Submission.objects.create(
+                parent=submission_set, dataset=dataset,
+                data=json.dumps({'comment': 'Number %s' % i}))
+
+    def tearDown(self):
+        self._cleanup()
+
+    def get_resource(self, resource_class, request=None):
+        return resource_class(view=mock.Mock(request=request, model=None))
+
+    def assert_same_as_reflection(self, resource_class, queryset):
+        from django.test.client import RequestFactory
+        from ..resources import PlannedSerializationMixin
+        from ..views import AbsUrlMixin
+
+        # Without a request, URLs are left relative.
+        resource = self.get_resource(resource_class)
+        planned = resource.filter_response(queryset)
+        reflected = [super(PlannedSerializationMixin, resource).serialize(obj)
+                     for obj in queryset]
+        assert_equal(planned, reflected)
+
+        # With a request, they are made absolute.
+        request = RequestFactory().get('/api/v1/datasets/user/dataset/places/')
+        resource = self.get_resource(resource_class, request)
+        planned = resource.filter_response(queryset)
+
+        view = AbsUrlMixin()
+        view.request = request
+        reflected = [super(PlannedSerializationMixin, resource).serialize(obj)
+                     for obj in queryset]
+        reflected = view.process_urls(reflected)
+        assert_equal(planned, reflected)
+
+        # And the JSON is the same.
+        from ..renderers import JSONRenderer
+        assert_equal(JSONRenderer(None).render(planned),
+                     JSONRenderer(None).render(reflected))
+
+    @istest
+    def places_serialize_the_same_as_with_reflection(self):
+        from ..resources import PlaceResource, models
+        self.assert_same_as_reflection(PlaceResource, models.Place.objects.all())
+
+    @istest
+    def submissions_serialize_the_same_as_with_reflection(self):
+        from ..resources import SubmissionResource, models
+        self.assert_same_as_reflection(SubmissionResource, models.Submission.objects.all())
+
+    @istest
+    def benchmark_checks_the_outputs_match(self):
+        from django.core.management import call_command
+        from StringIO import StringIO
+        stdout = StringIO()
+        call_command('benchmark_serializers', places=4, repeat=1, stdout=stdout)
+        assert_in('Speedup:', stdout.getvalue())
+
+    @istest
+    def benchmark_can_run_without_saving_places(self):
+        from django.core.management import call_command
+        from StringIO import StringIO
+        from sa_api import models
+        stdout = StringIO()
+        call_command('benchmark_serializers', places=4, repeat=1, in_memory=True, stdout=stdout)
+        assert_in('Speedup:', stdout.getvalue())
+        assert_equal(models.Place.objects.count(), 0)
+
+
+class TestFragments(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        models.Submission.objects.all().delete()
+        models.SubmissionSet.objects.all().delete()
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def setUp(self):
+        from sa_api import models
+        from django.contrib.auth.models import User
+        self._cleanup()
+
+        owner = User.objects.create(username='user')
+        self.dataset = models.DataSet.objects.create(owner=owner, slug='dataset')
+        self.place = models.Place.objects.create(
+            location='POINT (1.0 2.0)', dataset=self.dataset,
+            data=json.dumps({'name': 'Cafe'}))
+        self.submission_set = models.SubmissionSet.objects.create(
+            place=self.place, submission_type='comments')
+
+    def tearDown(self):
+        self._cleanup()
+
+    def get_fragment_data(self, resource=None):
+        from ..resources import PlaceResource, models
+        from django.test.client import RequestFactory
+        request = RequestFactory().get('/api/v1/datasets/user/dataset/places/')
+        resource = resource or PlaceResource(view=mock.Mock(request=request, model=None))
+        fragments = resource.filter_fragments(models.Place.objects.all())
+        return [json.loads(fragment.json) for fragment in fragments]
+
+    def get_serialized_data(self):
+        from ..resources import PlaceResource, models
+        from ..renderers import JSONRenderer
+        from django.test.client import RequestFactory
+        request = RequestFactory().get('/api/v1/datasets/user/dataset/places/')
+        resource = PlaceResource(view=mock.Mock(request=request, model=None))
+        serialized = resource.filter_response(models.Place.objects.all())
+        return json.loads(JSONRenderer(None).render(serialized))
+
+    @istest
+    def fragments_match_serialization(self):
+        assert_equal(self.get_fragment_data(), self.get_serialized_data())
+
+    @istest
+    def fragments_are_cached(self):
+        from ..resources import PlaceResource
+        self.get_fragment_data()
+        with mock.patch.object(PlaceResource, 'serialize_instance') as serialize_instance:
+            self.get_fragment_data()
+            assert_equal(serialize_instance.call_count, 0)
+
+    @istest
+    def fragments_are_rerendered_when_things_are_saved(self):
+        self.get_fragment_data()
+        self.place.data = json.dumps({'name': 'Diner'})
+        self.place.save()
+
+        data, = self.get_fragment_data()
+        assert_equal(data['name'], 'Diner')
+        assert_equal([data], self.get_serialized_data())
+
+    @istest
+    def volatile_fields_are_kept_up_to_date(self):
+        from sa_api import models
+        self.get_fragment_data()
+        models.Submission.objects.create(parent=self.submission_set,
+                                         dataset=self.dataset)
+
+        data, = self.get_fragment_data()
+        assert_equal([s['length'] for s in data['submissions']], [1])
+        assert_equal([data], self.get_serialized_data())
+
+
+    @istest
+    def skeletons_have_the_keys_of_the_serializations(self):
+        from ..renderers import CSVRenderer
+        from ..resources import PlaceResource, models
+        from django.test.client import RequestFactory
+        models.Submission.objects.create(parent=self.submission_set,
+                                         dataset=self.dataset)
+        models.Place.objects.create(
+            location='POINT (3.0 4.0)', dataset=self.dataset,
+            data=json.dumps({'hours': {'open': 9, 'close': 17}}))
+
+        request = RequestFactory().get('/api/v1/datasets/user/dataset/places/')
+        resource = PlaceResource(view=mock.Mock(request=request, model=None))
+        renderer = CSVRenderer(None)
+
+        def keys(items):
+            return sorted(set(key for item in items
+                              for key in renderer.flatten_item(item)))
+
+        with mock.patch.object(PlaceResource, 'serialize_instance') as serialize_instance:
+            skeleton_keys = keys(resource.iter_skeletons(models.Place.objects.all(), 1))
+            assert_equal(serialize_instance.call_count, 0)
+        assert_equal(skeleton_keys, keys(self.get_serialized_data()))
+        assert_in('submissions.0.length', skeleton_keys)
+        assert_in('hours.open', skeleton_keys)
+
+
 class TestDataSetResource(object):
 
     @istest
@@ -215,35 +438,37 @@ class TestDataSetResource(object):
                           'length': 2})
 
 
-class TestActivityResource(object):
+class TestActivityResource(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from ..models import DataSet, Place, SubmissionSet, Submission, Activity
+        User.objects.all().delete()
+        DataSet.objects.all().delete()
+        Activity.objects.all().delete()
+
+        owner = User.objects.create(username='myuser')
+        dataset = DataSet.objects.create(slug='data', owner_id=owner.id)
+        self.place = Place.objects.create(dataset_id=dataset.id, location='POINT (0 0)')
+        submission_set = SubmissionSet.objects.create(place_id=self.place.id, submission_type='comments')
+        self.submission = Submission.objects.create(dataset_id=dataset.id, parent_id=submission_set.id)
 
     @istest
-    def test_things(self):
+    def test_type(self):
         from ..resources import ActivityResource
-        p1 = mock.Mock(submittedthing_ptr_id=1, id=10)
-        p2 = mock.Mock(submittedthing_ptr_id=2, id=20)
-        mock_places = [p1, p2]
+        from ..models import Activity
+        resource = ActivityResource()
 
-        s1 = mock.Mock(submittedthing_ptr_id=30, id=300)
-        s1.parent.submission_type = 'stype1'
-        s1.parent.place_id = 300
-        s2 = mock.Mock(submittedthing_ptr_id=40)
-        s2.parent.submission_type = 'stype2'
-        s2.parent.place_id = 400
-        mock_submissions = [s1, s2]
+        assert_equal(resource.type(Activity.objects.get(data_id=self.place.id)), 'places')
+        assert_equal(resource.type(Activity.objects.get(data_id=self.submission.id)), 'comments')
 
-        mock_view = mock.Mock()
-        mock_view.get_places = mock.Mock(return_value=mock_places)
-        mock_view.get_submissions = mock.Mock(return_value=mock_submissions)
-
-        resource = ActivityResource(view=mock_view)
+    @istest
+    def test_serialize_list(self):
+        from ..resources import ActivityResource
+        from ..models import Activity
+        resource = ActivityResource()
+        data = resource.filter_response(Activity.objects.all().order_by('id'))
 
-        assert_equal(
-            resource.things,
-            {
-                1: {'data': p1, 'place_id': 10, 'type': 'places'},
-                2: {'data': p2, 'place_id': 20, 'type': 'places'},
-                30: {'data': s1, 'place_id': 300, 'type': 'stype1'},
-                40: {'data': s2, 'place_id': 400, 'type': 'stype2'},
-            }
-        )
+        assert_equal([(a['type'], a['place_id']) for a in data],
+                     [('places', self.place.id),
+                      ('comments', self.place.id)])
@@ -0,0 +1,43 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from nose.tools import istest
+from nose.tools import assert_equal
+from .. import submission_queue
+from ..models import DataSet, Place, Submission, SubmissionSet
+from ..models import QueuedSubmission, Activity
+import json
+
+
+class TestProcessBatch (TestCase):
+
+    def setUp(self):
+        owner = User.objects.create(username='user')
+        self.dataset = DataSet.objects.create(owner=owner, slug='data')
+        self.other_dataset = DataSet.objects.create(owner=owner, slug='other')
+        self.place = Place.objects.create(dataset=self.dataset,
+                                          location='POINT (1 2)')
+        self.other_place = Place.objects.create(dataset=self.other_dataset,
+                                                location='POINT (3 4)')
+
+    @istest
+    def saves_the_oldest_submissions_and_dequeues_them(self):
+        first = submission_queue.enqueue(self.place, 'votes', 'Alice', '{"vote": 1}')
+        submission_queue.enqueue(self.other_place, 'votes', None, '{"vote": 2}')
+        last = submission_queue.enqueue(self.place, 'votes', None, '{"vote": 3}')
+
+        assert_equal(submission_queue.process_batch(batch_size=2), 2)
+
+        assert_equal(list(QueuedSubmission.objects.values_list('id', flat=True)),
+                     [last.id])
+        votes = Submission.objects.get(parent__place=self.place)
+        assert_equal((votes.submitter_name, json.loads(votes.data)),
+                     ('Alice', {'vote': 1}))
+        assert_equal(votes.dataset_id, self.dataset.id)
+        assert_equal(votes.created_datetime, first.created_datetime)
+        assert_equal(Submission.objects.get(parent__place=self.other_place).dataset_id,
+                     self.other_dataset.id)
+        assert_equal(Activity.objects.filter(submission_type='votes').count(), 2)
+
+        assert_equal(submission_queue.process_batch(), 1)
+        assert_equal(SubmissionSet.objects.get(place=self.place).length, 2)
+        assert_equal(submission_queue.process_batch(), 0)
@@ -0,0 +1,81 @@
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.core.urlresolvers import reverse, set_script_prefix, NoReverseMatch
+from nose.tools import istest
+from nose.tools import assert_equal, assert_raises
+from .. import urlbuilder
+
+
+class TestBuildUrl (TestCase):
+
+    # Every named URL, with some arguments for it.
+    urls = [
+        ('dataset_collection_by_user', {'owner__username': 'user'}),
+        ('dataset_instance_by_user', {'owner__username': 'user', 'slug': 'data'}),
+        ('api_key_collection_by_dataset', {'datasets__owner__username': 'user', 'datasets__slug': 'data'}),
+        ('place_collection_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data'}),
+        ('place_bulk_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data'}),
+        ('place_clusters_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data'}),
+        ('place_tile_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'z': 1, 'x': 2, 'y': 3}),
+        ('place_instance_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'pk': 12}),
+        ('submission_collection_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'place_id': 12, 'submission_type': 'comments'}),
+        ('submission_instance_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'place_id': 12, 'submission_type': 'comments', 'pk': 34}),
+        ('activity_collection_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data'}),
+        ('all_submissions_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'submission_type': 'comments'}),
+        ('submission_bulk_by_dataset', {'dataset__owner__username': 'user', 'dataset__slug': 'data', 'submission_type': 'comments'}),
+        ('owner_password', {'owner__username': 'user'}),
+        ('place_instance', {'pk': 12}),
+        ('submission_collection', {'place_id': 12, 'submission_type': 'comments'}),
+        ('submission_instance', {'place_id': 12, 'submission_type': 'comments', 'pk': 34}),
+        ('activity_collection', {}),
+    ]
+
+    def setUp(self):
+        urlbuilder.clear_cache()
+
+    def tearDown(self):
+        set_script_prefix('/')
+        urlbuilder.clear_cache()
+
+    @istest
+    def matches_reverse_with_kwargs(self):
+        for name, kwargs in self.urls:
+            assert_equal(urlbuilder.build_url(name, kwargs=kwargs),
+                         reverse(name, kwargs=kwargs))
+
+    @istest
+    def matches_reverse_with_args(self):
+        assert_equal(urlbuilder.build_url('place_instance_by_dataset', args=('user', 'data', 12)),
+                     reverse('place_instance_by_dataset', args=('user', 'data', 12)))
+
+    @istest
+    def matches_reverse_with_unicode(self):
+        kwargs = {'owner__username': u'j\xf6rg', 'slug': u'caf\xe9 data'}
+        assert_equal(urlbuilder.build_url('dataset_instance_by_user', kwargs=kwargs),
+                     reverse('dataset_instance_by_user', kwargs=kwargs))
+
+    @istest
+    def matches_reverse_with_a_script_prefix(self):
+        set_script_prefix('/mounted/')
+        for name, kwargs in self.urls:
+            assert_equal(urlbuilder.build_url(name, kwargs=kwargs),
+                         reverse(name, kwargs=kwargs))
+
+    @istest
+    def does_not_build_urls_that_reverse_would_not(self):
+        assert_raises(NoReverseMatch, urlbuilder.build_url,
+                      'dataset_instance_by_user', kwargs={'owner__username': 'a/b', 'slug': 'data'})
+        assert_raises(NoReverseMatch, urlbuilder.build_url,
+                      'place_instance_by_dataset', args=('user', 'data'))
+        assert_raises(NoReverseMatch, urlbuilder.build_url, 'no_such_view')
+
+
+class TestBuildAbsoluteUri (object):
+
+    @istest
+    def matches_the_request(self):
+        request = RequestFactory().get('/api/v1/datasets/user/data/places/')
+        for location in ['/api/v1/datasets/', u'/caf\xe9 places/', '//elsewhere/',
+                         'http://example.com/', 'relative/', '?page=2']:
+            assert_equal(urlbuilder.build_absolute_uri(request, location),
+                         request.build_absolute_uri(location))
@@ -142,3 +142,63 @@ class TestCachedProperty (object):
         assert_equal(foo.parting, 'goodbye 101')
         assert_equal(foo.greeting, 'hello 1')
         assert_equal(foo.parting, 'goodbye 101')
+
+
+class TestIterQuerysetChunks (TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from ..models import DataSet, Place
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(owner=owner, slug='dataset')
+        for place_id in [5, 1, 4, 2, 3]:
+            Place.objects.create(id=place_id, location='POINT (0.0 0.0)',
+                                 dataset=dataset)
+
+    @istest
+    def pages_through_unordered_querysets_by_key(self):
+        from ..models import Place
+        chunks = list(utils.iter_queryset_chunks(Place.objects.all(), 2))
+        assert_equal([[p.id for p in chunk] for chunk in chunks],
+                     [[1, 2], [3, 4], [5]])
+
+    @istest
+    def keeps_the_ordering_of_ordered_querysets(self):
+        from ..models import Place
+        qs = Place.objects.all().order_by('-id')
+        chunks = list(utils.iter_queryset_chunks(qs, 2))
+        assert_equal([[p.id for p in chunk] for chunk in chunks],
+                     [[5, 4], [3, 2], [1]])
+
+    @istest
+    def pages_through_tied_orderings_by_key(self):
+        from ..models import Place, SubmittedThing
+        from django.utils import timezone
+        from datetime import timedelta
+        # Places 1 to 4 are all created at the same time, so the chunk
+        # boundaries fall between ties.
+        now = timezone.now()
+        SubmittedThing.objects.filter(id__in=[1, 2, 3, 4]).update(created_datetime=now)
+        SubmittedThing.objects.filter(id=5).update(
+            created_datetime=now - timedelta(days=1))
+
+        qs = Place.objects.all().order_by('created_datetime')
+        assert_equal(utils.get_keyset_ordering(qs),
+                     [('created_datetime', 'created_datetime', False),
+                      ('pk', 'submittedthing_ptr_id', False)])
+        chunks = list(utils.iter_queryset_chunks(qs, 2))
+        assert_equal([[p.id for p in chunk] for chunk in chunks],
+                     [[5, 1], [2, 3], [4]])
+
+        qs = Place.objects.all().order_by('-created_datetime')
+        chunks = list(utils.iter_queryset_chunks(qs, 3))
+        assert_equal([[p.id for p in chunk] for chunk in chunks],
+                     [[1, 2, 3], [4, 5]])
+
+    @istest
+    def streaming_collection_can_be_iterated_more_than_once(self):
+        from ..models import Place
+        collection = utils.StreamingCollection(
+            Place.objects.all(), lambda chunk: [p.id for p in chunk], 2)
+        assert_equal(list(collection), [1, 2, 3, 4, 5])
+        assert_equal(list(collection), [1, 2, 3, 4, 5])
@@ -1,20 +1,27 @@
 from django.test import TestCase
 from django.test.client import Client
 from django.test.client import RequestFactory
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.utils.http import http_date
+from djangorestframework import mixins
 from djangorestframework.response import ErrorResponse
 from mock import patch
+from nose.plugins.skip import SkipTest
 from nose.tools import (istest, assert_equal, assert_not_equal, assert_in,
-                        assert_raises)
+                        assert_not_in, assert_raises)
 from ..models import DataSet, Place, Submission, SubmissionSet
 from ..models import SubmittedThing, Activity
+from .. import datafilters
 from ..views import SubmissionCollectionView
 from ..views import raise_error_if_not_authenticated
 from ..views import ApiKeyCollectionView
 from ..views import OwnerPasswordView
 import json
 import mock
+import time
 
 
 class TestAuthFunctions(object):
@@ -96,6 +103,55 @@ class TestAuthFunctions(object):
                       user)
 
 
+class TestAuthMixin(object):
+
+    class DummyView(mixins.AuthMixin):
+        def dispatch(self, request, *args, **kwargs):
+            return 'ok'
+
+    def get_view(self):
+        from ..views import AuthMixin
+        from djangorestframework import permissions
+
+        class View (AuthMixin, self.DummyView):
+            permissions = [permissions.FullAnonAccess]
+            allowed_username = 'bob'
+            _authenticate = mock.Mock(return_value=mock.Mock(is_superuser=True))
+
+        return View()
+
+    @istest
+    def safe_requests_are_not_authenticated(self):
+        view = self.get_view()
+        request = RequestFactory().get('', HTTP_AUTHORIZATION='Basic Ym9iOmJvYg==')
+        request.user = mock.Mock()
+
+        assert_equal(view.dispatch(request), 'ok')
+        view._check_permissions()
+        assert_equal(view._authenticate.call_count, 0)
+
+    @istest
+    def safe_requests_are_authenticated_when_the_user_is_needed(self):
+        from djangorestframework import permissions
+        view = self.get_view()
+        view.permissions = [permissions.IsAuthenticated]
+        request = RequestFactory().get('')
+        request.user = mock.Mock()
+
+        view.dispatch(request)
+        view._check_permissions()
+        assert_equal(view._authenticate.call_count, 1)
+
+    @istest
+    def unsafe_requests_are_authenticated(self):
+        view = self.get_view()
+        request = RequestFactory().post('')
+        request.user = mock.Mock()
+
+        assert_equal(view.dispatch(request), 'ok')
+        assert_equal(view._authenticate.call_count, 1)
+
+
 class TestDataSetCollectionView(TestCase):
 
     @istest
@@ -279,12 +335,135 @@ class TestMakingAPostRequestToASubmissionTypeCollectionUrl (TestCase):
         response = view(request, place_id=place.id,
                         submission_type='comments',
                         dataset__owner__username=owner.username,
+                        dataset__slug=dataset.slug,
                         )
         data = json.loads(response.content)
         #print response
         assert_equal(response.status_code, 201)
         assert_in('age', data)
 
+    @istest
+    def post_of_a_queued_type_is_queued(self):
+        from django.test.utils import override_settings
+        from ..models import QueuedSubmission
+
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(slug='data', owner_id=owner.id)
+        place = Place.objects.create(location='POINT(0 0)',
+                                     dataset_id=dataset.id)
+
+        data = {'submitter_name': 'Mjumbe Poe', 'vote': 'yes'}
+        request = RequestFactory().post('/places/%d/votes/' % place.id,
+                                        data=json.dumps(data), content_type='application/json')
+        request.user = mock.Mock(**{'is_authenticated.return_value': True})
+        view = SubmissionCollectionView.as_view()
+
+        with override_settings(SA_API_QUEUED_SUBMISSION_TYPES=['votes']):
+            response = view(request, place_id=place.id,
+                            submission_type='votes',
+                            dataset__owner__username=owner.username,
+                            dataset__slug=dataset.slug,
+                            )
+
+        assert_equal(response.status_code, 202)
+        queued = QueuedSubmission.objects.get()
+        assert_equal(json.loads(response.content),
+                     {'provisional_id': queued.id, 'status': 'queued'})
+        assert_equal((queued.place_id, queued.submission_type, queued.submitter_name),
+                     (place.id, 'votes', 'Mjumbe Poe'))
+        assert_equal(json.loads(queued.data), {'vote': 'yes'})
+        assert_equal(Submission.objects.count(), 0)
+
+    @istest
+    def post_to_a_place_in_another_dataset_is_not_found(self):
+        from django.test.utils import override_settings
+        from django.http import Http404
+        from ..models import QueuedSubmission
+
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(slug='data', owner_id=owner.id)
+        other_owner = User.objects.create(username='other')
+        other_dataset = DataSet.objects.create(slug='data', owner_id=other_owner.id)
+        place = Place.objects.create(location='POINT(0 0)',
+                                     dataset_id=other_dataset.id)
+        view = SubmissionCollectionView.as_view()
+
+        for queued_types in [[], ['votes']]:
+            request = RequestFactory().post('/places/%d/votes/' % place.id,
+                                            data=json.dumps({'vote': 'yes'}),
+                                            content_type='application/json')
+            request.user = mock.Mock(**{'is_authenticated.return_value': True})
+
+            with override_settings(SA_API_QUEUED_SUBMISSION_TYPES=queued_types):
+                with assert_raises(Http404):
+                    view(request, place_id=place.id,
+                         submission_type='votes',
+                         dataset__owner__username=owner.username,
+                         dataset__slug=dataset.slug,
+                         )
+
+        assert_equal(QueuedSubmission.objects.count(), 0)
+        assert_equal(Submission.objects.count(), 0)
+        assert_equal(SubmissionSet.objects.count(), 0)
+
+    @istest
+    def post_locks_the_place_before_making_a_submission_set(self):
+        from .. import bulk
+
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(slug='data', owner_id=owner.id)
+        place = Place.objects.create(location='POINT(0 0)',
+                                     dataset_id=dataset.id)
+
+        request = RequestFactory().post('/places/%d/votes/' % place.id,
+                                        data=json.dumps({'vote': 'yes'}),
+                                        content_type='application/json')
+        request.user = mock.Mock(**{'is_authenticated.return_value': True})
+        view = SubmissionCollectionView.as_view()
+
+        with patch.object(bulk, 'lock_places', wraps=bulk.lock_places) as lock_places:
+            response = view(request, place_id=place.id,
+                            submission_type='votes',
+                            dataset__owner__username=owner.username,
+                            dataset__slug=dataset.slug,
+                            )
+
+        assert_equal(response.status_code, 201)
+        lock_places.assert_called_once_with([place.id])
+        assert_equal(SubmissionSet.objects.get(place=place).submission_type, 'votes')
+
+    @istest
+    def post_uses_a_submission_set_made_while_waiting_for_the_lock(self):
+        from .. import bulk
+
+        owner = User.objects.create(username='user')
+        dataset = DataSet.objects.create(slug='data', owner_id=owner.id)
+        place = Place.objects.create(location='POINT(0 0)',
+                                     dataset_id=dataset.id)
+
+        # As if a bulk import held the lock, and made the set before letting
+        # go of it.
+        def lock_places(place_ids):
+            SubmissionSet.objects.create(place_id=place.id, submission_type='votes')
+
+        request = RequestFactory().post('/places/%d/votes/' % place.id,
+                                        data=json.dumps({'vote': 'yes'}),
+                                        content_type='application/json')
+        request.user = mock.Mock(**{'is_authenticated.return_value': True})
+        view = SubmissionCollectionView.as_view()
+
+        with patch.object(bulk, 'lock_places', lock_places):
+            response = view(request, place_id=place.id,
+                            submission_type='votes',
+                            dataset__owner__username=owner.username,
+                            dataset__slug=dataset.slug,
+                            )
+
+        assert_equal(response.status_code, 201)
+        votes = SubmissionSet.objects.get(place=place)
+        assert_equal(votes.length, 1)
+        assert_equal(Submission.objects.get().parent_id, votes.id)
+
 
 class TestSubmissionInstanceAPI (TestCase):
 
@@ -403,7 +582,7 @@ class TestActivityView(TestCase):
             Activity.objects.create(data=self.visible_place, action='delete'),
         ]
 
-        kwargs = dict(data__dataset__owner__username=self.owner.username, data__dataset__slug='data')
+        kwargs = dict(dataset__owner__username=self.owner.username, dataset__slug='data')
         self.url = reverse('activity_collection_by_dataset', kwargs=kwargs)
 
         # This was here first and marked as deprecated, but above doesn't
@@ -453,16 +632,134 @@ class TestActivityView(TestCase):
         from ..views import ActivityView
         view = ActivityView()
         view.request = RequestFactory().get(self.url + '?limit')
-        self.assertEqual(view.get(view.request).count(), len(self.activities))
+        self.assertEqual(len(view.get(view.request)), len(self.activities))
 
         view.request = RequestFactory().get(self.url + '?limit=99')
-        self.assertEqual(view.get(view.request).count(), len(self.activities))
+        self.assertEqual(len(view.get(view.request)), len(self.activities))
 
         view.request = RequestFactory().get(self.url + '?limit=0')
-        self.assertEqual(view.get(view.request).count(), 0)
+        self.assertEqual(len(view.get(view.request)), 0)
 
         view.request = RequestFactory().get(self.url + '?limit=1')
-        self.assertEqual(view.get(view.request).count(), 1)
+        self.assertEqual(len(view.get(view.request)), 1)
+
+    @istest
+    def get_only_returns_activity_in_the_dataset(self):
+        from ..views import ActivityView
+        other_dataset = DataSet.objects.create(slug='other', owner_id=self.owner.id)
+        Place.objects.create(dataset_id=other_dataset.id, location='POINT (0 0)', visible=True)
+
+        view = ActivityView()
+        view.request = RequestFactory().get(self.url)
+        qs = view.get(view.request, dataset__owner__username=self.owner.username,
+                      dataset__slug='data')
+        self.assertEqual(len(qs), len(self.activities))
+
+    @istest
+    def get_looks_up_the_dataset_once_and_filters_activity_by_its_id(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        view.request = RequestFactory().get(self.url)
+
+        # One query for the dataset's id, and one for the activity.
+        with self.assertNumQueries(2):
+            activities = view.get(view.request,
+                                  dataset__owner__username=self.owner.username,
+                                  dataset__slug='data')
+        self.assertEqual(len(activities), len(self.activities))
+
+        activity_sql = connection.queries[-1]['sql']
+        assert_in('"sa_api_activity"."dataset_id" = %s' % self.dataset.id, activity_sql)
+        assert_not_in('JOIN "sa_api_dataset"', activity_sql)
+        assert_not_in('JOIN "auth_user"', activity_sql)
+
+    @istest
+    def get_for_a_missing_dataset_is_not_found(self):
+        from ..views import ActivityView
+        from django.http import Http404
+        view = ActivityView()
+        view.request = RequestFactory().get(self.url)
+        with self.assertRaises(Http404):
+            view.get(view.request, dataset__owner__username=self.owner.username,
+                     dataset__slug='nope')
+
+    @istest
+    def get_queryset_with_bad_visible_param_is_an_error(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        view.request = RequestFactory().get(self.url + '?visible=nope')
+        with self.assertRaises(ErrorResponse):
+            view.get_queryset()
+
+    @istest
+    def get_with_wait_returns_new_activity_once_it_comes_in(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        last_id = max(a.id for a in self.activities)
+        view.request = RequestFactory().get(self.url + '?after=%d&wait=10' % last_id)
+
+        def new_activity(scope, version, timeout):
+            Activity.objects.create(data=self.visible_place, action='update')
+            return True
+
+        with patch('sa_api.notifications.wait_for_activity', side_effect=new_activity) as wait:
+            qs = view.get(view.request, dataset__owner__username=self.owner.username,
+                          dataset__slug='data')
+            self.assertEqual(len(qs), 1)
+            self.assertEqual(wait.call_count, 1)
+
+    @istest
+    def get_with_wait_returns_nothing_if_no_activity_comes_in(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        last_id = max(a.id for a in self.activities)
+        view.request = RequestFactory().get(self.url + '?after=%d&wait=10' % last_id)
+
+        with patch('sa_api.notifications.wait_for_activity', return_value=False) as wait:
+            qs = view.get(view.request, dataset__owner__username=self.owner.username,
+                          dataset__slug='data')
+            self.assertEqual(len(qs), 0)
+            self.assertEqual(wait.call_count, 1)
+
+    @istest
+    def get_with_wait_checks_the_database_without_a_listener_or_shared_cache(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        last_id = max(a.id for a in self.activities)
+        view.request = RequestFactory().get(self.url + '?after=%d&wait=10' % last_id)
+
+        def new_activity(seconds):
+            Activity.objects.create(data=self.visible_place, action='update')
+
+        with patch('sa_api.notifications.get_listener', return_value=None):
+            with patch('sa_api.caching.is_shared', return_value=False):
+                with patch('time.sleep', side_effect=new_activity) as sleep:
+                    qs = view.get(view.request, dataset__owner__username=self.owner.username,
+                                  dataset__slug='data')
+                    self.assertEqual(len(qs), 1)
+                    self.assertEqual(sleep.call_count, 1)
+
+    @istest
+    def get_without_after_does_not_wait(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        view.request = RequestFactory().get(self.url + '?wait=10')
+
+        with patch('sa_api.notifications.wait_for_activity') as wait:
+            view.get(view.request)
+            self.assertEqual(wait.call_count, 0)
+
+    @istest
+    def requests_that_wait_are_not_cached(self):
+        from ..views import ActivityView
+        view = ActivityView()
+        request = RequestFactory().get(self.url + '?after=1&wait=10')
+        self.assertFalse(view.is_cacheable_request(request))
+        self.assertFalse(view.is_conditional_request(request))
+
+        request = RequestFactory().get(self.url + '?after=1')
+        self.assertTrue(view.is_cacheable_request(request))
+        self.assertTrue(view.is_conditional_request(request))
 
 
 class TestAbsUrlMixin (object):
@@ -568,6 +865,919 @@ class TestPlaceCollectionView(TestCase):
         ids = set([place.id for place in qs])
         assert_equal(ids, set([123, 124, 456, 457]))
 
+    def _create_places(self, *ids):
+        from ..views import models
+        user = User.objects.create(username='test-user')
+        ds = models.DataSet.objects.create(owner=user, id=789, slug='stuff')
+        for place_id in ids:
+            models.Place.objects.create(dataset=ds, id=place_id,
+                                        location='POINT (0.0 0.0)')
+        return user, ds
+
+    def _get(self, user, ds, **params):
+        from ..views import PlaceCollectionView
+        uri_args = {
+            'dataset__owner__username': user.username,
+            'dataset__slug': ds.slug,
+        }
+        uri = reverse('place_collection_by_dataset', kwargs=uri_args)
+        request = RequestFactory().get(uri, params,
+                                       HTTP_ACCEPT='application/json')
+        request.user = user
+        return PlaceCollectionView.as_view()(request, **uri_args)
+
+    @istest
+    def get_streams_all_places(self):
+        from ..views import PlaceCollectionView
+        user, ds = self._create_places(3, 1, 2)
+
+        with patch.object(PlaceCollectionView, 'stream_chunk_size', 2):
+            response = self._get(user, ds)
+
+        assert_equal(response.status_code, 200)
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [1, 2, 3])
+        assert_in('/api/v1/datasets/test-user/stuff/places/1',
+                  data[0]['url'])
+
+    @istest
+    def get_streams_all_places_as_csv(self):
+        from ..views import PlaceCollectionView, utils
+        import csv
+        user, ds = self._create_places(3, 1, 2)
+
+        with patch.object(PlaceCollectionView, 'stream_chunk_size', 2):
+            response = self._get(user, ds, format='csv')
+
+        assert_equal(response.status_code, 200)
+        assert utils.is_streaming(response)
+        rows = list(csv.DictReader(response.content.splitlines()))
+        assert_equal([row['id'] for row in rows], ['1', '2', '3'])
+        assert_in('/api/v1/datasets/test-user/stuff/places/1', rows[0]['url'])
+
+    @istest
+    def get_as_csv_serializes_each_place_once(self):
+        from ..views import PlaceCollectionView, resources
+        from django.core.cache import cache
+        cache.clear()
+        user, ds = self._create_places(3, 1, 2)
+        models = resources.models
+        models.Place.objects.filter(id=2).update(
+            data=json.dumps({'hours': {'open': 9}}))
+
+        with patch.object(PlaceCollectionView, 'stream_chunk_size', 2):
+            with patch.object(resources.PlaceResource, 'serialize_instance',
+                              autospec=True,
+                              side_effect=resources.PlaceResource.serialize_instance) as serialize_instance:
+                response = self._get(user, ds, format='csv')
+                content = response.content
+                assert_equal(serialize_instance.call_count, 3)
+
+        header = content.splitlines()[0].split(',')
+        assert_in('hours.open', header)
+        assert_in('location.lat', header)
+
+    @istest
+    def get_with_page_size_links_to_next_page(self):
+        user, ds = self._create_places(3, 1, 2)
+
+        response = self._get(user, ds, page_size='2')
+        assert_equal(response.status_code, 200)
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [1, 2])
+        assert_in('after=2', response['Link'])
+        assert_in('rel="next"', response['Link'])
+
+        response = self._get(user, ds, page_size='2', after='2')
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [3])
+        assert_equal(response.has_header('Link'), False)
+
+    @istest
+    def get_with_bad_page_size_is_a_bad_request(self):
+        user, ds = self._create_places(1)
+
+        for page_size in ['0', 'ten', '100000']:
+            response = self._get(user, ds, page_size=page_size)
+            assert_equal(response.status_code, 400)
+
+    def _create_located_places(self):
+        from ..views import models
+        user = User.objects.create(username='test-user')
+        ds = models.DataSet.objects.create(owner=user, id=789, slug='stuff')
+        # City Hall, Liberty Bell, 30th Street Station, and Pittsburgh
+        for place_id, location in [(1, 'POINT (-75.1635 39.9524)'),
+                                   (2, 'POINT (-75.1503 39.9496)'),
+                                   (3, 'POINT (-75.1819 39.9557)'),
+                                   (4, 'POINT (-79.9959 40.4406)')]:
+            models.Place.objects.create(dataset=ds, id=place_id,
+                                        location=location)
+        return user, ds
+
+    @istest
+    def get_with_bbox_returns_places_in_the_box(self):
+        user, ds = self._create_located_places()
+
+        response = self._get(user, ds, bbox='-75.3,39.8,-75.0,40.1')
+        data = json.loads(response.content)
+        assert_equal(set([place['id'] for place in data]), set([1, 2, 3]))
+
+        response = self._get(user, ds, bbox='-75.17,39.9,-75.0,40.1')
+        data = json.loads(response.content)
+        assert_equal(set([place['id'] for place in data]), set([1, 2]))
+
+    @istest
+    def get_with_near_and_radius_returns_close_places_sorted(self):
+        user, ds = self._create_located_places()
+
+        # The Liberty Bell is about 1.2km from City Hall, and 30th Street
+        # Station about 1.6km.
+        response = self._get(user, ds, near='-75.1635,39.9524', radius='1400',
+                             sort='distance')
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [1, 2])
+
+        response = self._get(user, ds, near='-75.1819,39.9557',
+                             sort='distance')
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [3, 1, 2, 4])
+
+    @istest
+    def get_sorted_by_distance_orders_ties_by_id(self):
+        from ..views import models
+        user, ds = self._create_located_places()
+        for place_id in [7, 5, 6]:
+            models.Place.objects.create(dataset=ds, id=place_id,
+                                        location='POINT (-75.1819 39.9557)')
+
+        response = self._get(user, ds, near='-75.1819,39.9557',
+                             sort='distance')
+        data = json.loads(response.content)
+        assert_equal([place['id'] for place in data], [3, 5, 6, 7, 1, 2, 4])
+
+    @istest
+    def get_with_bad_location_params_is_a_bad_request(self):
+        user, ds = self._create_located_places()
+
+        for params in [{'bbox': '1,2,3'},
+                       {'bbox': '10,10,0,0'},
+                       {'near': '-75.16'},
+                       {'near': '200,0'},
+                       {'near': '-75.16,39.95', 'radius': '-5'},
+                       {'radius': '100'},
+                       {'sort': 'distance'},
+                       {'sort': 'name'},
+                       {'near': '-75.16,39.95', 'sort': 'distance',
+                        'page_size': '10'}]:
+            response = self._get(user, ds, **params)
+            assert_equal(response.status_code, 400)
+
+    def _create_places_with_data(self):
+        from ..views import models
+        if not datafilters.supports_jsonb(connection):
+            raise SkipTest('data filters need PostgreSQL 9.4 or later')
+
+        user = User.objects.create(username='test-user')
+        ds = models.DataSet.objects.create(owner=user, id=789, slug='stuff')
+        for place_id, data in [(1, {'category': 'bike_lane', 'votes': 5}),
+                               (2, {'category': 'bike_rack', 'votes': '5'}),
+                               (3, {'category': 'bike_lane',
+                                    'address': {'city': 'Philadelphia'}}),
+                               (4, {})]:
+            models.Place.objects.create(dataset=ds, id=place_id,
+                                        location='POINT (0.0 0.0)',
+                                        data=json.dumps(data))
+        return user, ds
+
+    @istest
+    def get_with_data_filters_returns_matching_places(self):
+        user, ds = self._create_places_with_data()
+
+        for params, expected_ids in [
+                ({'data.category': 'bike_lane'}, [1, 3]),
+                ({'data.category__in': 'bike_rack,bike_lane'}, [1, 2, 3]),
+                ({'data.category': 'bike_lane', 'data.votes': '5'}, [1]),
+                ({'data.votes': '5'}, [1, 2]),
+                ({'data.address.city': 'Philadelphia'}, [3]),
+                ({'data.category': 'bench'}, [])]:
+            response = self._get(user, ds, **params)
+            assert_equal(response.status_code, 200)
+            data = json.loads(response.content)
+            assert_equal(sorted([place['id'] for place in data]), expected_ids)
+
+    @istest
+    def get_with_bad_data_filters_is_a_bad_request(self):
+        user, ds = self._create_places_with_data()
+
+        for params in [{'data.category__startswith': 'bike'},
+                       {'data.': 'bike_lane'},
+                       {'data.address..city': 'Philadelphia'}]:
+            response = self._get(user, ds, **params)
+            assert_equal(response.status_code, 400)
+
+
+class TestPlaceBulkView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test-user')
+        self.ds = DataSet.objects.create(owner=self.user, slug='stuff')
+
+    def _post(self, content, content_type, user=None):
+        from ..views import PlaceBulkView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+        }
+        uri = reverse('place_bulk_by_dataset', kwargs=uri_args)
+        request = RequestFactory().post(uri, data=content,
+                                        content_type=content_type)
+        request.user = user or self.user
+        return PlaceBulkView.as_view()(request, **uri_args)
+
+    @istest
+    def post_geojson_creates_places(self):
+        content = json.dumps({
+            'type': 'FeatureCollection',
+            'features': [{'type': 'Feature',
+                          'geometry': {'type': 'Point',
+                                       'coordinates': [-75.16, 39.95]},
+                          'properties': {'name': 'Place %s' % i}}
+                         for i in range(3)]})
+
+        response = self._post(content, 'application/geo+json')
+
+        assert_equal(response.status_code, 201)
+        assert_equal(json.loads(response.content), {'created': 3})
+        places = Place.objects.filter(dataset=self.ds).order_by('id')
+        assert_equal([json.loads(place.data)['name'] for place in places],
+                     ['Place 0', 'Place 1', 'Place 2'])
+        assert_equal(Activity.objects.filter(dataset=self.ds).count(), 3)
+
+    @istest
+    def post_csv_creates_places(self):
+        content = 'lat,lng,name\r\n39.95,-75.16,One\r\n39.96,-75.17,Two\r\n'
+
+        response = self._post(content, 'text/csv')
+
+        assert_equal(response.status_code, 201)
+        assert_equal(Place.objects.filter(dataset=self.ds).count(), 2)
+
+    @istest
+    def post_with_invalid_places_creates_none(self):
+        content = '\n'.join([json.dumps({'location': 'POINT (-75.16 39.95)'}),
+                              json.dumps({'name': 'No location'})])
+
+        response = self._post(content, 'application/x-ndjson')
+
+        assert_equal(response.status_code, 400)
+        assert_equal(json.loads(response.content)['errors'],
+                     [{'record': 2, 'detail': 'location is required'}])
+        assert_equal(Place.objects.filter(dataset=self.ds).count(), 0)
+
+    @istest
+    def post_by_another_user_is_forbidden(self):
+        other = User.objects.create(username='other-user')
+        content = json.dumps([{'location': 'POINT (-75.16 39.95)'}])
+
+        response = self._post(content, 'application/json', user=other)
+
+        assert_equal(response.status_code, 403)
+        assert_equal(Place.objects.filter(dataset=self.ds).count(), 0)
+
+
+class TestSubmissionBulkView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test-user')
+        self.ds = DataSet.objects.create(owner=self.user, slug='stuff')
+        self.place = Place.objects.create(dataset=self.ds,
+                                          location='POINT (-75.16 39.95)')
+
+    def _post(self, content, content_type, submission_type='comments', user=None):
+        from ..views import SubmissionBulkView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+            'submission_type': submission_type,
+        }
+        uri = reverse('submission_bulk_by_dataset', kwargs=uri_args)
+        request = RequestFactory().post(uri, data=content,
+                                        content_type=content_type)
+        request.user = user or self.user
+        return SubmissionBulkView.as_view()(request, **uri_args)
+
+    @istest
+    def post_json_creates_submissions(self):
+        content = json.dumps([{'place_id': self.place.id, 'comment': 'Hi %s' % i}
+                              for i in range(3)])
+
+        response = self._post(content, 'application/json')
+
+        assert_equal(response.status_code, 201)
+        assert_equal(json.loads(response.content), {'created': 3})
+        comments = SubmissionSet.objects.get(place=self.place,
+                                             submission_type='comments')
+        assert_equal(comments.length, 3)
+        assert_equal(sorted(json.loads(s.data)['comment']
+                            for s in comments.children.all()),
+                     ['Hi 0', 'Hi 1', 'Hi 2'])
+        assert_equal(Activity.objects.filter(submission_type='comments').count(), 3)
+
+    @istest
+    def post_csv_to_submissions_uses_each_type(self):
+        content = 'place_id,type\r\n%(id)s,votes\r\n%(id)s,comments\r\n' % {
+            'id': self.place.id}
+
+        response = self._post(content, 'text/csv', submission_type='submissions')
+
+        assert_equal(response.status_code, 201)
+        assert_equal(sorted(self.place.submission_sets.values_list(
+                         'submission_type', 'length')),
+                     [('comments', 1), ('votes', 1)])
+
+    @istest
+    def post_with_a_missing_place_creates_none(self):
+        content = '\n'.join([json.dumps({'place_id': self.place.id}),
+                              json.dumps({'place_id': self.place.id + 1000})])
+
+        response = self._post(content, 'application/x-ndjson')
+
+        assert_equal(response.status_code, 400)
+        assert_equal([error['record'] for error in
+                      json.loads(response.content)['errors']], [2])
+        assert_equal(Submission.objects.count(), 0)
+
+    @istest
+    def post_by_another_user_is_forbidden(self):
+        other = User.objects.create(username='other-user')
+        content = json.dumps([{'place_id': self.place.id}])
+
+        response = self._post(content, 'application/json', user=other)
+
+        assert_equal(response.status_code, 403)
+        assert_equal(Submission.objects.count(), 0)
+
+
+class TestWriteQueries(TestCase):
+    """
+    Pin the number of queries that creating things through the views takes
+    (see the benchmark_writes command).  Waking up activity listeners takes
+    one more query, on PostgreSQL; that is turned off in all but the last
+    test.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create(username='user')
+        self.dataset = DataSet.objects.create(owner=self.owner, slug='data')
+        self.place = Place.objects.create(dataset=self.dataset,
+                                          location='POINT (0 0)')
+        self.comments = SubmissionSet.objects.create(place=self.place,
+                                                     submission_type='comments')
+        self.dataset_kwargs = {'dataset__owner__username': 'user',
+                               'dataset__slug': 'data'}
+
+    def _post(self, view_class, url_name, data, **kwargs):
+        request = RequestFactory().post(
+            reverse(url_name, kwargs=kwargs), data=json.dumps(data),
+            content_type='application/json')
+        request.user = self.owner
+        request._dont_enforce_csrf_checks = True
+        return view_class.as_view()(request, **kwargs)
+
+    @istest
+    def creating_a_place_takes_five_queries(self):
+        from ..views import PlaceCollectionView
+        from django.test.utils import override_settings
+
+        # Look up the dataset; insert the thing, the place and the activity;
+        # and summarize the new place's submission sets for the response.
+        with override_settings(SA_API_ACTIVITY_LISTEN=False):
+            with self.assertNumQueries(5):
+                response = self._post(
+                    PlaceCollectionView, 'place_collection_by_dataset',
+                    {'location': {'lat': 1, 'lng': 2}, 'name': 'Here'},
+                    **self.dataset_kwargs)
+        assert_equal(response.status_code, 201)
+
+    @istest
+    def creating_a_comment_takes_six_queries(self):
+        from django.test.utils import override_settings
+
+        # Look up the place and the submission set; insert the thing and the
+        # submission; count the comment on the set; and insert the activity.
+        with override_settings(SA_API_ACTIVITY_LISTEN=False):
+            with self.assertNumQueries(6):
+                response = self._post(
+                    SubmissionCollectionView, 'submission_collection_by_dataset',
+                    {'comment': 'Nice'}, place_id=self.place.id,
+                    submission_type='comments', **self.dataset_kwargs)
+        assert_equal(response.status_code, 201)
+        assert_equal(SubmissionSet.objects.get(id=self.comments.id).length, 1)
+
+    @istest
+    def notifying_activity_listeners_takes_one_more_query(self):
+        from ..views import PlaceCollectionView
+        from django.test.utils import override_settings
+        if connection.vendor != 'postgresql':
+            raise SkipTest('activity is only announced on PostgreSQL')
+
+        # Only the pg_notify; the dataset's owner is already loaded.
+        with override_settings(SA_API_ACTIVITY_LISTEN=True):
+            with self.assertNumQueries(6):
+                response = self._post(
+                    PlaceCollectionView, 'place_collection_by_dataset',
+                    {'location': {'lat': 1, 'lng': 2}, 'name': 'Here'},
+                    **self.dataset_kwargs)
+            assert_equal(response.status_code, 201)
+
+            with self.assertNumQueries(7):
+                response = self._post(
+                    SubmissionCollectionView, 'submission_collection_by_dataset',
+                    {'comment': 'Nice'}, place_id=self.place.id,
+                    submission_type='comments', **self.dataset_kwargs)
+            assert_equal(response.status_code, 201)
+
+
+class TestPlaceClusterView(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        models.Submission.objects.all().delete()
+        models.SubmissionSet.objects.all().delete()
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+
+    def setUp(self):
+        from ..views import models
+        self._cleanup()
+
+        self.user = User.objects.create(username='test-user')
+        self.ds = models.DataSet.objects.create(owner=self.user, id=789,
+                                                slug='stuff')
+        # Three places in Philadelphia, and one in Pittsburgh
+        for place_id, location in [(1, 'POINT (-75.1635 39.9524)'),
+                                   (2, 'POINT (-75.1503 39.9496)'),
+                                   (3, 'POINT (-75.1819 39.9557)'),
+                                   (4, 'POINT (-79.9959 40.4406)')]:
+            models.Place.objects.create(dataset=self.ds, id=place_id,
+                                        location=location)
+
+        comments = models.SubmissionSet.objects.create(
+            place_id=1, submission_type='comments')
+        for _ in range(2):
+            models.Submission.objects.create(parent=comments, dataset=self.ds)
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _get(self, **params):
+        from ..views import PlaceClusterView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+        }
+        uri = reverse('place_clusters_by_dataset', kwargs=uri_args)
+        request = RequestFactory().get(uri, params,
+                                       HTTP_ACCEPT='application/json')
+        request.user = self.user
+        return PlaceClusterView.as_view()(request, **uri_args)
+
+    @istest
+    def get_groups_places_by_zoom_level(self):
+        response = self._get(zoom='0')
+        assert_equal(response.status_code, 200)
+        data = json.loads(response.content)
+        assert_equal([cluster['count'] for cluster in data], [4])
+
+        response = self._get(zoom='6')
+        data = json.loads(response.content)
+        assert_equal([cluster['count'] for cluster in data], [3, 1])
+        assert_equal(round(data[1]['location']['lng'], 4), -79.9959)
+        assert_equal(round(data[1]['location']['lat'], 4), 40.4406)
+
+    @istest
+    def get_uses_the_place_filters(self):
+        response = self._get(zoom='0', bbox='-75.3,39.8,-75.0,40.1')
+        data = json.loads(response.content)
+        assert_equal([cluster['count'] for cluster in data], [3])
+
+    @istest
+    def get_can_include_submission_counts(self):
+        response = self._get(zoom='6', submissions='true')
+        data = json.loads(response.content)
+        assert_equal(data[0]['submissions'], [{'type': 'comments', 'length': 2}])
+        assert_equal(data[1]['submissions'], [])
+
+    @istest
+    def get_requires_a_valid_zoom(self):
+        for params in [{}, {'zoom': 'far'}, {'zoom': '-1'}, {'zoom': '30'}]:
+            response = self._get(**params)
+            assert_equal(response.status_code, 400)
+
+
+class TestPlaceTileView(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.core.cache import cache
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def setUp(self):
+        from ..views import models
+        self._cleanup()
+
+        self.user = User.objects.create(username='test-user')
+        self.ds = models.DataSet.objects.create(owner=self.user, id=789,
+                                                slug='stuff')
+        self.place = models.Place.objects.create(
+            dataset=self.ds, id=1, location='POINT (-75.1635 39.9524)',
+            data=json.dumps({'name': 'City Hall'}))
+        models.Place.objects.create(
+            dataset=self.ds, id=2, location='POINT (-75.1635 39.9524)',
+            visible=False)
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _get(self, z, x, y, **params):
+        from ..views import PlaceTileView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+        }
+        uri = reverse('place_tile_by_dataset',
+                      kwargs=dict(uri_args, z=z, x=x, y=y))
+        request = RequestFactory().get(uri, params)
+        request.user = self.user
+        return PlaceTileView.as_view()(request, z=str(z), x=str(x), y=str(y),
+                                       **uri_args)
+
+    def _get_features(self, z, x, y, **params):
+        # Catch the features on their way into the tile encoder.
+        from .. import mvt
+        features = []
+        encode_points = mvt.encode_points
+
+        def capture(layer_name, tile_features, *args):
+            features.extend(tile_features)
+            return encode_points(layer_name, features, *args)
+
+        with patch.object(mvt, 'encode_points', side_effect=capture):
+            response = self._get(z, x, y, **params)
+        return response, features
+
+    @istest
+    def get_encodes_visible_places_in_the_tile(self):
+        response, features = self._get_features(12, 1192, 1551,
+                                                properties='name')
+
+        assert_equal(response.status_code, 200)
+        assert_equal(response['Content-Type'], 'application/x-protobuf')
+        assert_equal([(place_id, props) for place_id, _, _, props in features],
+                     [(1, {'name': 'City Hall'})])
+
+        # An empty tile on the other side of the world
+        response, features = self._get_features(12, 10, 10)
+        assert_equal(response.status_code, 200)
+        assert_equal(features, [])
+
+    @istest
+    def get_is_cached_until_a_place_changes(self):
+        from .. import mvt
+        first = self._get(12, 1192, 1551).content
+
+        with patch.object(mvt, 'encode_points') as encode_points:
+            assert_equal(self._get(12, 1192, 1551).content, first)
+            assert_equal(encode_points.call_count, 0)
+
+        self.place.visible = False
+        self.place.save()
+        assert_not_equal(self._get(12, 1192, 1551).content, first)
+
+    @istest
+    def get_does_not_serve_a_cached_tile_once_the_dataset_is_bumped(self):
+        from django.core.cache import cache
+        from .. import caching, mvt
+        from ..views import PlaceTileView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+        }
+        request = RequestFactory().get('/')
+        key = PlaceTileView().get_tile_cache_key(request, 12, 1192, 1551,
+                                                 **uri_args)
+        first = self._get(12, 1192, 1551).content
+        assert_equal(cache.get(key), first)
+
+        caching.bump_dataset(self.user.username, self.ds.slug)
+        assert_not_equal(PlaceTileView().get_tile_cache_key(
+            request, 12, 1192, 1551, **uri_args), key)
+        with patch.object(mvt, 'encode_points', return_value='new') as encode_points:
+            assert_equal(self._get(12, 1192, 1551).content, 'new')
+            assert_equal(encode_points.call_count, 1)
+
+    @istest
+    def get_is_not_cached_unless_the_cache_is_shared(self):
+        from .. import mvt
+        with patch('sa_api.caching.is_shared', return_value=False):
+            self._get(12, 1192, 1551)
+            with patch.object(mvt, 'encode_points', return_value='new') as encode_points:
+                assert_equal(self._get(12, 1192, 1551).content, 'new')
+                assert_equal(encode_points.call_count, 1)
+
+    @istest
+    def get_with_a_tile_outside_the_world_is_not_found(self):
+        response = self._get(1, 2, 0)
+        assert_equal(response.status_code, 404)
+
+
+class TestCachedMixin(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.core.cache import cache
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def setUp(self):
+        from ..views import models
+        self._cleanup()
+
+        self.user = User.objects.create(username='test-user')
+        self.ds1 = models.DataSet.objects.create(owner=self.user, slug='one')
+        self.ds2 = models.DataSet.objects.create(owner=self.user, slug='two')
+        models.Place.objects.create(dataset=self.ds1, id=1,
+                                    location='POINT (0.0 0.0)')
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _get(self, ds, **params):
+        from ..views import PlaceCollectionView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': ds.slug,
+        }
+        uri = reverse('place_collection_by_dataset', kwargs=uri_args)
+        request = RequestFactory().get(uri, params,
+                                       HTTP_ACCEPT='application/json')
+        request.user = self.user
+        return PlaceCollectionView.as_view()(request, **uri_args)
+
+    @istest
+    def get_is_cached_until_the_dataset_changes(self):
+        from ..views import models
+        first = self._get(self.ds1)
+        assert_equal(first['X-Cache'], 'MISS')
+        first_content = first.content
+
+        second = self._get(self.ds1)
+        assert_equal(second['X-Cache'], 'HIT')
+        assert_equal(second.content, first_content)
+        assert_equal(second['Content-Type'], first['Content-Type'])
+
+        models.Place.objects.create(dataset=self.ds1, id=2,
+                                    location='POINT (0.0 0.0)')
+        third = self._get(self.ds1)
+        assert_equal(third['X-Cache'], 'MISS')
+        assert_equal(len(json.loads(third.content)), 2)
+
+    @istest
+    def get_keeps_datasets_and_queries_apart(self):
+        self._get(self.ds1).content
+
+        response = self._get(self.ds2)
+        assert_equal(response['X-Cache'], 'MISS')
+        assert_equal(json.loads(response.content), [])
+
+        response = self._get(self.ds1, visible='all')
+        assert_equal(response['X-Cache'], 'MISS')
+
+    @istest
+    def get_does_not_cache_errors(self):
+        for _ in range(2):
+            response = self._get(self.ds1, page_size='none')
+            assert_equal(response.status_code, 400)
+            assert_equal(response['X-Cache'], 'MISS')
+
+    @istest
+    def get_does_not_cache_big_responses(self):
+        with patch.object(settings, 'SA_API_CACHE_MAX_SIZE', 10, create=True):
+            self._get(self.ds1).content
+            response = self._get(self.ds1)
+        assert_equal(response['X-Cache'], 'MISS')
+
+    @istest
+    def get_counts_hits_and_misses(self):
+        from .. import caching
+        caching.reset_stats('place_collection')
+        for _ in range(3):
+            self._get(self.ds1).content
+
+        assert_equal(caching.get_stats('place_collection'),
+                     {'hits': 2, 'misses': 1})
+
+    @istest
+    def get_is_not_cached_unless_the_cache_is_shared(self):
+        with patch('sa_api.caching.is_shared', return_value=False):
+            for _ in range(2):
+                response = self._get(self.ds1)
+                response.content
+                assert_equal(response.has_header('X-Cache'), False)
+
+    @istest
+    def get_without_a_dataset_is_not_cached(self):
+        from ..views import ActivityView
+        request = RequestFactory().get(reverse('activity_collection'))
+        assert not ActivityView().is_cacheable_request(request)
+
+    @istest
+    def dataset_list_is_cached_until_one_of_the_datasets_changes(self):
+        from ..views import DataSetCollectionView, models
+        uri_args = {'owner__username': self.user.username}
+        uri = reverse('dataset_collection_by_user', kwargs=uri_args)
+
+        def get_datasets():
+            request = RequestFactory().get(uri, HTTP_ACCEPT='application/json')
+            request.user = self.user
+            return DataSetCollectionView.as_view()(request, **uri_args)
+
+        assert_equal(get_datasets()['X-Cache'], 'MISS')
+        assert_equal(get_datasets()['X-Cache'], 'HIT')
+
+        # The list summarizes the places in each dataset.
+        models.Place.objects.create(dataset=self.ds2, id=2,
+                                    location='POINT (0.0 0.0)')
+        response = get_datasets()
+        assert_equal(response['X-Cache'], 'MISS')
+        places = dict((dataset['slug'], dataset['places']['length'])
+                      for dataset in json.loads(response.content))
+        assert_equal(places, {'one': 1, 'two': 1})
+        assert_equal(get_datasets()['X-Cache'], 'HIT')
+
+        # And it lists new datasets.
+        models.DataSet.objects.create(owner=self.user, slug='three')
+        response = get_datasets()
+        assert_equal(response['X-Cache'], 'MISS')
+        assert_equal(len(json.loads(response.content)), 3)
+
+
+class TestConditionalGetMixin(TestCase):
+
+    def _cleanup(self):
+        from sa_api import models
+        from django.core.cache import cache
+        models.Place.objects.all().delete()
+        models.DataSet.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+    def setUp(self):
+        from ..views import models
+        self._cleanup()
+
+        self.user = User.objects.create(username='test-user')
+        self.ds = models.DataSet.objects.create(owner=self.user, slug='stuff')
+        self.place = models.Place.objects.create(dataset=self.ds,
+                                                 location='POINT (0.0 0.0)')
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _get_place(self, **headers):
+        from ..views import PlaceInstanceView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+            'pk': str(self.place.pk),
+        }
+        uri = reverse('place_instance_by_dataset', kwargs=uri_args)
+        request = RequestFactory().get(uri, HTTP_ACCEPT='application/json',
+                                       **headers)
+        request.user = self.user
+        return PlaceInstanceView.as_view()(request, **uri_args)
+
+    def _changed_at(self, modified):
+        return mock.patch('sa_api.caching.get_last_modified',
+                          return_value=modified)
+
+    @istest
+    def get_has_validators(self):
+        with self._changed_at(time.time() - 10):
+            response = self._get_place()
+        assert_equal(response.status_code, 200)
+        assert response['ETag'].startswith('W/"')
+        assert_in('Last-Modified', response)
+        assert_in('no-cache', response['Cache-Control'])
+
+    @istest
+    def get_has_no_validators_unless_the_cache_is_shared(self):
+        with patch('sa_api.caching.is_shared', return_value=False):
+            response = self._get_place(HTTP_IF_NONE_MATCH='*')
+        assert_equal(response.status_code, 200)
+        assert_equal(response.has_header('ETag'), False)
+        assert_equal(response.has_header('Last-Modified'), False)
+
+    @istest
+    def get_has_no_last_modified_within_a_second_of_a_change(self):
+        with self._changed_at(time.time() - 0.01):
+            response = self._get_place()
+        assert_equal(response.status_code, 200)
+        assert_in('ETag', response)
+        assert_equal(response.has_header('Last-Modified'), False)
+
+        # Nor can it be not modified since some time in that second.
+        with self._changed_at(time.time() - 0.01):
+            response = self._get_place(HTTP_IF_MODIFIED_SINCE=http_date())
+        assert_equal(response.status_code, 200)
+
+    @istest
+    def get_rounds_last_modified_up(self):
+        with self._changed_at(1000000000.2):
+            last_modified = self._get_place()['Last-Modified']
+        assert_equal(last_modified, http_date(1000000001))
+
+        # A later change in the same second as the one that was sent is
+        # modified since.
+        with self._changed_at(1000000000.7):
+            response = self._get_place(HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert_equal(response.status_code, 304)
+        with self._changed_at(1000000001.2):
+            response = self._get_place(HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert_equal(response.status_code, 200)
+
+    @istest
+    def get_prefers_etag_to_if_modified_since(self):
+        with self._changed_at(time.time() - 10):
+            response = self._get_place()
+            etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.place.save()
+        with self._changed_at(time.time() - 10):
+            response = self._get_place(HTTP_IF_NONE_MATCH=etag,
+                                       HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert_equal(response.status_code, 200)
+
+    @istest
+    def get_with_matching_etag_is_not_modified(self):
+        etag = self._get_place()['ETag']
+
+        response = self._get_place(HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, 304)
+        assert_equal(response.content, '')
+        assert_equal(response['ETag'], etag)
+
+        # Strong comparison of the tag is not required.
+        response = self._get_place(HTTP_IF_NONE_MATCH=etag[2:])
+        assert_equal(response.status_code, 304)
+
+        # Until something changes.
+        self.place.save()
+        response = self._get_place(HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, 200)
+        assert_not_equal(response['ETag'], etag)
+
+    @istest
+    def get_with_if_modified_since_is_not_modified(self):
+        modified = time.time() - 10
+        with self._changed_at(modified):
+            last_modified = self._get_place()['Last-Modified']
+
+            response = self._get_place(HTTP_IF_MODIFIED_SINCE=last_modified)
+            assert_equal(response.status_code, 304)
+
+            response = self._get_place(
+                HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT')
+        assert_equal(response.status_code, 200)
+
+    @istest
+    def get_without_a_dataset_has_no_validators(self):
+        from ..views import PlaceInstanceView
+        uri_args = {'pk': str(self.place.pk)}
+        request = RequestFactory().get(reverse('place_instance', kwargs=uri_args))
+        assert not PlaceInstanceView().is_conditional_request(request, **uri_args)
+
+    @istest
+    def get_errors_have_no_validators(self):
+        from ..views import PlaceCollectionView
+        uri_args = {
+            'dataset__owner__username': self.user.username,
+            'dataset__slug': self.ds.slug,
+        }
+        uri = reverse('place_collection_by_dataset', kwargs=uri_args)
+        request = RequestFactory().get(uri, {'page_size': 'none'})
+        request.user = self.user
+        response = PlaceCollectionView.as_view()(request, **uri_args)
+
+        assert_equal(response.status_code, 400)
+        assert_equal(response.has_header('ETag'), False)
+
 
 class TestApiKeyCollectionView(TestCase):
 
@@ -0,0 +1,33 @@
+"""
+Transactions for changes to the things in datasets.
+"""
+from contextlib import contextmanager
+from django.db import transaction
+from . import caching
+
+
+@contextmanager
+def write_transaction(using=None):
+    """
+    Make the changes in the block in one database transaction, and
+    invalidate the caches they touch once, after it is committed (see
+    caching.deferred_invalidation).  If the block raises an exception,
+    the transaction is rolled back.
+
+    Inside a transaction that is already being managed (e.g., by an
+    enclosing write_transaction, or a test case), the block is part of that
+    transaction, rather than committing it early.  An enclosing
+    write_transaction invalidates the caches after it commits.  Any other
+    manager of the transaction (e.g., commit_manually) can't be told to, so
+    the caches are invalidated when the block exits, before the changes are
+    committed, and a request in between could cache the old data again.  To
+    avoid that, wrap the whole managed transaction, commit and all, in
+    caching.deferred_invalidation(); the invalidation is then held back
+    until it exits.
+    """
+    with caching.deferred_invalidation():
+        if transaction.is_managed(using=using):
+            yield
+        else:
+            with transaction.commit_on_success(using=using):
+                yield
@@ -0,0 +1,92 @@
+"""
+Building URLs for the API's views without going through reverse() every
+time.
+
+reverse() works out a URL from the URL patterns on every call, which adds up
+when a response has a few URLs for each of thousands of places.  Here, each
+named pattern is turned into a format string once (per script prefix), and
+URLs are built by filling in the arguments.  The result is checked against
+the pattern just like reverse() does; anything unusual (namespaced names,
+patterns with default arguments, or arguments that don't fit) is handed to
+reverse() instead.
+"""
+from django.core.urlresolvers import get_resolver, get_script_prefix, reverse
+from django.utils.encoding import force_unicode, iri_to_uri
+from django.utils.regex_helper import normalize
+import re
+
+_templates = {}
+
+
+def clear_cache():
+    """
+    Forget the format strings, e.g., after the URL patterns have changed.
+    """
+    _templates.clear()
+
+
+def get_templates(viewname, prefix):
+    """
+    Get a list of (format string, parameter names, compiled pattern) for
+    each way of building a URL for the named view under the given script
+    prefix.
+    """
+    key = (viewname, prefix)
+    if key not in _templates:
+        resolver = get_resolver(None)
+        prefix_norm, prefix_args = normalize(prefix)[0]
+
+        templates = []
+        for possibility, pattern, defaults in resolver.reverse_dict.getlist(viewname):
+            if defaults or prefix_args:
+                # Leave these to reverse().
+                continue
+            regex = re.compile(u'^%s%s' % (prefix, pattern), re.UNICODE)
+            for result, params in possibility:
+                templates.append((prefix_norm + result, params, regex))
+
+        _templates[key] = templates
+    return _templates[key]
+
+
+def build_url(viewname, args=None, kwargs=None):
+    """
+    Get the URL path for the named view with the given arguments.  Works like
+    django.core.urlresolvers.reverse(), and gives the same result.
+    """
+    args = args or ()
+    kwargs = kwargs or {}
+
+    if ':' not in viewname and not (args and kwargs):
+        for template, params, regex in get_templates(viewname, get_script_prefix()):
+            if args:
+                if len(args) != len(params):
+                    continue
+                values = zip(params, args)
+            else:
+                if set(kwargs) != set(params):
+                    continue
+                values = kwargs.iteritems()
+
+            candidate = template % dict((name, force_unicode(value))
+                                        for name, value in values)
+            if regex.search(candidate) and not candidate.startswith('//'):
+                return iri_to_uri(candidate)
+
+    return reverse(viewname, args=args, kwargs=kwargs)
+
+
+def build_absolute_uri(request, location):
+    """
+    Like request.build_absolute_uri(location), but quicker for paths, which
+    are just stuck onto the request's scheme and host (worked out once per
+    request).
+    """
+    if (isinstance(location, basestring) and
+            location.startswith('/') and not location.startswith('//')):
+        try:
+            url_root = request._sa_api_url_root
+        except AttributeError:
+            url_root = request._sa_api_url_root = request.build_absolute_uri('/')[:-1]
+        return url_root + iri_to_uri(location)
+    return request.build_absolute_uri(location)
@@ -20,6 +20,18 @@ urlpatterns = patterns('sa_api',
         views.PlaceCollectionView.as_view(),
         name='place_collection_by_dataset'),
 
+    url(places_base_regex + r'bulk/$',
+        views.PlaceBulkView.as_view(),
+        name='place_bulk_by_dataset'),
+
+    url(places_base_regex + r'clusters/$',
+        views.PlaceClusterView.as_view(),
+        name='place_clusters_by_dataset'),
+
+    url(places_base_regex + r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.pbf$',
+        views.PlaceTileView.as_view(),
+        name='place_tile_by_dataset'),
+
     url(places_base_regex + r'(?P<pk>\d+)/$',
         views.PlaceInstanceView.as_view(),
         name='place_instance_by_dataset'),
@@ -32,7 +44,7 @@ urlpatterns = patterns('sa_api',
         views.SubmissionInstanceView.as_view(),
         name='submission_instance_by_dataset'),
 
-    url(r'^datasets/(?P<data__dataset__owner__username>[^/]+)/(?P<data__dataset__slug>[^/]+)/activity/$',
+    url(r'^datasets/(?P<dataset__owner__username>[^/]+)/(?P<dataset__slug>[^/]+)/activity/$',
         views.ActivityView.as_view(),
         name='activity_collection_by_dataset'),
 
@@ -40,6 +52,10 @@ urlpatterns = patterns('sa_api',
         views.AllSubmissionCollectionsView.as_view(),
         name='all_submissions_by_dataset'),
 
+    url(r'^datasets/(?P<dataset__owner__username>[^/]+)/(?P<dataset__slug>[^/]+)/(?P<submission_type>[^/]+)/bulk/$',
+        views.SubmissionBulkView.as_view(),
+        name='submission_bulk_by_dataset'),
+
     url(r'^(?P<owner__username>[^/]+)/password$',
         views.OwnerPasswordView.as_view(),
         name='owner_password'),
@@ -1,4 +1,14 @@
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
 from djangorestframework import status
+import json
+
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:
+    # Before Django 1.5, any HttpResponse whose content is an iterator is
+    # streamed to the client as it is consumed.
+    from django.http import HttpResponse as StreamingHttpResponse
 
 
 def isiterable(obj):
@@ -26,6 +36,70 @@ def to_wkt(orig):
                         % type(orig))
 
 
+def parse_bbox(value):
+    """
+    Given a string like 'minx,miny,maxx,maxy', in longitude and latitude,
+    return the box as a Polygon.  Raises ValueError if the string does not
+    describe a valid box.
+    """
+    from django.contrib.gis.geos import Polygon
+
+    try:
+        minx, miny, maxx, maxy = [float(coord) for coord in value.split(',')]
+    except ValueError:
+        raise ValueError('bbox must be four numbers: minx,miny,maxx,maxy')
+
+    if not (-180 <= minx <= maxx <= 180 and -90 <= miny <= maxy <= 90):
+        raise ValueError('bbox must be a box of valid longitudes and latitudes, '
+                         'with the minimums first')
+
+    bbox = Polygon.from_bbox((minx, miny, maxx, maxy))
+    bbox.srid = 4326
+    return bbox
+
+
+def parse_point(value):
+    """
+    Given a string like 'lng,lat', return a Point.  Raises ValueError if the
+    string does not describe a valid point.
+    """
+    from django.contrib.gis.geos import Point
+
+    try:
+        lng, lat = [float(coord) for coord in value.split(',')]
+    except ValueError:
+        raise ValueError('point must be two numbers: lng,lat')
+
+    if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+        raise ValueError('point must be a valid longitude and latitude')
+
+    return Point(lng, lat, srid=4326)
+
+
+def bbox_around(point, radius):
+    """
+    Return a box (as a Polygon) that contains every point within radius
+    meters of the given longitude/latitude point.  The box is a little larger
+    than it has to be, so that it is safe to use for narrowing down a search
+    before checking actual distances.
+    """
+    import math
+    from django.contrib.gis.geos import Polygon
+
+    # A little less than the shortest length of a degree of latitude (at the
+    # equator), in meters.
+    meters_per_degree = 110000.0
+
+    dlat = radius / meters_per_degree
+    maxlat = min(abs(point.y) + dlat, 89.9)
+    dlng = dlat / math.cos(math.radians(maxlat))
+
+    bbox = Polygon.from_bbox((max(point.x - dlng, -180), max(point.y - dlat, -90),
+                              min(point.x + dlng, 180), min(point.y + dlat, 90)))
+    bbox.srid = 4326
+    return bbox
+
+
 def unpack_data_blob(data):
     """
     Input is a mapping.  Find a key named 'data', decode it as a JSON
@@ -77,3 +151,195 @@ def cached_property(f):
             return x
 
     return property(get)
+
+
+def get_keyset_ordering(queryset):
+    """
+    Get the ordering of a queryset as a list of (name, attname, descending)
+    for each field, ending with a unique one (the primary key, unless the
+    queryset is already ordered by another unique field), if it can be paged
+    through by key.  Otherwise, returns None.
+
+    Only orderings by the model's own non-null, non-relation fields can be
+    paged through by key.
+    """
+    query = queryset.query
+    if not query.can_filter() or query.extra_order_by:
+        return None
+
+    opts = queryset.model._meta
+    if query.order_by:
+        names = list(query.order_by)
+    elif query.default_ordering:
+        names = list(opts.ordering)
+    else:
+        names = []
+
+    ordering = []
+    for name in names:
+        if not isinstance(name, basestring):
+            return None
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name == 'pk':
+            ordering.append(('pk', opts.pk.attname, descending))
+            return ordering
+
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.null or field.rel:
+            return None
+
+        ordering.append((name, field.attname, descending))
+        if field.primary_key or field.unique:
+            return ordering
+
+    ordering.append(('pk', opts.pk.attname, False))
+    return ordering
+
+
+def iter_queryset_chunks(queryset, chunk_size):
+    """
+    Iterate over the objects in a queryset, one list of at most chunk_size
+    objects at a time, with a separate query for each chunk.  This keeps only
+    one chunk of rows in memory at once, on the database driver's side as well
+    as ours.
+
+    Querysets are paged through by key where they can be (see
+    get_keyset_ordering): each chunk starts after the ordering values of the
+    last object in the one before, so later chunks cost no more than the
+    first.  Anything else falls back to offset slicing.  Either way, the
+    primary key breaks ties in the ordering, so that no object is repeated or
+    skipped between chunks.
+    """
+    ordering = get_keyset_ordering(queryset)
+
+    if ordering is not None:
+        queryset = queryset.order_by(*[('-' if descending else '') + name
+                                       for name, _, descending in ordering])
+        chunk = list(queryset[:chunk_size])
+        while chunk:
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+            chunk = list(queryset.filter(_keyset_after(ordering, chunk[-1]))[:chunk_size])
+
+    else:
+        query = queryset.query
+        if query.order_by and not query.extra_order_by and 'pk' not in query.order_by:
+            queryset = queryset.order_by(*(list(query.order_by) + ['pk']))
+
+        offset = 0
+        chunk = list(queryset[:chunk_size])
+        while chunk:
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+            offset += chunk_size
+            chunk = list(queryset[offset:offset + chunk_size])
+
+
+def iter_values_chunks(queryset, fields, chunk_size):
+    """
+    Iterate over tuples of the primary key and the given fields' values for
+    the objects in a queryset (like values_list gives), one list of at most
+    chunk_size tuples at a time, with a separate query for each chunk.  The
+    tuples are paged through by primary key, whatever the queryset's
+    ordering.
+    """
+    values = queryset.order_by('pk').values_list('pk', *fields)
+    chunk = list(values[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            break
+        chunk = list(values.filter(pk__gt=chunk[-1][0])[:chunk_size])
+
+
+def _keyset_after(ordering, obj):
+    """
+    Get a filter for the objects that come after obj in the given keyset
+    ordering.
+    """
+    after = None
+    equal = {}
+    for name, attname, descending in ordering:
+        value = getattr(obj, attname)
+        condition = dict(equal)
+        condition['%s__%s' % (name, 'lt' if descending else 'gt')] = value
+        after = Q(**condition) if after is None else after | Q(**condition)
+        equal[name] = value
+    return after
+
+
+def is_streaming(response):
+    """
+    Whether the content of a response is an iterator that will only be
+    consumed while the response is being sent.
+    """
+    return (getattr(response, 'streaming', False) or
+            getattr(response, '_base_content_is_iter', False))
+
+
+def wrap_streaming_content(response, wrapper):
+    """
+    Replace the content of a streaming response with wrapper(content), where
+    content is an iterator over the original content's pieces.
+    """
+    if getattr(response, 'streaming', False):
+        response.streaming_content = wrapper(response.streaming_content)
+    else:
+        # Before Django 1.5, the iterator is kept in _container.
+        response._container = wrapper(iter(response._container))
+
+
+class StreamingCollection (object):
+    """
+    A collection of serialized objects that is only fetched and serialized
+    while it is being iterated over, one chunk of the underlying queryset at
+    a time.  ``filter_chunk`` is called with each list of model instances, and
+    should return a list of serialized objects.
+
+    Each iteration runs the queries again, so the collection can be consumed
+    more than once.
+
+    ``skeletons``, if given, is called with the queryset and the chunk size,
+    and should return an iterator over cheaper stand-ins for the serialized
+    objects, with the same keys (see iter_skeletons).
+    """
+    def __init__(self, queryset, filter_chunk, chunk_size=500, skeletons=None):
+        self.queryset = queryset
+        self.filter_chunk = filter_chunk
+        self.chunk_size = chunk_size
+        self.skeletons = skeletons
+
+    def __iter__(self):
+        for chunk in iter_queryset_chunks(self.queryset, self.chunk_size):
+            for item in self.filter_chunk(chunk):
+                yield item
+
+    def iter_skeletons(self):
+        """
+        Iterate over objects with the same keys, nested the same way, as the
+        serialized objects, for when only the keys are wanted.  Without
+        ``skeletons``, these are just the serialized objects.
+        """
+        if self.skeletons is None:
+            return iter(self)
+        return self.skeletons(self.queryset, self.chunk_size)
+
+
+class JSONFragment (object):
+    """
+    An object that has already been serialized to JSON, so that renderers
+    that know about fragments can write it out as is.  The data is only
+    decoded again if something asks for it.
+    """
+    def __init__(self, json_string):
+        self.json = json_string
+
+    @cached_property
+    def data(self):
+        return json.loads(self.json)
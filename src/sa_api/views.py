@@ -1,19 +1,41 @@
+from . import bulk
+from . import caching
+from . import datafilters
 from . import forms
 from . import models
+from . import mvt
+from . import notifications
 from . import parsers
 from . import renderers
 from . import resources
+from . import spatial
+from . import submission_queue
+from . import transactions
+from . import urlbuilder
 from . import utils
+from django.conf import settings
 from django.contrib import auth
+from django.contrib.gis.geos import Polygon
+from django.contrib.gis.measure import D
 from django.core.cache import cache
-from django.http import HttpResponse
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.encoding import smart_str
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from django.views.decorators.csrf import csrf_exempt
-from djangorestframework import views, permissions, mixins, authentication
+from djangorestframework import views, permissions, mixins, authentication, status
 from djangorestframework.response import Response, ErrorResponse
+from djangorestframework.utils import MSIE_USER_AGENT_REGEX
 import apikey.auth
+import hashlib
 import json
 import logging
+import math
+import time
 
 logger = logging.getLogger('sa_api.views')
 
@@ -78,6 +100,10 @@ class AuthMixin(object):
 
     unsafe_permissions = [IsOwnerOrSuperuser]
 
+    # Permissions that let everyone in, so checking them does not need to
+    # know who the user is.
+    anonymous_permissions = [permissions.FullAnonAccess]
+
     allowed_username = None
     allowed_user_kwarg = None
 
@@ -89,8 +115,6 @@ class AuthMixin(object):
             # Probably happens only in tests that have forgotten to
             # set the user?
             return permissions._403_FORBIDDEN_RESPONSE.response
-        # This triggers authentication (view.user is a property).
-        user = self.user
 
         if self.allowed_user_kwarg:
             self.allowed_username = kwargs[self.allowed_user_kwarg]
@@ -100,7 +124,12 @@ class AuthMixin(object):
             logger.error("Subclass %s of AuthMixin is supposed to provide .allowed_user_kwarg or .allowed_username" % self)
             return permissions._403_FORBIDDEN_RESPONSE.response
 
+        # Safe requests are only authenticated if something asks for the
+        # user, so that reads never pay for checking credentials (e.g.,
+        # hashing Basic auth passwords).
         if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            # This triggers authentication (view.user is a property).
+            user = self.user
             try:
                 for perm in getattr(self, 'unsafe_permissions', []):
                     perm(self).check_permission(user)
@@ -111,32 +140,221 @@ class AuthMixin(object):
                 return response
         return super(AuthMixin, self).dispatch(request, *args, **kwargs)
 
+    def _check_permissions(self):
+        # Don't authenticate just to check permissions that let everyone in.
+        if all(perm in self.anonymous_permissions for perm in self.permissions):
+            return
+        return super(AuthMixin, self)._check_permissions()
+
+
+class CacheScopeMixin (object):
+    """
+    Works out which cache scope (see the caching module) a request's data
+    belongs to, from the owner and dataset named in its URL.
+
+    The dataset slug's URL kwarg is assumed to be named like the view's
+    ``allowed_user_kwarg``, with ``slug`` in place of ``owner__username``
+    (e.g., ``dataset__owner__username`` and ``dataset__slug``).
+    """
+    def get_cache_scope(self, **kwargs):
+        owner_kwarg = self.allowed_user_kwarg
+        owner_username = kwargs.get(owner_kwarg) if owner_kwarg else None
+        if owner_username is None:
+            return caching.GLOBAL_SCOPE
+
+        slug_kwarg = owner_kwarg[:-len('owner__username')] + 'slug'
+        dataset_slug = kwargs.get(slug_kwarg)
+        if dataset_slug is None:
+            return caching.owner_scope(owner_username)
+        return caching.dataset_scope(owner_username, dataset_slug)
+
+    def get_cache_version(self, **kwargs):
+        """
+        Get the version of the request's data, which changes whenever the data
+        does.  By default, this is the version of its cache scope.
+        """
+        return caching.get_version(self.get_cache_scope(**kwargs))
+
+    def get_cache_last_modified(self, **kwargs):
+        """
+        Get the time that the request's data last changed.  By default, this
+        is when its cache scope last changed.
+        """
+        return caching.get_last_modified(self.get_cache_scope(**kwargs))
+
+    def get_request_digest(self, request):
+        """
+        Get a hash of everything about a GET request, other than the data,
+        that can change what the response looks like.
+        """
+        # DRF ignores the Accept header from Internet Explorer, so whether the
+        # request comes from IE matters too.
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        is_msie = bool(MSIE_USER_AGENT_REGEX.match(user_agent) and
+                       not request.is_ajax())
+
+        # The host is included because the responses contain absolute URLs.
+        parts = [request.build_absolute_uri(request.path),
+                 repr(sorted(request.GET.lists())),
+                 request.META.get('HTTP_ACCEPT', '*/*'),
+                 str(is_msie),
+                 request.META.get(apikey.auth.KEY_HEADER, ''),
+                 request.META.get('HTTP_AUTHORIZATION', '')]
+        digest = hashlib.md5('\n'.join(smart_str(part) for part in parts))
+        return digest.hexdigest()
+
+
+class ConditionalGetMixin (CacheScopeMixin):
+    """
+    Answer GET requests with validators (a weak ``ETag`` and
+    ``Last-Modified``), and answer conditional GET requests for data that
+    has not changed with a 304 Not Modified, without building a response.
+
+    The validators come from the version of the data's cache scope (see the
+    caching module) and the time it last changed (see get_cache_version and
+    get_cache_last_modified), so checking them costs no database queries.
+    They are conservative: any change in the scope (e.g., any place in a
+    dataset) changes the validators of every resource in it.
+
+    HTTP dates are in whole seconds, so the time is rounded up, and
+    ``Last-Modified`` is only sent once that second is over; otherwise a
+    change later in the same second would look like no change.  Clients that
+    send both ``If-None-Match`` and ``If-Modified-Since`` are answered by the
+    ETag alone.
+
+    The versions are only seen by every server process if the cache is
+    shared by all of them (see caching.is_shared); otherwise, no validators
+    are sent, rather than ones that may not change when the data does.
+    """
+    def is_conditional_request(self, request, *args, **kwargs):
+        """
+        Whether this request gets validators, and may be answered with a 304.
+        GET and HEAD requests do by default, if the cache is shared, unless
+        their scope is not versioned (see caching.is_versioned).
+        """
+        return (request.method in ('GET', 'HEAD') and caching.is_shared() and
+                caching.is_versioned(self.get_cache_scope(**kwargs)))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_conditional_request(request, *args, **kwargs):
+            return super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+
+        # Get the validators before building the response, so that if the
+        # data changes in the meantime, the response is newer than its
+        # validators say (and not older).
+        etag = 'W/' + quote_etag('%s-%s' % (self.get_cache_version(**kwargs),
+                                           self.get_request_digest(request)))
+        last_modified = int(math.ceil(self.get_cache_last_modified(**kwargs)))
+        if last_modified > time.time():
+            last_modified = None
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+            if not (200 <= response.status_code < 300):
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Clients may keep the response, but should check that it is still
+        # fresh before using it again.
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
 
-class CachedMixin (object):
+        # If-None-Match takes precedence over If-Modified-Since.
+        if if_none_match:
+            # Weak comparison: W/"x" matches "x" and W/"x".
+            def strip_weak(tag):
+                return tag[2:] if tag.startswith('W/') else tag
+
+            etags = [strip_weak(tag.strip())
+                     for tag in if_none_match.split(',')]
+            return '*' in etags or strip_weak(etag) in etags
+
+        # Without a Last-Modified time (the data changed within the last
+        # second), the data may always have been modified.
+        if if_modified_since and last_modified is not None:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+            return (if_modified_since is not None and
+                    last_modified <= if_modified_since)
+
+        return False
+
+
+class CachedMixin (CacheScopeMixin):
+    """
+    Cache the successful responses to GET requests.
+
+    Cached responses are keyed on everything that can change what the
+    response looks like: the URL path and query, the requested content type,
+    the credentials sent with the request, and the version of the data's
+    cache scope.  Any change to the data in the scope makes for new keys, so
+    old responses are never served; they just expire.
+
+    Responses say whether they came from the cache in an ``X-Cache`` header
+    (``HIT`` or ``MISS``), and the hits and misses for each view are counted
+    (see the cache_stats management command).
+
+    Timeouts come from the ``SA_API_CACHE_TIMEOUTS`` setting, by
+    cache_prefix, or else ``SA_API_CACHE_TIMEOUT``.  Responses bigger than
+    ``SA_API_CACHE_MAX_SIZE`` bytes are not cached.
+
+    Nothing is cached unless the cache is shared by all of the server
+    processes (see caching.is_shared).  With a cache in each process, a
+    change handled by one process would not invalidate what the others have
+    cached.
+    """
     @property
     def cache_prefix(self):
         return self.__class__.__name__.lower()
 
+    @property
+    def cache_timeout(self):
+        timeouts = getattr(settings, 'SA_API_CACHE_TIMEOUTS', {})
+        return timeouts.get(self.cache_prefix,
+                            getattr(settings, 'SA_API_CACHE_TIMEOUT', None))
+
+    def is_cacheable_request(self, request, *args, **kwargs):
+        """
+        Whether the response to this request may come from (and go into) the
+        cache.  Only GET requests are cached by default, if the cache is
+        shared, unless their scope is not versioned (see
+        caching.is_versioned).
+        """
+        return (request.method == 'GET' and caching.is_shared() and
+                caching.is_versioned(self.get_cache_scope(**kwargs)))
+
+    def get_cache_key(self, request, *args, **kwargs):
+        version = self.get_cache_version(**kwargs)
+        digest = self.get_request_digest(request)
+        return 'sa_api:response:%s:%s:%s' % (self.cache_prefix, version, digest)
+
     @csrf_exempt
     def dispatch(self, request, *args, **kwargs):
-        # Only do the cache for GET method.
-        if request.method.lower() != 'get':
+        if not self.is_cacheable_request(request, *args, **kwargs):
             return super(CachedMixin, self).dispatch(request, *args, **kwargs)
 
         # Check whether the response data is in the cache.
-        key = ''.join([self.cache_prefix,
-                       request.META['QUERY_STRING'],
-                       request.META['HTTP_ACCEPT'],
-                       request.META.get(apikey.auth.KEY_HEADER, ''),
-                       ])
+        key = self.get_cache_key(request, *args, **kwargs)
         response_data = cache.get(key)
 
-        if response_data:
-            return self.respond_from_cache(response_data)
+        if response_data is not None:
+            caching.count_request(self.cache_prefix, 'hits')
+            response = self.respond_from_cache(response_data)
+            response['X-Cache'] = 'HIT'
         else:
+            caching.count_request(self.cache_prefix, 'misses')
             response = super(CachedMixin, self).dispatch(request, *args, **kwargs)
-            self.cache_response(key, response)
-            return response
+            if 200 <= response.status_code < 300:
+                self.cache_response(key, response)
+            response['X-Cache'] = 'MISS'
+        return response
 
     def respond_from_cache(self, cached_data):
         # Given some cached data, construct a response.
@@ -150,15 +368,34 @@ class CachedMixin (object):
 
     def cache_response(self, key, response):
         # Cache enough info to recreate the response.
-        content = response.content
         status = response.status_code
         headers = response.items()
-        cache.set(key, (content, status, headers))
+        max_size = getattr(settings, 'SA_API_CACHE_MAX_SIZE', None)
+        timeout = self.cache_timeout
+
+        if not utils.is_streaming(response):
+            content = response.content
+            if max_size is None or len(content) <= max_size:
+                cache.set(key, (content, status, headers), timeout)
+            return
 
-        # Also, add the key to the set of pages cached from this view.
-        keys = cache.get(self.cache_prefix + '_keys') or set()
-        keys.add(key)
-        cache.set(self.cache_prefix + '_keys', keys)
+        # A streaming response can only be read once, as it is sent; keep a
+        # copy of the pieces on the way out, and cache them at the end.
+        def tee(pieces):
+            copied = []
+            size = 0
+            for piece in pieces:
+                if copied is not None:
+                    copied.append(piece)
+                    size += len(piece)
+                    if max_size is not None and size > max_size:
+                        copied = None
+                yield piece
+
+            if copied is not None:
+                cache.set(key, (''.join(copied), status, headers), timeout)
+
+        utils.wrap_streaming_content(response, tee)
 
 
 class AbsUrlMixin (object):
@@ -167,6 +404,9 @@ class AbsUrlMixin (object):
         Given the response content, filter it into a serializable object.
         """
         filtered = super(AbsUrlMixin, self).filter_response(obj)
+        if getattr(self.resource, 'absolute_urls', False):
+            # The resource has already made its URLs absolute.
+            return filtered
         return self.process_urls(filtered)
 
     def process_urls(self, data):
@@ -180,7 +420,7 @@ class AbsUrlMixin (object):
 
         elif isinstance(data, dict):
             if data.get('url') is not None:
-                data['url'] = self.request.build_absolute_uri(data['url'])
+                data['url'] = urlbuilder.build_absolute_uri(self.request, data['url'])
 
             for val in data.itervalues():
                 self.process_urls(val)
@@ -188,6 +428,67 @@ class AbsUrlMixin (object):
         return data
 
 
+class StreamingMixin (object):
+    """
+    Send collections to the client as they are read from the database, instead
+    of building the whole response in memory first.
+
+    When a handler returns a queryset, it is serialized lazily, one chunk of
+    ``stream_chunk_size`` objects at a time (each chunk goes through the rest
+    of the view's filter_response chain).  If the negotiated renderer knows
+    how to render a stream, the response content is an iterator; otherwise
+    the collection is rendered all at once as usual.
+
+    If the renderer also takes pre-rendered JSON fragments, and the resource
+    can make them (see resources.PlannedSerializationMixin), each chunk goes
+    straight to the resource's filter_fragments instead.
+    """
+    stream_chunk_size = 500
+
+    def filter_response(self, obj):
+        if isinstance(obj, QuerySet):
+            filter_chunk = super(StreamingMixin, self).filter_response
+            return utils.StreamingCollection(obj, filter_chunk,
+                                             self.stream_chunk_size)
+        return super(StreamingMixin, self).filter_response(obj)
+
+    def render(self, response):
+        content = getattr(response, 'cleaned_content', None)
+        if not isinstance(content, utils.StreamingCollection):
+            return super(StreamingMixin, self).render(response)
+
+        try:
+            renderer, media_type = self._determine_renderer(self.request)
+        except ErrorResponse:
+            renderer = None
+
+        if not hasattr(renderer, 'render_stream'):
+            response.cleaned_content = list(content)
+            return super(StreamingMixin, self).render(response)
+
+        if (getattr(renderer, 'renders_fragments', False) and
+                hasattr(self.resource, 'filter_fragments')):
+            # Use a new resource for each chunk, like filter_response does.
+            content.filter_chunk = lambda chunk: self._resource.filter_fragments(chunk)
+
+        # Renderers that only need the keys of the items first (e.g., for
+        # CSV headers) can get them without serializing everything twice.
+        if hasattr(self.resource, 'iter_skeletons'):
+            content.skeletons = self._resource.iter_skeletons
+
+        self.response = response
+        response.media_type = renderer.media_type
+
+        stream = renderer.render_stream(content, media_type)
+        resp = utils.StreamingHttpResponse(stream,
+                                           mimetype=response.media_type,
+                                           status=response.status)
+        for (key, val) in response.headers.items():
+            resp[key] = val
+
+        return resp
+
+
 class Ignore_CacheBusterMixin (object):
     @csrf_exempt
     def dispatch(self, request, *args, **kwargs):
@@ -214,14 +515,61 @@ class ModelViewWithDataBlobMixin (object):
             utils.unpack_data_blob(self._data)
 
 
-# TODO derive from CachedMixin to enable caching
-class DataSetCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
+class WriteTransactionMixin (object):
+    """
+    Make all of the changes for a PUT or DELETE in one transaction (see
+    transactions.write_transaction), so that a failed request leaves nothing
+    half done, and the caches are invalidated once, after it is committed.
+    Views that create things wrap their own posts.
+    """
+    def put(self, request, *args, **kwargs):
+        with transactions.write_transaction():
+            return super(WriteTransactionMixin, self).put(request, *args, **kwargs)
+
+    def delete(self, request, *args, **kwargs):
+        with transactions.write_transaction():
+            return super(WriteTransactionMixin, self).delete(request, *args, **kwargs)
+
+
+class DataSetCollectionView (Ignore_CacheBusterMixin, ConditionalGetMixin, CachedMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
 
     resource = resources.DataSetResource
     cache_prefix = 'dataset_collection'
 
     allowed_user_kwarg = 'owner__username'
 
+    def get_cache_scopes(self, **kwargs):
+        """
+        Get the cache scopes that the list of the owner's datasets depends on:
+        the owner's, and each of the datasets', as it summarizes what is in
+        them.  The slugs are cached under the owner scope's version, which is
+        bumped whenever a dataset is made, changed or deleted.
+        """
+        owner_username = kwargs[self.allowed_user_kwarg]
+        owner_scope = caching.owner_scope(owner_username)
+        key = 'sa_api:dataset_slugs:%s:%s' % (owner_username,
+                                             caching.get_version(owner_scope))
+        slugs = cache.get(key)
+        if slugs is None:
+            slugs = list(models.DataSet.objects
+                         .filter(owner__username=owner_username)
+                         .values_list('slug', flat=True))
+            cache.set(key, slugs, caching.VERSION_TIMEOUT)
+
+        return [owner_scope] + [caching.dataset_scope(owner_username, slug)
+                                for slug in sorted(slugs)]
+
+    def get_cache_version(self, **kwargs):
+        # Changes when any of the versions do.  Hashed, to keep cache keys
+        # short however many datasets there are.
+        versions = [str(caching.get_version(scope))
+                    for scope in self.get_cache_scopes(**kwargs)]
+        return hashlib.md5('-'.join(versions)).hexdigest()
+
+    def get_cache_last_modified(self, **kwargs):
+        return max(caching.get_last_modified(scope)
+                   for scope in self.get_cache_scopes(**kwargs))
+
     def get_instance_data(self, model, content, **kwargs):
         # Used by djangorestframework to make args to build an instance for POST
         kwargs.pop('owner__username', None)
@@ -241,7 +589,7 @@ class DataSetCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, Mo
         return response
 
 
-class DataSetInstanceView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
+class DataSetInstanceView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
     resource = resources.DataSetResource
 
     allowed_user_kwarg = 'owner__username'
@@ -261,43 +609,388 @@ class DataSetInstanceView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, Mode
             return instance
 
 
-# TODO derive from CachedMixin to enable caching
-class PlaceCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
-    # TODO: Decide whether pagination is appropriate/necessary.
+class DataFilterMixin (object):
+    """
+    Filter the things in a view's queryset by the attributes in their data
+    blobs, according to the request's ``data.`` query string parameters (see
+    the datafilters module for a description of them).
+    """
+    def get_queryset(self):
+        queryset = super(DataFilterMixin, self).get_queryset()
+        try:
+            return datafilters.filter_by_data(queryset, self.request.GET)
+        except ValueError, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST, {'detail': str(e)})
+
+
+class PlaceFilterMixin (object):
+    """
+    Filter the places in a view's queryset by visibility and location,
+    according to the request's query string parameters (see
+    PlaceCollectionView for a description of them).
+    """
+    def get_queryset(self):
+        # Expects 'all' or not defined
+        visibility = self.request.GET.get('visible', 'true')
+        queryset = super(PlaceFilterMixin, self).get_queryset()
+
+        if (visibility == 'all'):
+            pass
+        elif visibility == 'true':
+            queryset = queryset.filter(visible=True)
+        else:
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': 'visible must be either "true" or "all"'})
+
+        return self.filter_by_location(queryset)
+
+    def filter_by_location(self, queryset):
+        """
+        Apply the bbox, near, radius, and sort parameters to the queryset.
+        The filters compare bounding boxes first, so that they can use the
+        spatial index on the place locations.
+        """
+        params = self.request.GET
+        bbox = near = radius = None
+
+        try:
+            if params.get('bbox'):
+                bbox = utils.parse_bbox(params['bbox'])
+            if params.get('near'):
+                near = utils.parse_point(params['near'])
+        except ValueError, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST, {'detail': str(e)})
+
+        if params.get('radius'):
+            try:
+                radius = float(params['radius'])
+            except ValueError:
+                radius = None
+            if not radius > 0:
+                raise ErrorResponse(
+                    status.HTTP_400_BAD_REQUEST,
+                    {'detail': 'radius must be a positive number of meters'})
+
+        sort = params.get('sort')
+        if sort not in (None, '', 'distance'):
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': 'places can only be sorted by distance'})
+
+        if (radius is not None or sort) and near is None:
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': 'radius and sort require a near point'})
+
+        if bbox is not None:
+            queryset = queryset.filter(location__contained=bbox)
+
+        if radius is not None:
+            # Narrow down by box before measuring the actual distances.
+            queryset = queryset.filter(
+                location__contained=utils.bbox_around(near, radius))
+            queryset = queryset.filter(
+                location__distance_lte=(near, D(m=radius)))
+
+        if sort == 'distance':
+            # Order places at the same distance (e.g., duplicate points) by
+            # id, so that they come out the same way in every chunk.
+            queryset = queryset.distance(near).order_by('distance', 'id')
+
+        return queryset
+
+    def _get_int_param(self, name, min_value, max_value=None):
+        value = self.request.GET.get(name)
+        if value is None:
+            return None
+
+        try:
+            value = int(value)
+        except ValueError:
+            value = None
+
+        if (value is None or value < min_value or
+            (max_value is not None and value > max_value)):
+            bounds = ('between %s and %s' % (min_value, max_value)
+                      if max_value is not None else
+                      'at least %s' % min_value)
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': '%s must be a whole number %s' % (name, bounds)})
+        return value
+
+
+class PlaceCollectionView (Ignore_CacheBusterMixin, ConditionalGetMixin, CachedMixin, AuthMixin, StreamingMixin, AbsUrlMixin, DataFilterMixin, PlaceFilterMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
+    """
+    Get or create places in a dataset.
+
+    By default, every place in the dataset is returned, streamed as it is
+    read.  Clients can instead ask for one page of places at a time.
+
+    Query String Parameters
+    -----------------------
+    - `visible` -- Set to `all` to return both visible and invisible places.
+    - `page_size` -- The maximum number of places to return (at most
+                     `max_page_size`).  Places are returned in id order, and
+                     if there are more to get, the response will have a
+                     `Link` header with the URL of the next page
+                     (`rel="next"`).
+    - `after` -- Only return places with ids greater than this.  Used with
+                 `page_size`; the next page link sets it for you.
+    - `bbox` -- Only return places within a box, given as
+                `min_lng,min_lat,max_lng,max_lat`.
+    - `near` -- A point, given as `lng,lat`, to search around.
+    - `radius` -- Only return places within this many meters of `near`.
+    - `sort` -- Set to `distance` to return the places closest to `near`
+                first.  Cannot be combined with `page_size`.
+    - `data.<attribute>` -- Only return places with the given value for an
+                            attribute, e.g., `data.category=bike_lane`.  Add
+                            `__in` to give a comma-separated list of values.
+
+    Examples
+    --------
+    Get the first 100 places, then the next 100:
+
+        /places/?page_size=100
+        /places/?page_size=100&after=<id_of_last_place>
+
+    Get the places on a map of Philadelphia:
+
+        /places/?bbox=-75.28,39.87,-74.96,40.14
+
+    Get the places within a kilometer of a point, nearest first:
+
+        /places/?near=-75.16,39.95&radius=1000&sort=distance
+
+    Get the places that have been proposed or approved:
+
+        /places/?data.status__in=proposed,approved
+    """
     resource = resources.PlaceResource
     cache_prefix = 'place_collection'
+    max_page_size = 1000
 
     allowed_user_kwarg = 'dataset__owner__username'
 
     def get_instance_data(self, model, content, **kwargs):
         # Used by djangorestframework to make args to build an instance for POST
         dataset = get_object_or_404(
-            models.DataSet,
+            models.DataSet.objects.select_related('owner'),
             slug=kwargs.pop('dataset__slug'),
             owner__username=kwargs.pop('dataset__owner__username'),
         )
         content['dataset'] = dataset
         return super(PlaceCollectionView, self).get_instance_data(model, content, **kwargs)
 
-    def get_queryset(self):
-        # Expects 'all' or not defined
-        visibility = self.request.GET.get('visible', 'true')
-        queryset = super(PlaceCollectionView, self).get_queryset()
-
-        if (visibility == 'all'):
+    def get(self, request, *args, **kwargs):
+        page_size = self._get_int_param('page_size', 1, self.max_page_size)
+        after = self._get_int_param('after', 0)
+
+        if page_size is not None and request.GET.get('sort'):
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': 'page_size cannot be combined with sort'})
+
+        queryset = super(PlaceCollectionView, self).get(request, *args, **kwargs)
+        if after is not None:
+            queryset = queryset.filter(id__gt=after)
+        if page_size is None:
             return queryset
-        elif visibility == 'true':
-            return queryset.filter(visible=True)
+
+        # Fetch one extra place, just to find out whether there is a next page.
+        places = list(queryset.order_by('id')[:page_size + 1])
+        if len(places) > page_size:
+            places = places[:page_size]
+            params = request.GET.copy()
+            params['after'] = places[-1].id
+            next_url = request.build_absolute_uri('?' + params.urlencode())
+            self.add_header('Link', '<%s>; rel="next"' % next_url)
+        return places
 
     def post(self, request, *args, **kwargs):
-        response = super(PlaceCollectionView, self).post(request, *args, **kwargs)
+        with transactions.write_transaction():
+            response = super(PlaceCollectionView, self).post(request, *args, **kwargs)
         # djangorestframework automagically sets Location, but ...
         # see comment on DataSetCollectionView.post()
         response.headers['Location'] = self._resource.url(response.raw_content)
         return response
 
 
-class PlaceInstanceView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
+class PlaceBulkView (Ignore_CacheBusterMixin, AuthMixin, views.View):
+    """
+    Create many places in a dataset at once.  Only the dataset's owner may
+    do so.
+
+    The places can be posted as a GeoJSON FeatureCollection
+    (`application/geo+json`, or `application/json`, which also takes a list
+    of places like the ones posted to the place collection), as
+    newline-delimited JSON (`application/x-ndjson`), or as CSV (`text/csv`,
+    with `lat` and `lng` columns).  Either every place is created, or, if
+    any is invalid, none are, and the response lists the errors.
+
+    Examples
+    --------
+    Import the places in a GeoJSON file:
+
+        POST /places/bulk/
+        Content-Type: application/geo+json
+
+        {"type": "FeatureCollection", "features": [...]}
+    """
+    parsers = parsers.BULK_PARSERS
+    allowed_user_kwarg = 'dataset__owner__username'
+
+    def post(self, request, dataset__owner__username, dataset__slug):
+        dataset = get_object_or_404(models.DataSet,
+                                    owner__username=dataset__owner__username,
+                                    slug=dataset__slug)
+
+        created = 0
+        try:
+            with transactions.write_transaction():
+                for batch in bulk.iter_batches(self.DATA, bulk.clean_place):
+                    created += len(bulk.insert_places(dataset, batch))
+                dataset.invalidate_caches()
+        except bulk.InvalidRecords, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': str(e), 'errors': e.errors})
+        except ValueError, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST, {'detail': str(e)})
+
+        return Response(status.HTTP_201_CREATED, {'created': created})
+
+
+class PlaceClusterView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, DataFilterMixin, PlaceFilterMixin, views.ListModelView):
+    """
+    Get the places in a dataset grouped into clusters, for showing on a
+    zoomed-out map.  Places are grouped by a square grid whose cells are
+    about 64 pixels wide at the given zoom level, and each cluster has the
+    number of places in it and their average location.
+
+    Query String Parameters
+    -----------------------
+    - `zoom` -- Required.  The web map zoom level, from 0 to `max_zoom`.
+    - `submissions` -- Set to `true` to include the total number of each
+                       type of submission on the places in each cluster.
+    - `bbox`, `visible`, etc. -- The place filters, as for the place
+                                 collection.
+
+    Examples
+    --------
+    Get the clusters on a map of Philadelphia:
+
+        /places/clusters/?zoom=11&bbox=-75.28,39.87,-74.96,40.14
+    """
+    resource = resources.PlaceResource
+    max_zoom = 22
+
+    allowed_user_kwarg = 'dataset__owner__username'
+
+    def get(self, request, *args, **kwargs):
+        zoom = self._get_int_param('zoom', 0, self.max_zoom)
+        if zoom is None:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': 'zoom is required'})
+        with_submissions = (request.GET.get('submissions') == 'true')
+
+        queryset = super(PlaceClusterView, self).get(request, *args, **kwargs)
+        return spatial.cluster_places(queryset, spatial.grid_cell_size(zoom),
+                                      with_submissions)
+
+    def filter_response(self, obj):
+        # The clusters are already plain data; they are not places.
+        return obj
+
+
+class PlaceTileView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, DataFilterMixin, PlaceFilterMixin, views.ListModelView):
+    """
+    Get the places in a dataset that fall within a web map tile, encoded as a
+    Mapbox Vector Tile with a single layer of points named `places`.  Each
+    point has the id of its place.
+
+    Tiles are cached until anything in the dataset changes, if the cache is
+    shared by all of the server processes (see caching.is_shared).
+
+    Query String Parameters
+    -----------------------
+    - `properties` -- A comma-separated list of place attributes to include
+                      with each point.  Only string, number and boolean
+                      values are included.
+    - `visible`, etc. -- The place filters, as for the place collection.
+
+    Examples
+    --------
+    Get a tile with the name and category of each place:
+
+        /places/tiles/12/1193/1550.pbf?properties=name,category
+    """
+    resource = resources.PlaceResource
+    max_zoom = 22
+    media_type = 'application/x-protobuf'
+    layer_name = 'places'
+
+    allowed_user_kwarg = 'dataset__owner__username'
+
+    def get(self, request, z, x, y, **kwargs):
+        z, x, y = int(z), int(x), int(y)
+        if z > self.max_zoom or x >= 2 ** z or y >= 2 ** z:
+            raise ErrorResponse(status.HTTP_404_NOT_FOUND,
+                                {'detail': 'No such tile'})
+
+        key = content = None
+        if caching.is_shared():
+            key = self.get_tile_cache_key(request, z, x, y, **kwargs)
+            content = cache.get(key)
+
+        if content is None:
+            queryset = super(PlaceTileView, self).get(request, **kwargs)
+            content = self.encode_tile(queryset, z, x, y)
+            if key is not None:
+                cache.set(key, content, caching.VERSION_TIMEOUT)
+
+        return HttpResponse(content, mimetype=self.media_type)
+
+    def get_tile_cache_key(self, request, z, x, y, **kwargs):
+        scope = self.get_cache_scope(**kwargs)
+        return 'place_tile:%s:%s:%s/%s/%s:%s' % (
+            scope, caching.get_version(scope), z, x, y,
+            hashlib.md5(request.GET.urlencode()).hexdigest())
+
+    def encode_tile(self, queryset, z, x, y):
+        west, south, east, north = mvt.tile_bounds(z, x, y)
+        bbox = Polygon.from_bbox((west, south, east, north))
+        bbox.srid = 4326
+
+        properties = [name for name
+                      in self.request.GET.get('properties', '').split(',')
+                      if name]
+
+        location = '%s.%s' % (
+            connection.ops.quote_name(models.Place._meta.db_table),
+            connection.ops.quote_name(
+                models.Place._meta.get_field('location').column))
+
+        rows = (queryset.filter(location__contained=bbox)
+                .order_by()
+                .extra(select={'lng': 'ST_X(%s)' % location,
+                               'lat': 'ST_Y(%s)' % location})
+                .values_list('id', 'lng', 'lat', 'data'))
+
+        def features():
+            for place_id, lng, lat, data in rows.iterator():
+                if properties:
+                    data = json.loads(data)
+                    data = dict((name, data[name]) for name in properties
+                                if name in data)
+                else:
+                    data = {}
+                yield (place_id, lng, lat, data)
+
+        return mvt.encode_points(self.layer_name, features(), z, x, y)
+
+
+class PlaceInstanceView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, AbsUrlMixin, WriteTransactionMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
 
     allowed_user_kwarg = 'dataset__owner__username'
 
@@ -340,7 +1033,7 @@ class ApiKeyCollectionView (Ignore_CacheBusterMixin, AbsUrlMixin, ModelViewWithD
     # TODO: handle POST, DELETE
 
 
-class AllSubmissionCollectionsView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.ListModelView):
+class AllSubmissionCollectionsView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, StreamingMixin, AbsUrlMixin, DataFilterMixin, ModelViewWithDataBlobMixin, views.ListModelView):
     resource = resources.SubmissionResource
 
     allowed_user_kwarg = 'dataset__owner__username'
@@ -356,7 +1049,7 @@ class AllSubmissionCollectionsView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMi
         )
 
 
-class SubmissionCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
+class SubmissionCollectionView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, StreamingMixin, AbsUrlMixin, DataFilterMixin, ModelViewWithDataBlobMixin, views.ListOrCreateModelView):
     resource = resources.SubmissionResource
 
     allowed_user_kwarg = 'dataset__owner__username'
@@ -372,25 +1065,66 @@ class SubmissionCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin,
         )
 
     def post(self, request, place_id, submission_type, **kwargs):
+        if submission_queue.is_queued(submission_type):
+            return self.post_to_queue(place_id, submission_type, **kwargs)
+
         # TODO: Location
-        return super(SubmissionCollectionView, self).post(
-            request, place_id=place_id, submission_type=submission_type, **kwargs)
+        with transactions.write_transaction():
+            return super(SubmissionCollectionView, self).post(
+                request, place_id=place_id, submission_type=submission_type, **kwargs)
+
+    def get_place(self, place_id, **kwargs):
+        """
+        Get the place with the given id, if it is in the dataset named in the
+        URL, or else raise a 404.  The owner's permission is only checked on
+        the dataset in the URL, so a place in any other dataset must not be
+        found.
+        """
+        return get_object_or_404(
+            models.Place.objects.select_related('dataset__owner'),
+            id=place_id,
+            dataset__owner__username=kwargs['dataset__owner__username'],
+            dataset__slug=kwargs['dataset__slug'],
+        )
+
+    def post_to_queue(self, place_id, submission_type, **kwargs):
+        """
+        Check a submission, and queue it to be saved later (see the
+        submission_queue module).  Answers with the id it is queued as.
+        """
+        content = self.CONTENT
+        place = self.get_place(place_id, **kwargs)
+        queued = submission_queue.enqueue(place, submission_type,
+                                          content.get('submitter_name'),
+                                          content['data'])
+        return Response(status.HTTP_202_ACCEPTED,
+                        {'provisional_id': queued.id, 'status': 'queued'})
 
     def get_instance_data(self, model, content, **kwargs):
         # Used by djangorestframework to make args to build an instance for POST
         # From the URL string, we should have the necessary
         # information to get the submission set.  The DataSet is
-        # implicit from the Place, which we get by ID, so ignore the
-        # extra kwargs.
-        place_id = kwargs['place_id']
-        submission_type = kwargs['submission_type']
-        place = get_object_or_404(models.Place, id=place_id)
-        submission_set, created = models.SubmissionSet.objects.get_or_create(
-            place_id=place_id, submission_type=submission_type)
-
-        # TODO If there's a validation error with the submission, we may end up
-        #      with a dangling submission_set.  We should either defer the
-        #      creation of the set, or make sure it gets cleaned up on error.
+        # implicit from the Place, which we get by ID (as long as it is in
+        # the DataSet named in the URL).
+        place_id = kwargs.pop('place_id')
+        submission_type = kwargs.pop('submission_type')
+        place = self.get_place(place_id, **kwargs)
+        try:
+            submission_set = models.SubmissionSet.objects.get(
+                place_id=place_id, submission_type=submission_type)
+        except models.SubmissionSet.DoesNotExist:
+            # Another request, or a bulk import, may be making the set right
+            # now; take the same lock on the place as they do before making
+            # it (see bulk.lock_places).
+            bulk.lock_places([place.id])
+            submission_set, created = models.SubmissionSet.objects.get_or_create(
+                place_id=place_id, submission_type=submission_type)
+        # So that the submission's activity can be filled in without looking
+        # the place up again.
+        submission_set.place = place
+
+        # If saving the submission fails, the submission set is rolled back
+        # along with it, as they are created in one transaction (see post).
 
         content['dataset'] = place.dataset
         content['parent'] = submission_set
@@ -400,7 +1134,54 @@ class SubmissionCollectionView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin,
         return super(SubmissionCollectionView, self).get_instance_data(model, content,)
 
 
-class SubmissionInstanceView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
+class SubmissionBulkView (Ignore_CacheBusterMixin, AuthMixin, views.View):
+    """
+    Create many submissions of a type in a dataset at once, on any of its
+    places.  Only the dataset's owner may do so.
+
+    The submissions can be posted as JSON (`application/json`, a list of
+    submissions like the ones posted to a submission collection), as
+    newline-delimited JSON (`application/x-ndjson`), or as CSV (`text/csv`).
+    Each one needs a `place_id`.  When posting to `submissions/bulk/`, each
+    also needs a `type`.  Either every submission is created, or, if any is
+    invalid, none are, and the response lists the errors.
+
+    Examples
+    --------
+    Add three votes:
+
+        POST /votes/bulk/
+        Content-Type: application/json
+
+        [{"place_id": 12}, {"place_id": 12}, {"place_id": 34}]
+    """
+    parsers = parsers.BULK_PARSERS
+    allowed_user_kwarg = 'dataset__owner__username'
+
+    def post(self, request, dataset__owner__username, dataset__slug, submission_type):
+        dataset = get_object_or_404(models.DataSet,
+                                    owner__username=dataset__owner__username,
+                                    slug=dataset__slug)
+
+        def clean(record):
+            return bulk.clean_submission(record, submission_type)
+
+        created = 0
+        try:
+            with transactions.write_transaction():
+                for batch in bulk.iter_batches(self.DATA, clean):
+                    created += len(bulk.insert_submissions(dataset, batch))
+                dataset.invalidate_caches()
+        except bulk.InvalidRecords, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST,
+                                {'detail': str(e), 'errors': e.errors})
+        except ValueError, e:
+            raise ErrorResponse(status.HTTP_400_BAD_REQUEST, {'detail': str(e)})
+
+        return Response(status.HTTP_201_CREATED, {'created': created})
+
+
+class SubmissionInstanceView (Ignore_CacheBusterMixin, ConditionalGetMixin, AuthMixin, AbsUrlMixin, WriteTransactionMixin, ModelViewWithDataBlobMixin, views.InstanceModelView):
     resource = resources.SubmissionResource
 
     allowed_user_kwarg = 'dataset__owner__username'
@@ -414,8 +1195,7 @@ class SubmissionInstanceView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, M
         return super(SubmissionInstanceView, self).get_instance(pk=kwargs['pk'])
 
 
-# TODO derive from CachedMixin to enable caching
-class ActivityView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.ListModelView):
+class ActivityView (Ignore_CacheBusterMixin, ConditionalGetMixin, CachedMixin, AuthMixin, AbsUrlMixin, views.ListModelView):
     """
     Get a list of activities ordered by the `created_datetime` in reverse.
 
@@ -430,6 +1210,10 @@ class ActivityView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.ListM
     - `limit` -- The maximum number of results to be returned.
     - `visible` -- Set to `all` to return activity for both visible and
                    invisible places.
+    - `wait` -- The number of seconds (up to `SA_API_ACTIVITY_MAX_WAIT`) to
+                wait for new activity, when there is none `after` the given
+                id yet.  The response is sent as soon as there is some, or
+                when the time is up (with an empty list).
 
     Examples
     --------
@@ -441,30 +1225,33 @@ class ActivityView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.ListM
     activity with the `after` parameter:
 
         /activity/?after=<last_known_id>
+
+    Rather than polling every few seconds, wait for the next update and then
+    ask again right away (long polling):
+
+        /activity/?after=<last_known_id>&wait=20
+
+    Requests that wait are never cached, or answered with a 304.
     """
     resource = resources.ActivityResource
     form = forms.ActivityForm
     cache_prefix = 'activity'
 
-    allowed_user_kwarg = 'data__dataset__owner__username'
-
-    def get_places(self):
-        visibility = self.PARAMS.get('visible', 'true')
-        if (visibility == 'all'):
-            return models.Place.objects.all()
-        elif visibility == 'true' or visibility == '':
-            return models.Place.objects.all().filter(visible=True)
-        else:
-            raise Exception('Invalid visibility: ' + repr(visibility))
+    allowed_user_kwarg = 'dataset__owner__username'
 
-    def get_submissions(self):
-        visibility = self.PARAMS.get('visible', 'true')
-        if (visibility == 'all'):
-            return models.Submission.objects.all().select_related('parent')
+    def get_visibility_filter(self, visibility):
+        """
+        Get a filter for activity on the places and submissions that should
+        be shown.  Activity on anything else is never shown.
+        """
+        if visibility == 'all':
+            return Q(place_id__isnull=False)
         elif visibility == 'true' or visibility == '':
-            return models.Submission.objects.all().select_related('parent').filter(parent__place__visible=True)
+            return Q(place_id__isnull=False, visible=True)
         else:
-            raise Exception('Invalid visibility: ' + repr(visibility))
+            raise ErrorResponse(
+                status.HTTP_400_BAD_REQUEST,
+                {'detail': 'visible must be either "true" or "all"'})
 
     def get_queryset(self):
         """
@@ -473,13 +1260,17 @@ class ActivityView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.ListM
 
         We don't do 'limit' here because subclasses may want to do
         additional filtering; do it in get() instead. (Also easier to test.)
+        The dataset named in the URL is filtered on in get() as well, by
+        its id (see get_dataset_id).
         """
         # Validate the query and get the parameters
-        activity = self._resource.queryset
+        activity = super(ActivityView, self).get_queryset()
         query_params = self.PARAMS
         latest_id = query_params.get('before')
         earliest_id = query_params.get('after')
+        visibility = query_params.get('visible') or 'true'
 
+        activity = activity.filter(self.get_visibility_filter(visibility))
         activity = activity.order_by('-id')
 
         if earliest_id:
@@ -490,15 +1281,80 @@ class ActivityView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.ListM
 
         return activity
 
+    def get_dataset_id(self, **kwargs):
+        """
+        Get the id of the dataset named in the URL, if any.  Activity is
+        filtered on the id directly, so that the activity query doesn't join
+        the dataset and owner tables, and can be answered from the
+        (dataset, id) index alone.
+        """
+        owner_username = kwargs.get('dataset__owner__username')
+        if owner_username is None:
+            return None
+
+        return get_object_or_404(
+            models.DataSet.objects.values_list('id', flat=True),
+            owner__username=owner_username,
+            slug=kwargs.get('dataset__slug'),
+        )
+
+    def get_wait_time(self):
+        """
+        Get the number of seconds to wait for new activity, if any.  Only
+        requests for the activity after some id can wait.
+        """
+        wait = self.PARAMS.get('wait')
+        if not wait or self.PARAMS.get('after') is None:
+            return 0
+        return min(wait, getattr(settings, 'SA_API_ACTIVITY_MAX_WAIT', 20))
+
+    def is_conditional_request(self, request, *args, **kwargs):
+        return ('wait' not in request.GET and
+                super(ActivityView, self).is_conditional_request(request, *args, **kwargs))
+
+    def is_cacheable_request(self, request, *args, **kwargs):
+        return ('wait' not in request.GET and
+                super(ActivityView, self).is_cacheable_request(request, *args, **kwargs))
+
     def get(self, request, *args, **kwargs):
         """
-        Optionally limit number of items per the 'limit' query param.
+        Optionally limit number of items per the 'limit' query param, and
+        wait for new activity per the 'wait' query param.
         """
-        queryset = super(ActivityView, self).get(request, *args, **kwargs)
-        limit = self.PARAMS.get('limit')
-        if limit is not None:
-            queryset = queryset[:limit]
-        return queryset
+        wait = self.get_wait_time()
+        scope = self.get_cache_scope(**kwargs)
+        deadline = time.time() + wait
+
+        # Look up the dataset once, rather than on every query.
+        dataset_id = self.get_dataset_id(**kwargs)
+
+        while True:
+            # Get the version before querying, so that no activity that comes
+            # in after the query is missed.
+            version = caching.get_version(scope)
+            queryset = self.get_queryset()
+            if dataset_id is not None:
+                queryset = queryset.filter(dataset_id=dataset_id)
+            limit = self.PARAMS.get('limit')
+            if limit is not None:
+                queryset = queryset[:limit]
+
+            # Fetch the activity once, rather than checking whether there is
+            # any and then fetching it again.
+            activities = list(queryset)
+            remaining = deadline - time.time()
+            if remaining <= 0 or activities:
+                return activities
+
+            # Let go of the database connection while waiting, so that idle
+            # long polls don't each hold one (in an open transaction).  The
+            # next query reconnects.
+            if not transaction.is_managed():
+                connection.close()
+            # Without a listener or a shared cache, this returns every
+            # second or so for the database to be checked again.
+            if not notifications.wait_for_activity(scope, version, remaining):
+                return activities
 
 
 class OwnerPasswordView (Ignore_CacheBusterMixin, AuthMixin, AbsUrlMixin, views.View):
@@ -186,14 +186,23 @@ class TestSaManager(TestCase):
         self.assertEqual(response.status_code, 200)
 
     def test_manager_place_data_export(self):
+        from django.http import HttpResponse
+        self.mock_api.stream.return_value = HttpResponse(
+            iter(['id,name\r\n', '123,Place\r\n']), content_type='text/csv')
         client = Client()
         client.login(username='riley', password='pass')
         url = reverse('manager_download_place_data',
                       kwargs={'dataset_slug': 'dataset1'})
         response = client.get(url)
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-disposition'],
+                         'attachment; filename=places.csv')
+        self.assertEqual(response.content, 'id,name\r\n123,Place\r\n')
 
     def test_manager_submission_data_export(self):
+        from django.http import HttpResponse
+        self.mock_api.stream.return_value = HttpResponse(
+            'id,comment\r\n456,Hello\r\n', content_type='text/csv')
         client = Client()
         client.login(username='riley', password='pass')
         url = reverse('manager_download_submission_data',
@@ -201,3 +210,112 @@ class TestSaManager(TestCase):
                               'dataset_slug': 'dataset1'})
         response = client.get(url)
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-disposition'],
+                         'attachment; filename=comments.csv')
+        self.assertEqual(response.content, 'id,comment\r\n456,Hello\r\n')
+
+    def test_manager_data_export_with_gzip(self):
+        from django.http import HttpResponse
+        import gzip
+        import StringIO
+        self.mock_api.stream.return_value = HttpResponse(
+            iter(['id,name\r\n', '123,Place\r\n']), content_type='text/csv')
+        client = Client()
+        client.login(username='riley', password='pass')
+        url = reverse('manager_download_place_data',
+                      kwargs={'dataset_slug': 'dataset1'})
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.GzipFile(fileobj=StringIO.StringIO(response.content)).read()
+        self.assertEqual(content, 'id,name\r\n123,Place\r\n')
+
+    def test_manager_data_export_passes_on_api_errors(self):
+        from django.http import HttpResponse
+        self.mock_api.stream.return_value = HttpResponse(
+            '{"detail": "Not found"}', status=404,
+            content_type='application/json')
+        client = Client()
+        client.login(username='riley', password='pass')
+        url = reverse('manager_download_place_data',
+                      kwargs={'dataset_slug': 'dataset1'})
+        response = client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_manager_data_export_without_gzip_if_refused(self):
+        from django.http import HttpResponse
+        self.mock_api.stream.return_value = HttpResponse(
+            iter(['id,name\r\n', '123,Place\r\n']), content_type='text/csv')
+        client = Client()
+        client.login(username='riley', password='pass')
+        url = reverse('manager_download_place_data',
+                      kwargs={'dataset_slug': 'dataset1'})
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, 'id,name\r\n123,Place\r\n')
+
+
+class TestAcceptsGzip(TestCase):
+
+    def accepts_gzip(self, accept_encoding):
+        from django.test.client import RequestFactory
+        from ..views import accepts_gzip
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return accepts_gzip(request)
+
+    def test_accepts_gzip_by_name_or_wildcard(self):
+        self.assertTrue(self.accepts_gzip('gzip, deflate'))
+        self.assertTrue(self.accepts_gzip('deflate, GZIP;q=0.5'))
+        self.assertTrue(self.accepts_gzip('*'))
+
+    def test_does_not_accept_gzip_with_a_zero_qvalue(self):
+        self.assertFalse(self.accepts_gzip(''))
+        self.assertFalse(self.accepts_gzip('deflate'))
+        self.assertFalse(self.accepts_gzip('gzip;q=0'))
+        self.assertFalse(self.accepts_gzip('gzip; q=0.0, *'))
+        self.assertFalse(self.accepts_gzip('*;q=0'))
+
+
+class TestDataExportThroughTheApi(TestCase):
+
+    """
+    Tests of the data downloads that go all the way through the API in the
+    same process, without mocking it.
+    """
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from sa_api.models import DataSet, Place
+        self.user = User.objects.create_user('riley', password='pass')
+        self.dataset = DataSet.objects.create(owner=self.user, slug='dataset1')
+        Place.objects.create(dataset=self.dataset, id=123,
+                             location='POINT (1.0 2.0)',
+                             data='{"name": "Place"}')
+        Place.objects.create(dataset=self.dataset, id=124,
+                             location='POINT (3.0 4.0)', visible=False,
+                             data='{"name": "Hidden"}')
+
+    def tearDown(self):
+        from django.contrib.auth.models import User
+        from sa_api.models import DataSet, Place
+        Place.objects.all().delete()
+        DataSet.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_places_are_streamed_from_the_api(self):
+        import csv
+        client = Client()
+        client.login(username='riley', password='pass')
+        url = reverse('manager_download_place_data',
+                      kwargs={'dataset_slug': 'dataset1'})
+        response = client.get(url, HTTP_USER_AGENT='Mozilla/4.0 (compatible; MSIE 8.0)')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/csv', response['Content-Type'])
+
+        rows = list(csv.DictReader(response.content.splitlines()))
+        self.assertEqual([(row['id'], row['name'], row['visible']) for row in rows],
+                         [('123', 'Place', 'True'), ('124', 'Hidden', 'False')])
+        self.assertIn('http://testserver/api/v1/datasets/riley/dataset1/places/123',
+                      rows[0]['url'])
@@ -1,12 +1,17 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.urlresolvers import reverse
-from django.http import HttpResponse
+from django.core.urlresolvers import reverse, resolve
+from django.http import HttpResponse, QueryDict
 from django.shortcuts import render, redirect
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.generic import View
+from sa_api.utils import StreamingHttpResponse
+import copy
 import json
 import requests
+import urlparse
+import zlib
 
 
 API_ROOT = '/api/v1/'
@@ -25,6 +30,7 @@ class ShareaboutsApi (object):
     }
 
     def __init__(self, request=None, root='/api/v1/'):
+        self.request = request
         if request:
             self.uri_root = request.build_absolute_uri(root)
         else:
@@ -63,6 +69,30 @@ class ShareaboutsApi (object):
         response = requests.request(method, url, data=data, headers=headers)
         return response
 
+    def stream(self, url, content_type='text/csv'):
+        """
+        Make a GET request for the given URL to the API in this process, as
+        the user of the request that the API object was made with, and return
+        the API's response.  Collections come back as streaming responses, so
+        they can be passed along without being read into memory, and without
+        holding a second worker for the length of the download.
+        """
+        parts = urlparse.urlsplit(url)
+        view, args, kwargs = resolve(parts.path)
+
+        api_request = copy.copy(self.request)
+        api_request.path = api_request.path_info = parts.path
+        api_request.GET = QueryDict(parts.query)
+        api_request.META = dict(self.request.META,
+                                PATH_INFO=parts.path,
+                                QUERY_STRING=parts.query,
+                                HTTP_ACCEPT=content_type)
+        # The API ignores the Accept header from Internet Explorer, but this
+        # request doesn't come from a browser.
+        api_request.META.pop('HTTP_USER_AGENT', None)
+
+        return view(api_request, *args, **kwargs)
+
     def get(self, url, default=None):
         """
         Returns decoded data from a GET request, or default on non-200
@@ -664,28 +694,78 @@ class ExistingSubmissionView (SubmissionMixin, View):
             pass
 
 
+def gzip_stream(pieces):
+    """
+    Compress the pieces of a response with gzip, one piece at a time.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    """
+    Whether the request's Accept-Encoding header allows gzip, by name or as
+    ``*``, with a q-value above 0.
+    """
+    qvalues = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        params = coding.split(';')
+        name = params[0].strip().lower()
+        if not name:
+            continue
+
+        qvalue = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[name] = qvalue
+
+    for name in ('gzip', 'x-gzip', '*'):
+        if name in qvalues:
+            return qvalues[name] > 0
+    return False
+
+
+def download_response(request, api_response, filename):
+    """
+    Pass an API response along as a file download, a piece at a time, and
+    compressed if the client accepts gzip.
+    """
+    content = iter(api_response)
+    use_gzip = accepts_gzip(request)
+    if use_gzip:
+        content = gzip_stream(content)
+
+    response = StreamingHttpResponse(
+        content, status=api_response.status_code,
+        content_type=api_response.get('Content-Type', 'text/csv'))
+    response['Content-disposition'] = 'attachment; filename=' + filename
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+
+    return response
+
 def download_places_view(request, dataset_slug):
     api = ShareaboutsApi(request)
     api.authenticate(request)
     places_uri = api.build_uri('place_collection', username=request.user.username, dataset_slug=dataset_slug)
 
-    api_response = api.send('GET', places_uri, content_type='text/csv')
-    places_csv = api_response.text
-
-    response = HttpResponse(places_csv, content_type='text/csv')
-    response['Content-disposition'] = 'attachment; filename=places.csv'
-
-    return response
+    api_response = api.stream(places_uri, content_type='text/csv')
+    return download_response(request, api_response, 'places.csv')
 
 def download_submissions_view(request, dataset_slug, submission_type):
     api = ShareaboutsApi(request)
     api.authenticate(request)
     submissions_uri = api.build_uri('all_submissions', username=request.user.username, dataset_slug=dataset_slug, type=submission_type)
 
-    api_response = api.send('GET', submissions_uri, content_type='text/csv')
-    submissions_csv = api_response.text
-
-    response = HttpResponse(submissions_csv, content_type='text/csv')
-    response['Content-disposition'] = 'attachment; filename=' + submission_type + '.csv'
-
-    return response
+    api_response = api.stream(submissions_uri, content_type='text/csv')
+    return download_response(request, api_response, submission_type + '.csv')
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Load test the read-only API endpoints of a running server, to compare
+worker setups (e.g., sync workers against gevent workers; see
+doc/DEPLOY.md).
+
+For each number of concurrent clients, each client GETs the endpoint over
+and over for the given duration, and the throughput and latencies are
+reported.  With --waiters, that many more clients long-poll the dataset's
+activity feed the whole time, the way idle browsers do.  Those requests
+aren't counted; they show how well the server keeps answering everyone
+else while some requests are just waiting.
+
+Only the standard library is used, so that the script can run anywhere.
+For example:
+
+    python src/scripts/loadtest.py http://localhost:8000/api/v1/datasets/demo-user/demo-data/ \\
+        --endpoint places --endpoint activity --concurrency 1,10,50 --waiters 20
+"""
+from __future__ import print_function
+
+import json
+import optparse
+import threading
+import time
+import urllib2
+
+ENDPOINTS = {
+    'places': 'places/?page_size=100',
+    'activity': 'activity/?limit=50',
+}
+
+
+def fetch(url, timeout):
+    response = urllib2.urlopen(url, timeout=timeout)
+    try:
+        response.read()
+    finally:
+        response.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Waiter (threading.Thread):
+    """
+    Long-polls the activity feed until stopped.
+    """
+    def __init__(self, dataset_url, wait):
+        super(Waiter, self).__init__()
+        self.daemon = True
+        self.dataset_url = dataset_url
+        self.wait = wait
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                latest = json.load(urllib2.urlopen(
+                    self.dataset_url + 'activity/?limit=1', timeout=self.wait + 30))
+                after = latest[0]['id'] if latest else 0
+                fetch(self.dataset_url + 'activity/?after=%s&wait=%s' % (after, self.wait),
+                      self.wait + 30)
+            except Exception:
+                time.sleep(1)
+
+
+def run_clients(url, concurrency, duration, timeout):
+    """
+    Have the given number of clients GET the url over and over for duration
+    seconds.  Returns the sorted latencies and the number of errors.
+    """
+    deadline = time.time() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client():
+        while time.time() < deadline:
+            start = time.time()
+            try:
+                fetch(url, timeout)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            else:
+                with lock:
+                    latencies.append(time.time() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0]
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] <dataset url>',
+        description='Load test the place list and activity feed of a dataset.')
+    parser.add_option('--endpoint', action='append', dest='endpoints',
+                      choices=sorted(ENDPOINTS),
+                      help='An endpoint to test: places or activity (default both).')
+    parser.add_option('--concurrency', default='1,10,50',
+                      help='Comma-separated numbers of concurrent clients (default 1,10,50).')
+    parser.add_option('--duration', type='float', default=30,
+                      help='How long, in seconds, to test each endpoint at each '
+                           'concurrency (default 30).')
+    parser.add_option('--waiters', type='int', default=0,
+                      help='The number of clients to keep long-polling the activity '
+                           'feed meanwhile (default 0).')
+    parser.add_option('--wait', type='int', default=20,
+                      help='How long each long poll waits, in seconds (default 20, '
+                           'the server\'s SA_API_ACTIVITY_MAX_WAIT).')
+    parser.add_option('--timeout', type='float', default=60,
+                      help='How long to wait for each response, in seconds (default 60).')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('Give the URL of a dataset')
+
+    dataset_url = args[0].rstrip('/') + '/'
+    endpoints = options.endpoints or sorted(ENDPOINTS)
+    concurrencies = [int(n) for n in options.concurrency.split(',')]
+
+    waiters = [Waiter(dataset_url, options.wait) for _ in range(options.waiters)]
+    for waiter in waiters:
+        waiter.start()
+    if waiters:
+        print('%s clients are long-polling the activity feed' % len(waiters))
+
+    print('%-10s %7s %9s %9s %10s %10s %7s' % (
+        'Endpoint', 'Clients', 'Requests', 'Req/s', 'Median', '95th', 'Errors'))
+    try:
+        for endpoint in endpoints:
+            for concurrency in concurrencies:
+                latencies, errors = run_clients(dataset_url + ENDPOINTS[endpoint],
+                                                concurrency, options.duration,
+                                                options.timeout)
+                print('%-10s %7s %9s %9.1f %8.0fms %8.0fms %7s' % (
+                    endpoint, concurrency, len(latencies),
+                    len(latencies) / options.duration,
+                    1000 * percentile(latencies, 0.5),
+                    1000 * percentile(latencies, 0.95), errors))
+    finally:
+        for waiter in waiters:
+            waiter.stopped.set()
+
+
+if __name__ == '__main__':
+    main()